@@ -0,0 +1,213 @@
+import asyncio
+import contextlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable
+
+
+class Overloaded(Exception):
+    """Raised when a request can't get a pipeline slot within the queue deadline"""
+
+
+class _AsyncWaiter:
+    __slots__ = ('future', 'granted')
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.granted = False
+
+
+class TokenBucketLimiter:
+    """Per-client token buckets: `burst` requests at once, refilled at `rate` per second
+
+    Buckets are kept for the `max_clients` most recently seen clients; a
+    forgotten client starts again with a full bucket, which it would have
+    had anyway after being idle that long. rate=0 disables the limiter.
+    """
+
+    def __init__(self, rate: float, burst: int, max_clients: int = 10000, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_clients = max_clients
+        self._clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def acquire(self, client: Hashable) -> float:
+        """Take a token for client: 0 if allowed, else seconds until one is available"""
+        if not self.enabled:
+            return 0.0
+        now = self._clock()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+                self.allowed += 1
+            else:
+                wait = (1 - tokens) / self.rate
+                self.limited += 1
+            self._buckets[client] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def stats(self) -> Dict:
+        return {
+            'enabled': self.enabled,
+            'rate_per_minute': self.rate * 60,
+            'burst': self.burst,
+            'clients': len(self._buckets),
+            'allowed': self.allowed,
+            'limited': self.limited
+        }
+
+
+class ConcurrencyGate:
+    """Bounds how many chat pipelines run at once
+
+    A request waits at most `queue_timeout` seconds for one of the
+    `max_concurrent` slots, and is turned away immediately when `max_queue`
+    requests are already waiting, so a burst is shed quickly instead of
+    every request slowing down until it times out. slot() serves threads
+    (Flask) and aslot() coroutines on one event loop (ASGI), sharing the
+    slot count. max_concurrent=0 disables the gate.
+    """
+
+    def __init__(self, max_concurrent: int, queue_timeout: float = 5.0, max_queue: int = 100):
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        self._condition = threading.Condition()
+        self._async_waiters = []
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrent > 0
+
+    def _try_enter(self) -> bool:
+        # Call with self._condition held
+        if self.active < self.max_concurrent:
+            self.active += 1
+            self.admitted += 1
+            return True
+        return False
+
+    def _reject(self):
+        self.rejected += 1
+        raise Overloaded(f"No chat slot free within {self.queue_timeout}s")
+
+    @contextlib.contextmanager
+    def slot(self):
+        """Hold a pipeline slot for the duration of the block, or raise Overloaded"""
+        if not self.enabled:
+            yield
+            return
+        started = time.monotonic()
+        with self._condition:
+            if not self._try_enter():
+                if self.waiting >= self.max_queue:
+                    self._reject()
+                self.waiting += 1
+                try:
+                    deadline = started + self.queue_timeout
+                    while not self._try_enter():
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._reject()
+                        self._condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            self.wait_seconds += time.monotonic() - started
+        try:
+            yield
+        finally:
+            self._release()
+
+    @contextlib.asynccontextmanager
+    async def aslot(self):
+        """Async variant of slot(); waits without blocking the event loop"""
+        if not self.enabled:
+            yield
+            return
+        started = time.monotonic()
+        with self._condition:
+            entered = self._try_enter()
+            if not entered:
+                if self.waiting >= self.max_queue:
+                    self._reject()
+                self.waiting += 1
+                waiter = _AsyncWaiter(asyncio.get_running_loop().create_future())
+                self._async_waiters.append(waiter)
+        if not entered:
+            try:
+                # _release() hands the freed slot straight to the waiter
+                await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                with self._condition:
+                    granted = waiter.granted
+                    if not granted:
+                        self._async_waiters.remove(waiter)
+                        self.waiting -= 1
+                        if isinstance(e, asyncio.TimeoutError):
+                            self._reject()
+                if isinstance(e, asyncio.CancelledError):
+                    if granted:
+                        self._release()  # The slot was handed over just as the request went away
+                    raise
+        with self._condition:
+            self.wait_seconds += time.monotonic() - started
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self):
+        with self._condition:
+            # Coroutines waiting on the event loop are handed the slot directly;
+            # waiting threads are woken to take it
+            if self._async_waiters:
+                waiter = self._async_waiters.pop(0)
+                waiter.granted = True
+                self.waiting -= 1
+                self.admitted += 1
+                waiter.future.get_loop().call_soon_threadsafe(_set_result, waiter.future)
+                return
+            self.active -= 1
+            self._condition.notify()
+
+    def retry_after(self) -> int:
+        """Seconds an overloaded client is asked to wait"""
+        return max(1, math.ceil(self.queue_timeout))
+
+    def stats(self) -> Dict:
+        return {
+            'enabled': self.enabled,
+            'max_concurrent': self.max_concurrent,
+            'max_queue': self.max_queue,
+            'queue_timeout': self.queue_timeout,
+            'active': self.active,
+            'waiting': self.waiting,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'average_wait_ms': round(self.wait_seconds / self.admitted * 1000, 2) if self.admitted else 0.0
+        }
+
+
+def _set_result(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(True)
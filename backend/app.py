@@ -1,6 +1,12 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
+import os
+import re
+import hmac
+import contextlib
 import json
+import math
+import time
 import traceback
 from datetime import datetime
 
@@ -8,29 +14,485 @@ from datetime import datetime
 from data_manager import DataManager
 from chatbot_logic.processor import QueryProcessor
 from chatbot_logic.generator import ResponseGenerator
+from chatbot_logic.answer_cache import SemanticAnswerCache
+from chat_logger import ChatLogger
+from single_flight import Flight, SingleFlight
+from admission import ConcurrencyGate, Overloaded, TokenBucketLimiter
+from session_store import SessionManager, load_session_backend
+from metrics import REGISTRY, STREAM_SECONDS, TIME_TO_FIRST_TOKEN, current_trace, span, start_trace
 
 app = Flask(__name__)
-CORS(app)  # Enable CORS
+CORS(app, expose_headers=['X-Trace-Id'])  # Enable CORS; let browsers read the trace id
 
-# Initialize components
+# Responses to recent paraphrases are reused without calling OpenAI.
+# Only Tier 1 is cacheable unless ANSWER_CACHE_TIERS explicitly allows more.
+answer_cache = SemanticAnswerCache(
+    maxsize=int(os.getenv('ANSWER_CACHE_SIZE', '512')),
+    ttl=float(os.getenv('ANSWER_CACHE_TTL', '600')),
+    threshold=float(os.getenv('ANSWER_CACHE_THRESHOLD', '0.95')),
+    cacheable_tiers=[int(tier) for tier in os.getenv('ANSWER_CACHE_TIERS', '1').split(',') if tier.strip()]
+)
+
+# Identical questions asked at the same time (e.g. at a lecture break) share
+# one pipeline run and OpenAI call instead of each making their own
+chat_flights = SingleFlight(enabled=os.getenv('COALESCE_REQUESTS', 'true').lower() in ('1', 'true', 'yes'))
+
+# Admission control for /api/chat and /api/chat/stream: each client gets a
+# token bucket of RATE_LIMIT_BURST questions refilled at RATE_LIMIT_PER_MINUTE,
+# and at most CHAT_MAX_CONCURRENCY pipelines run at once, with requests queueing
+# for a slot for up to CHAT_QUEUE_TIMEOUT seconds. Tier 3 escalations bypass both.
+rate_limiter = TokenBucketLimiter(
+    rate=float(os.getenv('RATE_LIMIT_PER_MINUTE', '30')) / 60,
+    burst=int(os.getenv('RATE_LIMIT_BURST', '10')),
+    max_clients=int(os.getenv('RATE_LIMIT_MAX_CLIENTS', '10000'))
+)
+chat_gate = ConcurrencyGate(
+    max_concurrent=int(os.getenv('CHAT_MAX_CONCURRENCY', '32')),
+    queue_timeout=float(os.getenv('CHAT_QUEUE_TIMEOUT', '5')),
+    max_queue=int(os.getenv('CHAT_MAX_QUEUE', '100'))
+)
+# Rate-limit by the first X-Forwarded-For address only behind a proxy that sets it
+TRUST_PROXY_HEADERS = os.getenv('TRUST_PROXY_HEADERS', 'false').lower() in ('1', 'true', 'yes')
+
+# Multi-turn conversations: requests with a server-issued conversation_id carry the
+# conversation's recent turns (and a compacted summary of older ones) in the
+# prompt, and follow-up questions are rewritten into standalone retrieval queries
+session_manager = SessionManager(
+    backend=load_session_backend(
+        os.getenv('SESSION_BACKEND', 'memory'),
+        maxsize=int(os.getenv('SESSION_MAX_CONVERSATIONS', '10000')),
+        ttl=float(os.getenv('SESSION_TTL', '3600'))
+    ),
+    history_tokens=int(os.getenv('SESSION_HISTORY_TOKENS', '300')),
+    summary_tokens=int(os.getenv('SESSION_SUMMARY_TOKENS', '150'))
+)
+CONVERSATION_ID_PATTERN = re.compile(r'^[A-Za-z0-9._:-]{1,128}$')
+
+# Every chat outcome is appended to JSON-lines files by a background writer;
+# logging never blocks or fails a request (entries are dropped if it falls behind)
+chat_logger = ChatLogger(
+    directory=os.getenv('CHAT_LOG_DIR', 'data/chat_logs'),
+    max_queue=int(os.getenv('CHAT_LOG_QUEUE_SIZE', '10000')),
+    batch_size=int(os.getenv('CHAT_LOG_BATCH_SIZE', '256')),
+    flush_interval=float(os.getenv('CHAT_LOG_FLUSH_INTERVAL', '1.0')),
+    max_bytes=int(os.getenv('CHAT_LOG_MAX_BYTES', str(50 * 1024 * 1024))),
+    max_age=float(os.getenv('CHAT_LOG_ROTATE_SECONDS', '86400')),
+    enabled=os.getenv('CHAT_LOG_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+)
+
+# Under a pre-forking server (see gunicorn.conf.py) this module is imported once
+# in the master and the workers are forked from it. Threads started here would
+# not survive the fork, so the knowledge base is loaded synchronously and the
+# server calls start_worker_tasks() in each worker instead.
+PREFORK_WORKERS = os.getenv('PREFORK_WORKERS', 'false').lower() in ('1', 'true', 'yes')
+
+def start_worker_tasks():
+    """Start this process's background threads (the knowledge base watcher)"""
+    watch_interval = float(os.getenv('KB_WATCH_INTERVAL', '0'))
+    if data_manager and watch_interval > 0:
+        data_manager.watch_knowledge_base(watch_interval)
+        print(f"Watching {data_manager.knowledge_base_path} for changes every {watch_interval}s (pid {os.getpid()})")
+
+# Initialize components. Loading the embedding model and index takes a while,
+# so by default it runs in the background: the server starts accepting
+# requests at once and serves Tier 3 escalations while retrieval warms up.
 print("Initializing RAG chatbot components...")
+background_load = (os.getenv('BACKGROUND_MODEL_LOAD', 'true').lower() in ('1', 'true', 'yes')
+                   and not PREFORK_WORKERS)
 try:
-    data_manager = DataManager()
+    data_manager = DataManager(os.getenv('KNOWLEDGE_BASE_PATH', 'data/knowledge_base.txt'), load=not background_load)
     query_processor = QueryProcessor()
     response_generator = ResponseGenerator()
-    print("All components initialized successfully!")
+    if background_load:
+        data_manager.load_in_background()
+        print("Components initialized; loading knowledge base and embedding model in the background...")
+    else:
+        print("All components initialized successfully!")
+    
+    # Optionally pick up knowledge base edits without a restart
+    if not PREFORK_WORKERS:
+        start_worker_tasks()
 except Exception as e:
     print(f"Error initializing components: {e}")
     data_manager = None
     query_processor = None
     response_generator = None
 
+# Largest number of queries accepted by /api/chat/batch
+BATCH_MAX_QUERIES = int(os.getenv('BATCH_MAX_QUERIES', '1000'))
+
+# Response payloads for when the pipeline cannot run
+TECHNICAL_DIFFICULTIES_RESPONSE = {
+    'response': "I'm currently experiencing technical difficulties. Please contact the Program Office directly for assistance.",
+    'sources': [],
+    'escalation_link': "mailto:mam-mim@london.edu?subject=Technical Issue"
+}
+
+STARTING_UP_RESPONSE = {
+    'response': "I'm still starting up and can't look up an answer yet. Please try again in a few seconds, or contact the Program Office directly.",
+    'sources': [],
+    'escalation_available': True,
+    'escalation_text': "Contact Program Office",
+    'escalation_link': "mailto:mam-mim@london.edu?subject=Student Inquiry"
+}
+
+# Seconds clients are asked to wait (Retry-After) while retrieval is loading
+STARTUP_RETRY_AFTER = os.getenv('STARTUP_RETRY_AFTER', '5')
+
+RATE_LIMITED_RESPONSE = {
+    'response': "You're sending questions faster than I can answer them. Please wait a few seconds and try again.",
+    'sources': [],
+    'escalation_available': True,
+    'escalation_text': "Contact Program Office",
+    'escalation_link': "mailto:mam-mim@london.edu?subject=Student Inquiry"
+}
+
+OVERLOADED_RESPONSE = {
+    'response': "I'm answering a lot of questions right now. Please try again in a few seconds, or contact the Program Office directly.",
+    'sources': [],
+    'escalation_available': True,
+    'escalation_text': "Contact Program Office",
+    'escalation_link': "mailto:mam-mim@london.edu?subject=Student Inquiry"
+}
+
+ERROR_RESPONSE = {
+    'response': "I apologize, but I encountered an error processing your request. Please contact the Program Office directly for assistance.",
+    'sources': [],
+    'escalation_available': True,
+    'escalation_text': "Contact Program Office",
+    'escalation_link': "mailto:mam-mim@london.edu?subject=Technical Error - Student Inquiry"
+}
+
+# Request metrics, exported on /metrics with the pipeline stage histograms
+REQUESTS = REGISTRY.counter('chatbot_requests_total', 'HTTP requests by endpoint and status', ['endpoint', 'status'])
+REQUEST_SECONDS = REGISTRY.histogram('chatbot_request_seconds', 'HTTP request latency by endpoint', ['endpoint'])
+QUERIES = REGISTRY.counter('chatbot_queries_total', 'Chat queries by safeguard tier', ['tier'])
+ADMISSION_REJECTED = REGISTRY.counter(
+    'chatbot_admission_rejected_total', 'Chat requests turned away by admission control', ['reason']
+)
+OPENAI_CALLS_SAVED = REGISTRY.counter(
+    'chatbot_openai_calls_saved_total', 'Response generations avoided by joining an identical in-flight request'
+)
+
+def cache_stats() -> dict:
+    stats = {'answer': answer_cache.stats()}
+    if data_manager:
+        stats['query_embedding'] = data_manager.query_cache.stats()
+    return stats
+
+REGISTRY.callback('chatbot_cache_hits_total', 'Cache hits', ['cache'],
+                  lambda: {(cache,): stats['hits'] for cache, stats in cache_stats().items()}, 'counter')
+REGISTRY.callback('chatbot_cache_misses_total', 'Cache misses', ['cache'],
+                  lambda: {(cache,): stats['misses'] for cache, stats in cache_stats().items()}, 'counter')
+REGISTRY.callback('chatbot_cache_hit_ratio', 'Cache hit rate since start', ['cache'],
+                  lambda: {(cache,): stats['hit_rate'] for cache, stats in cache_stats().items()})
+REGISTRY.callback('chatbot_cache_entries', 'Entries currently cached', ['cache'],
+                  lambda: {(cache,): stats['size'] for cache, stats in cache_stats().items()})
+REGISTRY.callback('chatbot_chat_log_entries_total', 'Chat log entries by outcome', ['result'],
+                  lambda: {(result,): chat_logger.stats()[result] for result in ('written', 'dropped', 'failed')},
+                  'counter')
+REGISTRY.callback('chatbot_chat_in_progress', 'Chat pipelines running', [], lambda: {(): chat_gate.active})
+REGISTRY.callback('chatbot_chat_queued', 'Chat requests waiting for a pipeline slot', [], lambda: {(): chat_gate.waiting})
+REGISTRY.callback('chatbot_coalesced_requests_total', 'Chat requests answered by joining an identical in-flight request', [],
+                  lambda: {(): chat_flights.shared}, 'counter')
+REGISTRY.callback('chatbot_openai_breaker_open', 'Whether the OpenAI circuit breaker is refusing calls (1) or not (0)', [],
+                  lambda: {(): int(response_generator.breaker.state == 'open')} if response_generator else {})
+
+# Incoming trace ids (X-Trace-Id / X-Request-ID) are reused only if they look like one
+TRACE_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+def begin_trace(headers):
+    """Start the request's trace, continuing the caller's trace id if it sent a valid one"""
+    trace_id = headers.get('X-Trace-Id') or headers.get('X-Request-ID') or ''
+    return start_trace(trace_id if TRACE_ID_PATTERN.match(trace_id) else None)
+
+def end_trace(trace, endpoint: str, status: int):
+    """Count and time a finished request; shared by the WSGI and ASGI servers"""
+    REQUESTS.inc(endpoint=endpoint, status=status)
+    REQUEST_SECONDS.observe(trace.elapsed(), endpoint=endpoint)
+
+@app.before_request
+def trace_request():
+    begin_trace(request.headers)
+
+@app.after_request
+def add_trace_header(response):
+    trace = current_trace()
+    if trace is not None:
+        response.headers['X-Trace-Id'] = trace.trace_id
+        end_trace(trace, request.endpoint or 'unknown', response.status_code)
+    return response
+
+def get_user_query() -> str:
+    """Extract the user's message from the JSON request body"""
+    data = request.get_json()
+    return data.get('message', data.get('query', '')).strip()
+
+def conversation_id_from(data: dict) -> str:
+    """The request's conversation id, or None for a one-off question
+    
+    Ids are issued by the server and are the only credential for a
+    conversation, so clients can't choose them: a request with a null
+    conversation_id, or one the server doesn't hold (made up, expired or
+    cleared), starts a new conversation under a fresh id. Responses carry the
+    id to send with the next message.
+    """
+    if 'conversation_id' not in data:
+        return None
+    conversation_id = str(data.get('conversation_id') or '').strip()
+    if conversation_id and CONVERSATION_ID_PATTERN.match(conversation_id) and session_manager.exists(conversation_id):
+        return conversation_id
+    if conversation_id:
+        print("Unknown conversation_id, starting a new conversation")
+    return session_manager.new_id()
+
+def with_conversation(response_data: dict, conversation: dict = None) -> dict:
+    """The response for a client, with the id to continue its conversation (if any)"""
+    if conversation is None:
+        return response_data
+    # A copy: the same response may be cached or shared with coalesced requests
+    return {**response_data, 'conversation_id': conversation['id']}
+
+def process_turn(user_query: str, conversation_id: str = None) -> tuple:
+    """Process a query and load its conversation, if it belongs to one
+    
+    Returns (query_analysis, conversation). In a conversation, a follow-up's
+    cleaned_query is replaced by a standalone retrieval query; the safeguard
+    tier is still decided on the message itself. conversation is None for a
+    one-off question, else {'id', 'session', 'history' (chat messages)}.
+    """
+    with span('process_query'):
+        query_analysis = query_processor.process_query(user_query)
+        if not conversation_id:
+            return query_analysis, None
+        
+        session = session_manager.load(conversation_id)
+        retrieval_query = session_manager.standalone_query(session, query_analysis['cleaned_query'])
+        if retrieval_query != query_analysis['cleaned_query']:
+            print(f"Follow-up rewritten for retrieval: {retrieval_query}")
+            query_analysis['cleaned_query'] = retrieval_query
+    return query_analysis, {'id': conversation_id, 'session': session, 'history': session_manager.messages(session)}
+
+def remember_turn(conversation: dict, prepared: dict, response_data: dict):
+    """Add an answered question to its conversation's history"""
+    # Tier 3 messages and their escalations are never carried into later prompts
+    # or follow-up retrieval queries: no AI discussion of crisis disclosures
+    if conversation is None or prepared['query_analysis'].get('requires_immediate_escalation', False):
+        return
+    try:
+        # Keep the question but not a fallback or retrieval-only answer
+        answer = response_data.get('answer', '')
+        if response_data.get('confidence') in ('system_error', 'degraded'):
+            answer = ''
+        session_manager.add_turn(conversation['id'], conversation['session'], prepared['query'],
+                                 prepared['query_analysis']['cleaned_query'], answer)
+    except Exception as e:
+        print(f"Error saving conversation turn: {e}")
+
+def prepare_chat(user_query: str, query_analysis: dict = None, conversation: dict = None) -> dict:
+    """Run the pipeline stages shared by /api/chat and /api/chat/stream up to generation
+    
+    The returned dict has 'response' set when the answer is already known
+    (Tier 3 escalation, an answer cache hit, retrieval still starting up,
+    flagged by 'starting_up', or retrieval unavailable because the knowledge
+    base failed to load, flagged by 'unavailable'); otherwise it carries the query analysis,
+    context and sources the response should be generated from.
+    Pass query_analysis and conversation as returned by process_turn if the
+    query has already been processed.
+    """
+    prepared = prepare_chat_batch([user_query], [query_analysis] if query_analysis else None, [conversation])[0]
+    print(f"Query analysis: {prepared['query_analysis']}")
+    
+    if prepared['response'] is not None:
+        if prepared['cached']:
+            print("Serving response from answer cache")
+            outcome = 'cached'
+        elif prepared['starting_up']:
+            outcome = 'starting_up'
+        elif prepared['unavailable']:
+            outcome = 'error'
+        else:
+            outcome = 'escalated'
+        log_interaction(prepared, prepared['response'], outcome)
+        if outcome == 'cached':
+            remember_turn(conversation, prepared, prepared['response'])
+    elif prepared['token_usage'] is not None:
+        tokens = prepared['token_usage']
+        print(f"Found {len(prepared['sources'])} relevant sources")
+        print(f"Prompt tokens: {tokens['total']} of {tokens['budget']} "
+              f"({tokens['context']} context, {tokens['passages']} passages)")
+    return prepared
+
+def prepare_chat_batch(user_queries: list, query_analyses: list = None, conversations: list = None) -> list:
+    """prepare_chat for many queries at once
+    
+    Query embeddings for the answer cache and retrieval are computed in one
+    encode call and scored with one matrix product instead of once per query.
+    """
+    # Process the queries
+    generation = data_manager.generation
+    if query_analyses is None:
+        with span('process_query'):
+            query_analyses = query_processor.process_queries(user_queries)
+    conversations = conversations or [None] * len(user_queries)
+    batch = [
+        {
+            'query': user_query,
+            'query_analysis': query_analysis,
+            'conversation': conversation,
+            'history': conversation['history'] if conversation else [],
+            'query_embedding': None,
+            'generation': generation,
+            'context': "",
+            'sources': [],
+            'token_usage': None,
+            'scores': [],
+            'cached': False,
+            'starting_up': False,
+            'unavailable': False,
+            'generated': False,
+            'response': None
+        }
+        for user_query, query_analysis, conversation in zip(user_queries, query_analyses, conversations)
+    ]
+    for prepared in batch:
+        QUERIES.inc(tier=prepared['query_analysis']['safeguard_tier'])
+    
+    # Check for Tier 3 (Critical) - immediate escalation, needs no model so it
+    # is served even while retrieval is still loading
+    for prepared in batch:
+        if prepared['query_analysis'].get('requires_immediate_escalation', False):
+            prepared['response'] = query_processor.get_tier_3_escalation_response()
+    pending = [prepared for prepared in batch if prepared['response'] is None]
+    
+    if not data_manager.ready:
+        # Still loading is worth retrying shortly; a failed load needs a reload first
+        failed = data_manager.readiness['state'] == 'failed'
+        for prepared in pending:
+            if failed:
+                prepared['response'] = TECHNICAL_DIFFICULTIES_RESPONSE
+                prepared['unavailable'] = True
+            else:
+                prepared['response'] = STARTING_UP_RESPONSE
+                prepared['starting_up'] = True
+        return batch
+    
+    # Serve cached answers to near-identical earlier questions if allowed
+    if pending and answer_cache.enabled and data_manager.model is not None:
+        query_embeddings = data_manager.encode_queries([prepared['query_analysis']['cleaned_query'] for prepared in pending])
+        for prepared, query_embedding in zip(pending, query_embeddings):
+            prepared['query_embedding'] = query_embedding
+            cached_response = answer_cache.lookup(
+                query_embedding, prepared['query_analysis']['safeguard_tier'], generation
+            )
+            if cached_response is not None:
+                prepared['response'] = cached_response
+                prepared['cached'] = True
+        pending = [prepared for prepared in pending if prepared['response'] is None]
+    
+    if not pending:
+        return batch
+    
+    # Get relevant context from knowledge base, packed into what is left of the
+    # prompt token budget after the system prompt and user template
+    reserved_tokens = [
+        response_generator.prompt_overhead_tokens(prepared['query'], prepared['query_analysis']['safeguard_tier'],
+                                                  prepared['history'])
+        for prepared in pending
+    ]
+    packed_batch = data_manager.pack_context_for_queries(
+        [prepared['query_analysis']['cleaned_query'] for prepared in pending], reserved_tokens
+    )
+    for prepared, packed in zip(pending, packed_batch):
+        prepared['context'] = packed['context']
+        prepared['sources'] = packed['sources']
+        prepared['scores'] = packed['scores']
+        # The reserved overhead is an estimate; report the exact prompt size
+        packed['tokens']['total'] = response_generator.count_prompt_tokens(
+            prepared['query'], packed['context'], packed['sources'], prepared['query_analysis']['safeguard_tier'],
+            prepared['history']
+        )
+        prepared['token_usage'] = packed['tokens']
+    return batch
+
+def finish_chat(prepared: dict, response_data: dict):
+    """Cache, log and remember in its conversation a freshly generated response"""
+    # Never cache fallback or retrieval-only responses from a failed or skipped OpenAI call,
+    # nor answers that drew on a conversation's earlier turns
+    if (prepared['query_embedding'] is not None and not prepared['history']
+            and response_data.get('confidence') not in ('system_error', 'degraded')):
+        answer_cache.store(
+            prepared['query_embedding'], prepared['query_analysis']['safeguard_tier'],
+            prepared['generation'], response_data
+        )
+    
+    # Log the interaction
+    outcomes = {'system_error': 'error', 'degraded': 'degraded'}
+    log_interaction(prepared, response_data, outcomes.get(response_data.get('confidence'), 'generated'))
+    remember_turn(prepared['conversation'], prepared, response_data)
+
+def coalesce_key(query_analysis: dict, conversation: dict = None) -> tuple:
+    """Chat requests with equal keys may share one pipeline run and its response
+    
+    A question asked with earlier turns in the prompt is only shared within its conversation.
+    """
+    conversation_id = conversation['id'] if conversation and conversation['history'] else None
+    return (query_analysis['cleaned_query'].lower(), query_analysis['safeguard_tier'], data_manager.generation,
+            conversation_id)
+
+def client_id(remote_addr: str, forwarded_for: str = None) -> str:
+    """The address a client is rate-limited by"""
+    if TRUST_PROXY_HEADERS and forwarded_for:
+        return forwarded_for.split(',')[0].strip()
+    return remote_addr or 'unknown'
+
+def rate_limit_retry_after(client: str) -> str:
+    """Take one of the client's tokens: None if allowed, else the Retry-After header value"""
+    wait = rate_limiter.acquire(client)
+    if not wait:
+        return None
+    ADMISSION_REJECTED.inc(reason='rate_limited')
+    return str(max(1, math.ceil(wait)))
+
+def run_admitted_chat(user_query: str, query_analysis: dict, conversation: dict = None) -> dict:
+    """run_chat once a pipeline slot is free; raises Overloaded if none frees up in time"""
+    with chat_gate.slot():
+        return run_chat(user_query, query_analysis, conversation)
+
+def run_chat(user_query: str, query_analysis: dict, conversation: dict = None) -> dict:
+    """The /api/chat pipeline for one processed query; returns the prepared dict with 'response' set"""
+    prepared = prepare_chat(user_query, query_analysis, conversation)
+    if prepared['response'] is None:
+        # For Tier 2 queries, we still generate a response but with enhanced caution
+        # For Tier 1 queries, normal processing
+        prepared['response'] = response_generator.generate_response(
+            query=user_query,
+            context=prepared['context'],
+            sources=prepared['sources'],
+            query_analysis=prepared['query_analysis'],
+            history=prepared['history']
+        )
+        prepared['generated'] = True
+        finish_chat(prepared, prepared['response'])
+    return prepared
+
+def share_chat(prepared: dict, conversation: dict = None):
+    """Count, log and remember a request answered by joining an identical in-flight one"""
+    QUERIES.inc(tier=prepared['query_analysis']['safeguard_tier'])
+    if prepared['generated']:
+        OPENAI_CALLS_SAVED.inc()
+    log_interaction(prepared, prepared['response'], 'coalesced')
+    # The request that ran the pipeline already remembered the turn in its own conversation
+    leader = prepared['conversation']
+    if (conversation is not None and (leader is None or leader['id'] != conversation['id'])
+            and not (prepared['starting_up'] or prepared['unavailable'])):
+        remember_turn(conversation, prepared, prepared['response'])
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     try:
         # Get the query from request
-        data = request.get_json()
-        user_query = data.get('message', data.get('query', '')).strip()
+        user_query = get_user_query()
         
         if not user_query:
             return jsonify({'error': 'Empty query provided'}), 400
@@ -40,60 +502,246 @@ def chat():
         
         # Check if components are initialized
         if not all([data_manager, query_processor, response_generator]):
-            return jsonify({
-                'response': "I'm currently experiencing technical difficulties. Please contact the Program Office directly for assistance.",
-                'sources': [],
-                'escalation_link': "mailto:mam-mim@london.edu?subject=Technical Issue"
-            })
-        
-        # Process the query
-        query_analysis = query_processor.process_query(user_query)
-        print(f"Query analysis: {query_analysis}")
+            return jsonify(TECHNICAL_DIFFICULTIES_RESPONSE)
         
-        # Check for Tier 3 (Critical) - immediate escalation
-        if query_analysis.get('requires_immediate_escalation', False):
-            tier_3_response = query_processor.get_tier_3_escalation_response()
-            return jsonify(tier_3_response)
+        query_analysis, conversation = process_turn(user_query, conversation_id_from(request.get_json()))
         
-        # Get relevant context from knowledge base
-        context, sources = data_manager.get_context_for_query(query_analysis['cleaned_query'])
-        print(f"Found {len(sources)} relevant sources")
+        # Tier 3 is always admitted: the escalation response is static and never refused
+        if query_analysis['requires_immediate_escalation']:
+            prepared = prepare_chat(user_query, query_analysis, conversation)
+            return jsonify(with_conversation(prepared['response'], conversation))
         
-        # For Tier 2 queries, we still generate a response but with enhanced caution
-        # For Tier 1 queries, normal processing
-        response_data = response_generator.generate_response(
-            query=user_query,
-            context=context,
-            sources=sources,
-            query_analysis=query_analysis
-        )
+        retry_after = rate_limit_retry_after(client_id(request.remote_addr, request.headers.get('X-Forwarded-For')))
+        if retry_after:
+            return jsonify(RATE_LIMITED_RESPONSE), 429, {'Retry-After': retry_after}
         
-        # Log the interaction
-        log_interaction(user_query, response_data)
+        # Identical questions already being answered are not answered again
+        prepared, shared = chat_flights.do(coalesce_key(query_analysis, conversation),
+                                           lambda: run_admitted_chat(user_query, query_analysis, conversation))
+        if shared:
+            share_chat(prepared, conversation)
+        if prepared['starting_up']:
+            return jsonify(with_conversation(prepared['response'], conversation)), 503, {'Retry-After': STARTUP_RETRY_AFTER}
+        if prepared['unavailable']:
+            return jsonify(with_conversation(prepared['response'], conversation)), 503
         
-        return jsonify(response_data)
+        return jsonify(with_conversation(prepared['response'], conversation))
         
+    except Overloaded as e:
+        ADMISSION_REJECTED.inc(reason='overloaded')
+        print(f"Chat request turned away: {e}")
+        return jsonify(OVERLOADED_RESPONSE), 503, {'Retry-After': str(chat_gate.retry_after())}
     except Exception as e:
         print(f"Error in chat endpoint: {e}")
         print(traceback.format_exc())
         
         # Return error response
-        error_response = {
-            'response': "I apologize, but I encountered an error processing your request. Please contact the Program Office directly for assistance.",
-            'sources': [],
-            'escalation_available': True,
-            'escalation_text': "Contact Program Office",
-            'escalation_link': "mailto:mam-mim@london.edu?subject=Technical Error - Student Inquiry"
-        }
+        return jsonify(ERROR_RESPONSE), 500
+
+@app.route('/api/chat/batch', methods=['POST'])
+def chat_batch():
+    """Run many queries through the pipeline at once, e.g. to replay logged questions
+    
+    Body: {"queries": [...], "generate": false, "include_context": false}.
+    By default only safeguards and retrieval run; with "generate" each
+    remaining query is also answered, which pre-warms the answer cache.
+    """
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    try:
+        data = request.get_json() or {}
+        queries = data.get('queries', [])
+        if not isinstance(queries, list) or not queries:
+            return jsonify({'error': 'Provide a non-empty "queries" list'}), 400
+        
+        queries = [str(query).strip() for query in queries]
+        if not all(queries):
+            return jsonify({'error': 'Empty query provided'}), 400
+        if len(queries) > BATCH_MAX_QUERIES:
+            return jsonify({'error': f'At most {BATCH_MAX_QUERIES} queries per batch'}), 413
+        
+        if not all([data_manager, query_processor, response_generator]):
+            return jsonify(TECHNICAL_DIFFICULTIES_RESPONSE), 503
+        if data_manager.readiness['state'] == 'failed':
+            return jsonify(TECHNICAL_DIFFICULTIES_RESPONSE), 503
+        if not data_manager.ready:
+            return jsonify(STARTING_UP_RESPONSE), 503, {'Retry-After': STARTUP_RETRY_AFTER}
+        
+        started = time.perf_counter()
+        results = []
+        for prepared in prepare_chat_batch(queries):
+            response_data = prepared['response']
+            if response_data is None and data.get('generate'):
+                response_data = response_generator.generate_response(
+                    query=prepared['query'],
+                    context=prepared['context'],
+                    sources=prepared['sources'],
+                    query_analysis=prepared['query_analysis']
+                )
+                finish_chat(prepared, response_data)
+            
+            result = {
+                'query': prepared['query'],
+                'safeguard_tier': prepared['query_analysis']['safeguard_tier'],
+                'query_type': prepared['query_analysis']['query_type'],
+                'sources': response_data.get('sources', []) if response_data else prepared['sources'],
+                'token_usage': prepared['token_usage'],
+                'cached': prepared['cached'],
+                'response': response_data
+            }
+            if data.get('include_context'):
+                result['context'] = prepared['context']
+            results.append(result)
         
-        return jsonify(error_response), 500
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"Processed batch of {len(queries)} queries in {elapsed_ms:.0f} ms")
+        return jsonify({'count': len(results), 'elapsed_ms': round(elapsed_ms, 1), 'results': results})
+    
+    except Exception as e:
+        print(f"Error in chat batch endpoint: {e}")
+        print(traceback.format_exc())
+        return jsonify(ERROR_RESPONSE), 500
 
-@app.route('/health', methods=['GET'])
-def health():
-    """Health check endpoint"""
+def sse_event(event: str, payload: dict) -> str:
+    """Encode one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Streaming variant of /api/chat using server-sent events
+    
+    Emits 'meta' (sources and safeguard tier) as soon as retrieval is done,
+    then 'delta' events with generated text, then 'done' with the same
+    payload /api/chat would have returned.
+    """
+    started = time.perf_counter()
+    # Holds the pipeline slot until the response is closed, i.e. for the whole stream
+    admission = contextlib.ExitStack()
+    # Only admitted questions are coalesced; others lead a flight nobody can join
+    flight = Flight()
+    conversation = None
+    try:
+        user_query = get_user_query()
+        
+        if not user_query:
+            return jsonify({'error': 'Empty query provided'}), 400
+        
+        print(f"Received streaming query: {user_query}")
+        
+        if not all([data_manager, query_processor, response_generator]):
+            prepared = {'response': TECHNICAL_DIFFICULTIES_RESPONSE}
+        else:
+            query_analysis, conversation = process_turn(user_query, conversation_id_from(request.get_json()))
+            leader = True
+            
+            # Tier 3 is always admitted, as on /api/chat
+            if not query_analysis['requires_immediate_escalation']:
+                client = client_id(request.remote_addr, request.headers.get('X-Forwarded-For'))
+                retry_after = rate_limit_retry_after(client)
+                if retry_after:
+                    return jsonify(RATE_LIMITED_RESPONSE), 429, {'Retry-After': retry_after}
+                
+                # Identical questions already being answered are not answered again:
+                # the first request streams, the others replay its finished response
+                flight, leader = chat_flights.start(coalesce_key(query_analysis, conversation))
+                if leader:
+                    admission.callback(flight.fail, RuntimeError("Chat stream closed before it finished"))
+                    admission.enter_context(chat_gate.slot())
+            
+            if leader:
+                prepared = prepare_chat(user_query, query_analysis, conversation)
+                if prepared['response'] is not None:
+                    flight.finish(prepared)
+            else:
+                prepared = flight.wait()
+                share_chat(prepared, conversation)
+        
+    except Overloaded as e:
+        flight.fail(e)
+        ADMISSION_REJECTED.inc(reason='overloaded')
+        print(f"Chat stream request turned away: {e}")
+        return jsonify(OVERLOADED_RESPONSE), 503, {'Retry-After': str(chat_gate.retry_after())}
+    except Exception as e:
+        flight.fail(e)
+        admission.close()
+        print(f"Error in chat stream endpoint: {e}")
+        print(traceback.format_exc())
+        return jsonify(ERROR_RESPONSE), 500
+    
+    def events():
+        # Already answered: Tier 3 escalation, cache hit or unavailable components
+        if prepared['response'] is not None:
+            response_data = prepared['response']
+            yield sse_event('meta', {
+                'sources': response_data.get('sources', []),
+                'safeguard_tier': response_data.get('safeguard_tier')
+            })
+            yield sse_event('done', with_conversation(response_data, conversation))
+            return
+        
+        yield sse_event('meta', {
+            'sources': prepared['sources'],
+            'safeguard_tier': prepared['query_analysis']['safeguard_tier']
+        })
+        
+        first_token = True
+        try:
+            for event, payload in response_generator.generate_response_stream(
+                query=user_query,
+                context=prepared['context'],
+                sources=prepared['sources'],
+                query_analysis=prepared['query_analysis'],
+                history=prepared['history']
+            ):
+                if event == 'delta':
+                    if first_token:
+                        first_token = False
+                        TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - started)
+                    yield sse_event('delta', {'text': payload})
+                else:
+                    prepared['response'] = payload
+                    prepared['generated'] = True
+                    finish_chat(prepared, payload)
+                    flight.finish(prepared)
+                    yield sse_event('done', with_conversation(payload, conversation))
+        except Exception as e:
+            flight.fail(e)
+            print(f"Error streaming chat response: {e}")
+            print(traceback.format_exc())
+            yield sse_event('done', with_conversation(ERROR_RESPONSE, conversation))
+    
+    # Request latency stops when the headers go out; time the whole stream too
+    admission.callback(lambda: STREAM_SECONDS.observe(time.perf_counter() - started))
+    response = Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    response.call_on_close(admission.close)
+    return response
+
+@app.route('/api/conversations/<conversation_id>', methods=['DELETE'])
+def delete_conversation(conversation_id):
+    """Forget a conversation's history, e.g. when the student clears the chat
+    
+    Allowed for whoever holds the server-issued id, or with the admin token.
+    """
+    if not (session_manager.exists(conversation_id) or is_admin_request()):
+        return jsonify({'error': 'Conversation not found'}), 404
+    session_manager.delete(conversation_id)
+    return jsonify({'deleted': conversation_id})
+
+def health_status() -> dict:
+    """Component and cache status, shared by the WSGI and ASGI health endpoints
+    
+    'status' is 'starting' while the knowledge base and embedding model load
+    in the background, 'degraded' if that load failed, else 'healthy'.
+    """
     status = {
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
+        'pid': os.getpid(),
         'components': {
             'data_manager': data_manager is not None,
             'query_processor': query_processor is not None,
@@ -103,11 +751,61 @@ def health():
     
     if data_manager:
         status['knowledge_base'] = {
-            'documents_loaded': len(data_manager.documents),
-            'embeddings_ready': data_manager.embeddings is not None
+            'documents_loaded': len(data_manager.sections),
+            'chunks_indexed': len(data_manager.documents),
+            'embeddings_ready': data_manager.embeddings is not None,
+            'embedding_model': data_manager.embedding_model_id,
+            **data_manager.reload_status()
         }
+        status['query_embedding_cache'] = data_manager.query_cache.stats()
+        status['ready'] = data_manager.ready
+        if data_manager.readiness['state'] == 'failed':
+            status['status'] = 'degraded'
+        elif not data_manager.ready:
+            status['status'] = 'starting'
+    if response_generator:
+        status['openai_breaker'] = response_generator.breaker.stats()
+    status['answer_cache'] = answer_cache.stats()
+    status['admission'] = {'rate_limit': rate_limiter.stats(), 'concurrency': chat_gate.stats()}
+    status['sessions'] = session_manager.stats()
+    status['coalescing'] = {**chat_flights.stats(), 'openai_calls_saved': OPENAI_CALLS_SAVED.value()}
+    status['chat_log'] = chat_logger.stats()
+    
+    return status
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics: request and pipeline stage latency histograms, token usage, cache hit rates"""
+    return Response(REGISTRY.render(), content_type=REGISTRY.CONTENT_TYPE)
+
+@app.route('/health', methods=['GET'])
+def health():
+    """Health check endpoint"""
+    return jsonify(health_status())
+
+def is_admin_token(provided_token: str) -> bool:
+    """Whether provided_token is the configured ADMIN_TOKEN"""
+    admin_token = os.getenv('ADMIN_TOKEN', '')
+    return bool(admin_token) and hmac.compare_digest(provided_token or '', admin_token)
+
+def is_admin_request() -> bool:
+    """Whether the request carries the configured ADMIN_TOKEN in X-Admin-Token"""
+    return is_admin_token(request.headers.get('X-Admin-Token', ''))
+
+@app.route('/api/admin/reload', methods=['POST'])
+def reload_knowledge_base():
+    """Rebuild the knowledge base in the background and swap it in when ready"""
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
     
-    return jsonify(status)
+    if not data_manager:
+        return jsonify({'error': 'Knowledge base not initialized'}), 503
+    
+    started = data_manager.reload_in_background()
+    return jsonify({
+        'status': 'reloading' if started else 'reload_already_in_progress',
+        'generation': data_manager.generation
+    }), 202
 
 @app.route('/api/test', methods=['POST'])
 def test_simple():
@@ -125,20 +823,43 @@ def test_simple():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def log_interaction(query: str, response_data: dict):
-    """Log chat interactions for analysis"""
+def log_interaction(prepared: dict, response_data: dict, outcome: str):
+    """Queue a structured record of a chat interaction for the chat log
+    
+    outcome is one of generated, cached, escalated (Tier 3), starting_up,
+    degraded, coalesced (answered by an identical in-flight request) or error.
+    """
     try:
-        log_entry = {
-            'timestamp': datetime.now().isoformat(),
-            'query': query,
-            'response': response_data.get('answer', ''),
-            'sources_count': len(response_data.get('sources', [])),
-            'escalation_triggered': response_data.get('escalation_required', False)
-        }
-        
-        # You can extend this to write to a file or database
-        print(f"Logged interaction: {json.dumps(log_entry, indent=2)}")
+        query_analysis = prepared['query_analysis']
+        trace = current_trace()
+        latency_ms = {}
+        tokens = dict(prepared['token_usage'] or {})
+        if trace is not None:
+            latency_ms = {stage: round(seconds * 1000, 2) for stage, seconds in trace.spans.items()}
+            latency_ms['total'] = round(trace.elapsed() * 1000, 2)
+            for key in ('prompt_tokens', 'completion_tokens'):
+                if key in trace.values:
+                    tokens[key] = trace.values[key]
         
+        chat_logger.log({
+            'timestamp': datetime.now().isoformat(),
+            'trace_id': trace.trace_id if trace is not None else None,
+            'query': prepared['query'],
+            'retrieval_query': query_analysis['cleaned_query'],
+            'conversation_id': prepared['conversation']['id'] if prepared.get('conversation') else None,
+            'outcome': outcome,
+            'safeguard_tier': query_analysis['safeguard_tier'],
+            'query_type': query_analysis['query_type'],
+            'matched_keywords': query_analysis.get('matched_keywords', {}),
+            'knowledge_base_generation': prepared['generation'],
+            'sources': response_data.get('sources', []),
+            'retrieval_scores': prepared['scores'],
+            'confidence': response_data.get('confidence'),
+            'response_chars': len(response_data.get('answer') or response_data.get('response') or ''),
+            'escalation': bool(response_data.get('escalation_recommended') or response_data.get('escalation_required')),
+            'latency_ms': latency_ms,
+            'tokens': tokens
+        })
     except Exception as e:
         print(f"Error logging interaction: {e}")
 
@@ -0,0 +1,334 @@
+"""
+ASGI (asyncio) serving mode for the chat API
+
+Serves the same /api/chat, /api/chat/stream, /api/conversations, /health and
+/metrics payloads as app.py, but OpenAI calls use the async client and query
+embedding / similarity search run on a thread pool, so one process can hold
+hundreds of concurrent chats while they wait on the network.
+
+Run with:
+    cd backend && uvicorn asgi:app --host 0.0.0.0 --port 5003
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+# Components and pipeline stages are shared with the Flask app
+import app as chat_app
+from admission import Overloaded
+from metrics import STREAM_SECONDS, TIME_TO_FIRST_TOKEN
+from single_flight import AsyncFlight
+from app import (ERROR_RESPONSE, OVERLOADED_RESPONSE, RATE_LIMITED_RESPONSE, TECHNICAL_DIFFICULTIES_RESPONSE,
+                 sse_event, with_conversation)
+
+# Embedding and search are CPU-bound; keep them off the event loop
+retrieval_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('ASGI_RETRIEVAL_THREADS', '4')),
+    thread_name_prefix='retrieval'
+)
+
+
+def components_ready() -> bool:
+    return all([chat_app.data_manager, chat_app.query_processor, chat_app.response_generator])
+
+
+async def prepare_chat(user_query: str, query_analysis: dict = None, conversation: dict = None) -> dict:
+    """Run the synchronous pre-generation stages on the retrieval thread pool"""
+    loop = asyncio.get_running_loop()
+    # Run in a copy of this context so stage timings land in the request's trace
+    return await loop.run_in_executor(retrieval_executor, contextvars.copy_context().run,
+                                      chat_app.prepare_chat, user_query, query_analysis, conversation)
+
+
+async def run_admitted_chat(user_query: str, query_analysis: dict, conversation: dict = None) -> dict:
+    """run_chat once a pipeline slot is free; raises Overloaded if none frees up in time"""
+    async with chat_app.chat_gate.aslot():
+        return await run_chat(user_query, query_analysis, conversation)
+
+
+async def run_chat(user_query: str, query_analysis: dict, conversation: dict = None) -> dict:
+    """Async variant of app.run_chat: the /api/chat pipeline using the async OpenAI client"""
+    prepared = await prepare_chat(user_query, query_analysis, conversation)
+    if prepared['response'] is None:
+        prepared['response'] = await chat_app.response_generator.agenerate_response(
+            query=user_query,
+            context=prepared['context'],
+            sources=prepared['sources'],
+            query_analysis=prepared['query_analysis'],
+            history=prepared['history']
+        )
+        prepared['generated'] = True
+        chat_app.finish_chat(prepared, prepared['response'])
+    return prepared
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """StreamingResponse that releases its pipeline slot once the stream ends, fails or the client disconnects"""
+
+    def __init__(self, content, admission: contextlib.AsyncExitStack, **kwargs):
+        super().__init__(content, **kwargs)
+        self.admission = admission
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.admission.aclose()
+
+
+async def get_user_query(request: Request) -> str:
+    data = await request.json()
+    return data.get('message', data.get('query', '')).strip()
+
+
+async def process_turn(request: Request, user_query: str) -> tuple:
+    """app.process_turn with the request's conversation id"""
+    return chat_app.process_turn(user_query, chat_app.conversation_id_from(await request.json()))
+
+
+async def chat(request: Request):
+    try:
+        user_query = await get_user_query(request)
+
+        if not user_query:
+            return JSONResponse({'error': 'Empty query provided'}, status_code=400)
+
+        print(f"Received query: {user_query}")
+
+        if not components_ready():
+            return JSONResponse(TECHNICAL_DIFFICULTIES_RESPONSE)
+
+        query_analysis, conversation = await process_turn(request, user_query)
+
+        # Tier 3 is always admitted: the escalation response is static and never refused
+        if query_analysis['requires_immediate_escalation']:
+            prepared = chat_app.prepare_chat(user_query, query_analysis, conversation)
+            return JSONResponse(with_conversation(prepared['response'], conversation))
+
+        client = request.client.host if request.client else None
+        retry_after = chat_app.rate_limit_retry_after(chat_app.client_id(client, request.headers.get('x-forwarded-for')))
+        if retry_after:
+            return JSONResponse(RATE_LIMITED_RESPONSE, status_code=429, headers={'Retry-After': retry_after})
+
+        # Identical questions already being answered are not answered again
+        prepared, shared = await chat_app.chat_flights.ado(
+            chat_app.coalesce_key(query_analysis, conversation),
+            lambda: run_admitted_chat(user_query, query_analysis, conversation)
+        )
+        if shared:
+            chat_app.share_chat(prepared, conversation)
+        if prepared['starting_up']:
+            return JSONResponse(with_conversation(prepared['response'], conversation), status_code=503,
+                                headers={'Retry-After': chat_app.STARTUP_RETRY_AFTER})
+        if prepared['unavailable']:
+            return JSONResponse(with_conversation(prepared['response'], conversation), status_code=503)
+
+        return JSONResponse(with_conversation(prepared['response'], conversation))
+
+    except Overloaded as e:
+        chat_app.ADMISSION_REJECTED.inc(reason='overloaded')
+        print(f"Chat request turned away: {e}")
+        return JSONResponse(OVERLOADED_RESPONSE, status_code=503,
+                            headers={'Retry-After': str(chat_app.chat_gate.retry_after())})
+    except Exception as e:
+        print(f"Error in chat endpoint: {e}")
+        print(traceback.format_exc())
+        return JSONResponse(ERROR_RESPONSE, status_code=500)
+
+
+async def chat_stream(request: Request):
+    """Server-sent events variant, same event sequence as the Flask endpoint"""
+    started = time.perf_counter()
+    # Holds the pipeline slot until the response has been sent, i.e. for the whole stream
+    admission = contextlib.AsyncExitStack()
+    # Only admitted questions are coalesced; others lead a flight nobody can join
+    flight = AsyncFlight()
+    conversation = None
+    try:
+        user_query = await get_user_query(request)
+
+        if not user_query:
+            return JSONResponse({'error': 'Empty query provided'}, status_code=400)
+
+        print(f"Received streaming query: {user_query}")
+
+        if not components_ready():
+            prepared = {'response': TECHNICAL_DIFFICULTIES_RESPONSE}
+        else:
+            query_analysis, conversation = await process_turn(request, user_query)
+            leader = True
+
+            # Tier 3 is always admitted, as on /api/chat
+            if not query_analysis['requires_immediate_escalation']:
+                client = chat_app.client_id(request.client.host if request.client else None,
+                                            request.headers.get('x-forwarded-for'))
+                retry_after = chat_app.rate_limit_retry_after(client)
+                if retry_after:
+                    return JSONResponse(RATE_LIMITED_RESPONSE, status_code=429, headers={'Retry-After': retry_after})
+
+                # Identical questions already being answered are not answered again:
+                # the first request streams, the others replay its finished response
+                flight, leader = chat_app.chat_flights.astart(chat_app.coalesce_key(query_analysis, conversation))
+                if leader:
+                    admission.callback(flight.fail, RuntimeError("Chat stream closed before it finished"))
+                    await admission.enter_async_context(chat_app.chat_gate.aslot())
+
+            if leader:
+                prepared = await prepare_chat(user_query, query_analysis, conversation)
+                if prepared['response'] is not None:
+                    flight.finish(prepared)
+            else:
+                prepared = await flight.wait()
+                chat_app.share_chat(prepared, conversation)
+
+    except Overloaded as e:
+        flight.fail(e)
+        chat_app.ADMISSION_REJECTED.inc(reason='overloaded')
+        print(f"Chat stream request turned away: {e}")
+        return JSONResponse(OVERLOADED_RESPONSE, status_code=503,
+                            headers={'Retry-After': str(chat_app.chat_gate.retry_after())})
+    except Exception as e:
+        flight.fail(e)
+        await admission.aclose()
+        print(f"Error in chat stream endpoint: {e}")
+        print(traceback.format_exc())
+        return JSONResponse(ERROR_RESPONSE, status_code=500)
+    except BaseException:
+        # Cancelled, e.g. the client went away: free the slot and end the flight for any followers
+        await admission.aclose()
+        raise
+
+    async def events():
+        # Already answered: Tier 3 escalation, cache hit or unavailable components
+        if prepared['response'] is not None:
+            response_data = prepared['response']
+            yield sse_event('meta', {
+                'sources': response_data.get('sources', []),
+                'safeguard_tier': response_data.get('safeguard_tier')
+            })
+            yield sse_event('done', with_conversation(response_data, conversation))
+            return
+
+        yield sse_event('meta', {
+            'sources': prepared['sources'],
+            'safeguard_tier': prepared['query_analysis']['safeguard_tier']
+        })
+
+        first_token = True
+        try:
+            async for event, payload in chat_app.response_generator.agenerate_response_stream(
+                query=prepared['query'],
+                context=prepared['context'],
+                sources=prepared['sources'],
+                query_analysis=prepared['query_analysis'],
+                history=prepared['history']
+            ):
+                if event == 'delta':
+                    if first_token:
+                        first_token = False
+                        TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - started)
+                    yield sse_event('delta', {'text': payload})
+                else:
+                    prepared['response'] = payload
+                    prepared['generated'] = True
+                    chat_app.finish_chat(prepared, payload)
+                    flight.finish(prepared)
+                    yield sse_event('done', with_conversation(payload, conversation))
+        except Exception as e:
+            flight.fail(e)
+            print(f"Error streaming chat response: {e}")
+            print(traceback.format_exc())
+            yield sse_event('done', with_conversation(ERROR_RESPONSE, conversation))
+
+    # Time the whole stream, as on the Flask app
+    admission.callback(lambda: STREAM_SECONDS.observe(time.perf_counter() - started))
+    return AdmittedStreamingResponse(
+        events(),
+        admission,
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+async def delete_conversation(request: Request):
+    """Forget a conversation's history, as served by the Flask app"""
+    conversation_id = request.path_params['conversation_id']
+    if not (chat_app.session_manager.exists(conversation_id)
+            or chat_app.is_admin_token(request.headers.get('x-admin-token', ''))):
+        return JSONResponse({'error': 'Conversation not found'}, status_code=404)
+    chat_app.session_manager.delete(conversation_id)
+    return JSONResponse({'deleted': conversation_id})
+
+
+async def health(request: Request):
+    """Health check endpoint"""
+    return JSONResponse(chat_app.health_status())
+
+
+async def metrics(request: Request):
+    """Prometheus metrics, as served by the Flask app"""
+    return Response(chat_app.REGISTRY.render(), media_type=chat_app.REGISTRY.CONTENT_TYPE)
+
+
+class TraceMiddleware:
+    """Per-request trace id header and request metrics, like the Flask app's request hooks"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        trace = chat_app.begin_trace(Headers(scope=scope))
+        status = 500
+
+        async def send_with_trace_id(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                MutableHeaders(scope=message).append('X-Trace-Id', trace.trace_id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        finally:
+            endpoint = getattr(scope.get('endpoint'), '__name__', 'unknown')
+            chat_app.end_trace(trace, endpoint, status)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    yield
+    retrieval_executor.shutdown(wait=False)
+
+
+app = Starlette(
+    routes=[
+        Route('/api/chat', chat, methods=['POST']),
+        Route('/api/chat/stream', chat_stream, methods=['POST']),
+        Route('/api/conversations/{conversation_id}', delete_conversation, methods=['DELETE']),
+        Route('/health', health, methods=['GET']),
+        Route('/metrics', metrics, methods=['GET']),
+    ],
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'],
+                   expose_headers=['X-Trace-Id']),
+        Middleware(TraceMiddleware)
+    ],
+    lifespan=lifespan
+)
@@ -0,0 +1,100 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+from vector_index import top_k_indices
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Words too common to say anything about which section a query is about
+STOPWORDS = frozenset("""
+a about after all also am an and any are as at be been before being but by can could did do does
+doing for from had has have having he her here him his how i if in into is it its just me more most
+my no not of on or our out over please should so some such than that the their them then there
+these they this those through to too under up very was we were what when where which while who
+whom why will with would you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased alphanumeric terms of a text, stopwords removed"""
+    return [term for term in TOKEN_PATTERN.findall(text.lower()) if term not in STOPWORDS]
+
+
+class BM25Index:
+    """In-memory inverted index with Okapi BM25 scoring
+
+    Every posting list stores the documents containing a term together with
+    that term's precomputed BM25 weight in each of them, so scoring a query is
+    a handful of scatter-adds into one score array.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.size = 0
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def build(self, texts: Iterable[str]) -> 'BM25Index':
+        term_docs = {}
+        term_counts = {}
+        lengths = []
+
+        for doc_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                term_docs.setdefault(term, []).append(doc_id)
+                term_counts.setdefault(term, []).append(count)
+
+        self.size = len(lengths)
+        lengths = np.asarray(lengths, dtype=np.float32)
+        average_length = float(lengths.mean()) if self.size and lengths.sum() else 1.0
+        # Per-document length normalisation of the BM25 term frequency
+        norms = self.k1 * (1 - self.b + self.b * lengths / average_length)
+
+        self.postings = {}
+        for term, doc_ids in term_docs.items():
+            doc_ids = np.asarray(doc_ids, dtype=np.int32)
+            counts = np.asarray(term_counts[term], dtype=np.float32)
+            idf = math.log(1 + (self.size - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            weights = idf * counts * (self.k1 + 1) / (counts + norms[doc_ids])
+            self.postings[term] = (doc_ids, weights.astype(np.float32))
+        return self
+
+    def search(self, query: str, top_k: int = 10, min_coverage: float = 0.0) -> List[Tuple[int, float]]:
+        """Top-k (document index, BM25 score) pairs, best first
+
+        min_coverage is the fraction of the query's distinct terms a document
+        must contain to be returned at all.
+        """
+        terms = set(tokenize(query))
+        if not terms or self.size == 0 or top_k <= 0:
+            return []
+
+        scores = np.zeros(self.size, dtype=np.float32)
+        matched = np.zeros(self.size, dtype=np.int16)
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is not None:
+                doc_ids, weights = posting
+                scores[doc_ids] += weights
+                matched[doc_ids] += 1
+
+        required = max(1, math.ceil(min_coverage * len(terms)))
+        candidates = np.flatnonzero(matched >= required)
+        if len(candidates) == 0:
+            return []
+
+        best = top_k_indices(scores[candidates], top_k)
+        return [(int(candidates[i]), float(scores[candidates[i]])) for i in best]
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """Fuse several rankings of document indices: score = sum of 1 / (k + rank)"""
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
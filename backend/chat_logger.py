@@ -0,0 +1,148 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+
+class ChatLogger:
+    """Asynchronous, batched JSON-lines interaction log
+
+    log() never blocks and never raises: entries go onto a bounded queue and
+    are dropped (and counted) when it is full. A daemon writer thread drains
+    the queue, writing up to `batch_size` entries at a time once that many are
+    waiting or `flush_interval` seconds have passed since the first of them.
+    Files are named chat-<start time>-<pid>.jsonl, so pre-forked workers never
+    share one, and a new file is started once the current one reaches
+    `max_bytes` or is `max_age` seconds old.
+    """
+
+    def __init__(self, directory: str = "data/chat_logs", max_queue: int = 10000, batch_size: int = 256,
+                 flush_interval: float = 1.0, max_bytes: int = 50 * 1024 * 1024, max_age: float = 86400,
+                 enabled: bool = True):
+        self.directory = directory
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.enabled = enabled
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_pid = None
+        self._file = None
+        self._file_path = None
+        self._file_opened = 0.0
+        self.logged = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.files = 0
+        atexit.register(self.flush, 2.0)
+
+    def log(self, entry: Dict) -> bool:
+        """Queue an entry for writing; False if logging is off or the queue is full"""
+        if not self.enabled:
+            return False
+        try:
+            self._ensure_writer()
+            self._queue.put_nowait(entry)
+            self.logged += 1
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+        except Exception as e:
+            self.dropped += 1
+            print(f"Error queueing chat log entry: {e}")
+            return False
+
+    def _ensure_writer(self):
+        # Started on first use in each process: a writer started before a fork
+        # does not exist in the forked workers
+        if self._writer_pid == os.getpid():
+            return
+        with self._lock:
+            if self._writer_pid != os.getpid():
+                self._file = None
+                self._writer = threading.Thread(target=self._run, name="chat-log-writer", daemon=True)
+                self._writer_pid = os.getpid()
+                self._writer.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write(self, batch):
+        try:
+            lines = "".join(json.dumps(entry, default=str, ensure_ascii=False) + "\n" for entry in batch)
+            self._rotate_if_needed()
+            self._file.write(lines)
+            self._file.flush()
+            self.written += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            print(f"Error writing chat log: {e}")
+            self._close_file()
+
+    def _rotate_if_needed(self):
+        if self._file is not None:
+            too_big = self.max_bytes and self._file.tell() >= self.max_bytes
+            too_old = self.max_age and time.time() - self._file_opened >= self.max_age
+            if not (too_big or too_old):
+                return
+            self._close_file()
+
+        os.makedirs(self.directory, exist_ok=True)
+        timestamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        self._file_path = os.path.join(self.directory, f"chat-{timestamp}-{os.getpid()}.jsonl")
+        self._file = open(self._file_path, 'a', encoding='utf-8')
+        self._file_opened = time.time()
+        self.files += 1
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until every queued entry has been written (or failed); False on timeout"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and self._writer_pid == os.getpid():
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stats(self) -> Dict:
+        """Counters for monitoring"""
+        return {
+            'enabled': self.enabled,
+            'directory': self.directory,
+            'current_file': self._file_path,
+            'queued': self._queue.qsize(),
+            'logged': self.logged,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'files': self.files
+        }
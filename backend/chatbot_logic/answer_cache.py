@@ -0,0 +1,131 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """Cache of formatted responses looked up by query embedding similarity
+
+    A cached response is only served for a query whose normalized embedding is
+    within `threshold` cosine similarity of the cached query, with the same
+    safeguard tier and knowledge base generation. Only tiers listed in
+    `cacheable_tiers` are ever stored (Tier 1 by default), so cautious and
+    critical queries always get a fresh response.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: float = 600, threshold: float = 0.95,
+                 cacheable_tiers: Iterable[int] = (1,)):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self.cacheable_tiers = set(cacheable_tiers)
+        self._lock = threading.Lock()
+
+        # Fixed-size slot arrays so a lookup is one matrix-vector product
+        self._vectors = None
+        self._tiers = np.zeros(maxsize, dtype=np.int16)
+        self._generations = np.zeros(maxsize, dtype=np.int64)
+        self._stored_at = np.zeros(maxsize, dtype=np.float64)
+        self._valid = np.zeros(maxsize, dtype=bool)
+        self._responses = [None] * maxsize
+        self._lru = OrderedDict()  # slot -> None, least recently used first
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and bool(self.cacheable_tiers)
+
+    def lookup(self, query_embedding: np.ndarray, safeguard_tier: int, generation: int) -> Optional[Dict]:
+        """Return a copy of the cached response for a similar enough query, or None"""
+        if not self.enabled or safeguard_tier not in self.cacheable_tiers:
+            return None
+
+        with self._lock:
+            if self._vectors is None or not self._valid.any():
+                self.misses += 1
+                return None
+
+            self._expire(time.monotonic())
+            candidates = self._valid & (self._tiers == safeguard_tier) & (self._generations == generation)
+            if not candidates.any():
+                self.misses += 1
+                return None
+
+            scores = self._vectors @ np.asarray(query_embedding, dtype=np.float32)
+            scores[~candidates] = -np.inf
+            slot = int(np.argmax(scores))
+            if scores[slot] < self.threshold:
+                self.misses += 1
+                return None
+
+            self._lru.move_to_end(slot)
+            self.hits += 1
+            return dict(self._responses[slot])
+
+    def store(self, query_embedding: np.ndarray, safeguard_tier: int, generation: int, response: Dict):
+        """Cache a formatted response for later similar queries"""
+        if not self.enabled or safeguard_tier not in self.cacheable_tiers:
+            return
+
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.maxsize, len(query_embedding)), dtype=np.float32)
+
+            now = time.monotonic()
+            self._expire(now)
+            free_slots = np.flatnonzero(~self._valid)
+            if len(free_slots):
+                slot = int(free_slots[0])
+            else:
+                slot, _ = self._lru.popitem(last=False)
+                self.evictions += 1
+
+            self._vectors[slot] = query_embedding
+            self._tiers[slot] = safeguard_tier
+            self._generations[slot] = generation
+            self._stored_at[slot] = now
+            self._valid[slot] = True
+            self._responses[slot] = dict(response)
+            self._lru[slot] = None
+            self._lru.move_to_end(slot)
+
+    def _expire(self, now: float):
+        if not self.ttl:
+            return
+        expired = np.flatnonzero(self._valid & (now - self._stored_at > self.ttl))
+        for slot in expired:
+            self._drop(int(slot))
+            self.expirations += 1
+
+    def _drop(self, slot: int):
+        self._valid[slot] = False
+        self._responses[slot] = None
+        self._lru.pop(slot, None)
+
+    def clear(self):
+        with self._lock:
+            for slot in np.flatnonzero(self._valid):
+                self._drop(int(slot))
+
+    def stats(self) -> Dict:
+        """Counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'size': int(self._valid.sum()),
+            'maxsize': self.maxsize,
+            'ttl_seconds': self.ttl,
+            'threshold': self.threshold,
+            'cacheable_tiers': sorted(self.cacheable_tiers),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
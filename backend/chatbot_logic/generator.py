@@ -1,8 +1,13 @@
 import os
-from openai import OpenAI
-from typing import Dict, List, Optional
+import time
+import httpx
+from openai import AsyncOpenAI, OpenAI
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
 import json
 from dotenv import load_dotenv
+from token_counter import get_token_encoding
+from metrics import record_token_usage, span
+from chatbot_logic.resilience import CircuitBreaker, RetryPolicy, acall_with_retry, call_with_retry
 
 # Load environment variables
 load_dotenv()
@@ -10,7 +15,40 @@ load_dotenv()
 
 class ResponseGenerator:
     def __init__(self):
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        # Per-attempt timeouts, jittered retries within an overall deadline, and a
+        # circuit breaker that switches to retrieval-only answers while OpenAI is failing or slow
+        self.retry_policy = RetryPolicy(
+            max_retries=int(os.getenv('OPENAI_MAX_RETRIES', '2')),
+            base_delay=float(os.getenv('OPENAI_BACKOFF_BASE', '0.5')),
+            max_delay=float(os.getenv('OPENAI_BACKOFF_MAX', '8')),
+            deadline=float(os.getenv('OPENAI_DEADLINE', '30')),
+            timeout=float(os.getenv('OPENAI_TIMEOUT', '20')),
+            connect_timeout=float(os.getenv('OPENAI_CONNECT_TIMEOUT', '5'))
+        )
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv('OPENAI_BREAKER_FAILURES', '5')),
+            reset_timeout=float(os.getenv('OPENAI_BREAKER_RESET_SECONDS', '30')),
+            slow_call_seconds=float(os.getenv('OPENAI_SLOW_CALL_SECONDS', '10'))
+        )
+        self.degraded_answer_chars = int(os.getenv('DEGRADED_ANSWER_CHARS', '1200'))
+        
+        # One pooled HTTP transport per client, reused by every request. The SDK's
+        # own retries are off: call_with_retry retries within the deadline instead
+        limits = httpx.Limits(
+            max_connections=int(os.getenv('OPENAI_MAX_CONNECTIONS', '100')),
+            max_keepalive_connections=int(os.getenv('OPENAI_MAX_KEEPALIVE', '20')),
+            keepalive_expiry=float(os.getenv('OPENAI_KEEPALIVE_EXPIRY', '30'))
+        )
+        timeout = httpx.Timeout(self.retry_policy.timeout, connect=self.retry_policy.connect_timeout)
+        self.client = OpenAI(
+            api_key=os.getenv('OPENAI_API_KEY'), max_retries=0, timeout=timeout,
+            http_client=httpx.Client(limits=limits, timeout=timeout, follow_redirects=True)
+        )
+        # Used by the ASGI server so requests don't hold a thread while waiting on OpenAI
+        self.async_client = AsyncOpenAI(
+            api_key=os.getenv('OPENAI_API_KEY'), max_retries=0, timeout=timeout,
+            http_client=httpx.AsyncClient(limits=limits, timeout=timeout, follow_redirects=True)
+        )
         self.model = "gpt-3.5-turbo"
         
         # System prompt for the LBS chatbot
@@ -40,7 +78,8 @@ SAFEGUARD TIERS:
 
 Context will be provided for each query. Base your responses strictly on this context."""
 
-    def generate_response(self, query: str, context: str, sources: List[str], query_analysis: Dict) -> Dict[str, any]:
+    def generate_response(self, query: str, context: str, sources: List[str], query_analysis: Dict,
+                          history: List[Dict[str, str]] = None) -> Dict[str, any]:
         """Generate a response using OpenAI based on the provided context and safeguard tier"""
         
         try:
@@ -51,55 +90,209 @@ Context will be provided for each query. Base your responses strictly on this co
             if safeguard_tier == 3:
                 return query_analysis.get('tier_3_response', self._get_tier_3_escalation_response())
             
-            # Tier 2 & 1: Generate AI response with appropriate guidance
-            user_message = self._prepare_user_message(query, context, sources, safeguard_tier)
-            
             # Generate response using OpenAI
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": user_message}
-                ],
-                temperature=0.3,  # Lower temperature for more consistent responses
-                max_tokens=500
-            )
+            with span('openai'):
+                response = call_with_retry(
+                    self.client.chat.completions.create, self.retry_policy, self.breaker,
+                    model=self.model,
+                    messages=self._build_messages(query, context, sources, safeguard_tier, history),
+                    temperature=0.3,  # Lower temperature for more consistent responses
+                    max_tokens=500
+                )
+            record_token_usage(getattr(response, 'usage', None))
             
             generated_text = response.choices[0].message.content.strip()
+            with span('format'):
+                return self._format_response(generated_text, context, sources, safeguard_tier)
             
-            # Format response based on safeguard tier
-            if safeguard_tier == 2:
-                # Tier 2: Cautious response with strong recommendation for human contact
-                enhanced_response = f"""{generated_text}
-
-**⚠️ Important:** This topic often requires personalized guidance. I strongly recommend speaking with a staff member who can provide tailored advice for your specific situation."""
+        except Exception as e:
+            # Includes UpstreamUnavailable when the circuit breaker is open
+            print(f"Error generating response: {e}")
+            return self._get_degraded_response(query, context, sources, query_analysis.get('safeguard_tier', 1))
+    
+    def generate_response_stream(self, query: str, context: str, sources: List[str], query_analysis: Dict,
+                                 history: List[Dict[str, str]] = None) -> Iterator[Tuple[str, any]]:
+        """Stream a response as ('delta', text) events followed by one ('done', formatted_response)
+        
+        The final formatted response is identical to what generate_response returns,
+        so clients can replace the streamed text with it once generation finishes.
+        """
+        safeguard_tier = query_analysis.get('safeguard_tier', 1)
+        
+        # Tier 3: Immediate escalation - don't generate AI response
+        if safeguard_tier == 3:
+            yield 'done', query_analysis.get('tier_3_response', self._get_tier_3_escalation_response())
+            return
+        
+        streaming_since = None
+        try:
+            with span('openai'):
+                stream = call_with_retry(
+                    self.client.chat.completions.create, self.retry_policy, self.breaker,
+                    model=self.model,
+                    messages=self._build_messages(query, context, sources, safeguard_tier, history),
+                    temperature=0.3,  # Lower temperature for more consistent responses
+                    max_tokens=500,
+                    stream=True,
+                    # Ask for a final chunk carrying the token usage
+                    extra_body={'stream_options': {'include_usage': True}}
+                )
+                streaming_since = time.monotonic()
                 
-                formatted_response = {
-                    "answer": enhanced_response,
-                    "sources": sources,
-                    "escalation_recommended": True,
-                    "escalation_text": "Speak with Program Office Staff",
-                    "escalation_link": "mailto:mam-mim@london.edu?subject=Need Personal Guidance",
-                    "confidence": "medium",
-                    "safeguard_tier": 2
-                }
-            else:
-                # Tier 1: Normal response
-                formatted_response = {
-                    "answer": generated_text,
-                    "sources": sources,
-                    "escalation_available": True,
-                    "escalation_text": "Need more help? Contact the Program Office",
-                    "escalation_link": "mailto:mam-mim@london.edu?subject=Student Inquiry",
-                    "confidence": "high" if context else "low",
-                    "safeguard_tier": 1
-                }
+                chunks = []
+                for chunk in stream:
+                    record_token_usage(getattr(chunk, 'usage', None))
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        chunks.append(delta)
+                        yield 'delta', delta
             
-            return formatted_response
+            streaming_since = None  # Fully received
+            generated_text = "".join(chunks).strip()
+            with span('format'):
+                formatted = self._format_response(generated_text, context, sources, safeguard_tier)
+            yield 'done', formatted
             
         except Exception as e:
+            # call_with_retry only saw the stream open; one that breaks partway is a failed call too
+            if streaming_since is not None:
+                self.breaker.record(False, time.monotonic() - streaming_since)
+            print(f"Error streaming response: {e}")
+            yield 'done', self._get_degraded_response(query, context, sources, safeguard_tier)
+    
+    async def agenerate_response(self, query: str, context: str, sources: List[str], query_analysis: Dict,
+                                 history: List[Dict[str, str]] = None) -> Dict[str, any]:
+        """Async variant of generate_response using the async OpenAI client"""
+        
+        try:
+            safeguard_tier = query_analysis.get('safeguard_tier', 1)
+            
+            # Tier 3: Immediate escalation - don't generate AI response
+            if safeguard_tier == 3:
+                return query_analysis.get('tier_3_response', self._get_tier_3_escalation_response())
+            
+            with span('openai'):
+                response = await acall_with_retry(
+                    self.async_client.chat.completions.create, self.retry_policy, self.breaker,
+                    model=self.model,
+                    messages=self._build_messages(query, context, sources, safeguard_tier, history),
+                    temperature=0.3,  # Lower temperature for more consistent responses
+                    max_tokens=500
+                )
+            record_token_usage(getattr(response, 'usage', None))
+            
+            generated_text = response.choices[0].message.content.strip()
+            with span('format'):
+                return self._format_response(generated_text, context, sources, safeguard_tier)
+            
+        except Exception as e:
+            # Includes UpstreamUnavailable when the circuit breaker is open
             print(f"Error generating response: {e}")
-            return self._get_fallback_response(query)
+            return self._get_degraded_response(query, context, sources, query_analysis.get('safeguard_tier', 1))
+    
+    async def agenerate_response_stream(self, query: str, context: str, sources: List[str], query_analysis: Dict,
+                                        history: List[Dict[str, str]] = None) -> AsyncIterator[Tuple[str, any]]:
+        """Async variant of generate_response_stream using the async OpenAI client"""
+        safeguard_tier = query_analysis.get('safeguard_tier', 1)
+        
+        # Tier 3: Immediate escalation - don't generate AI response
+        if safeguard_tier == 3:
+            yield 'done', query_analysis.get('tier_3_response', self._get_tier_3_escalation_response())
+            return
+        
+        streaming_since = None
+        try:
+            with span('openai'):
+                stream = await acall_with_retry(
+                    self.async_client.chat.completions.create, self.retry_policy, self.breaker,
+                    model=self.model,
+                    messages=self._build_messages(query, context, sources, safeguard_tier, history),
+                    temperature=0.3,  # Lower temperature for more consistent responses
+                    max_tokens=500,
+                    stream=True,
+                    # Ask for a final chunk carrying the token usage
+                    extra_body={'stream_options': {'include_usage': True}}
+                )
+                streaming_since = time.monotonic()
+                
+                chunks = []
+                async for chunk in stream:
+                    record_token_usage(getattr(chunk, 'usage', None))
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        chunks.append(delta)
+                        yield 'delta', delta
+            
+            streaming_since = None  # Fully received
+            generated_text = "".join(chunks).strip()
+            with span('format'):
+                formatted = self._format_response(generated_text, context, sources, safeguard_tier)
+            yield 'done', formatted
+            
+        except Exception as e:
+            # call_with_retry only saw the stream open; one that breaks partway is a failed call too
+            if streaming_since is not None:
+                self.breaker.record(False, time.monotonic() - streaming_since)
+            print(f"Error streaming response: {e}")
+            yield 'done', self._get_degraded_response(query, context, sources, safeguard_tier)
+    
+    def _build_messages(self, query: str, context: str, sources: List[str], safeguard_tier: int,
+                        history: List[Dict[str, str]] = None) -> List[Dict[str, str]]:
+        """Chat messages for a Tier 1 or Tier 2 query, after any earlier turns of its conversation"""
+        user_message = self._prepare_user_message(query, context, sources, safeguard_tier)
+        return [
+            {"role": "system", "content": self.system_prompt},
+            *(history or []),
+            {"role": "user", "content": user_message}
+        ]
+    
+    def count_prompt_tokens(self, query: str, context: str, sources: List[str], safeguard_tier: int,
+                            history: List[Dict[str, str]] = None) -> int:
+        """Prompt tokens the chat messages for a query will cost, including chat formatting"""
+        encoding = get_token_encoding(self.model)
+        messages = self._build_messages(query, context, sources, safeguard_tier, history)
+        # Each message is framed by ~3 tokens plus its role, and the reply is primed with 3 more
+        return sum(
+            3 + len(encoding.encode(message['role'])) + len(encoding.encode(message['content']))
+            for message in messages
+        ) + 3
+    
+    def prompt_overhead_tokens(self, query: str, safeguard_tier: int, history: List[Dict[str, str]] = None) -> int:
+        """Prompt tokens taken by the system prompt, conversation history and user template before any context is added"""
+        return self.count_prompt_tokens(query, " ", [], safeguard_tier, history)
+    
+    def _format_response(self, generated_text: str, context: str, sources: List[str], safeguard_tier: int) -> Dict[str, any]:
+        """Format generated text into the response payload for its safeguard tier"""
+        if safeguard_tier == 2:
+            # Tier 2: Cautious response with strong recommendation for human contact
+            enhanced_response = f"""{generated_text}
+
+**⚠️ Important:** This topic often requires personalized guidance. I strongly recommend speaking with a staff member who can provide tailored advice for your specific situation."""
+            
+            return {
+                "answer": enhanced_response,
+                "sources": sources,
+                "escalation_recommended": True,
+                "escalation_text": "Speak with Program Office Staff",
+                "escalation_link": "mailto:mam-mim@london.edu?subject=Need Personal Guidance",
+                "confidence": "medium",
+                "safeguard_tier": 2
+            }
+        
+        # Tier 1: Normal response
+        return {
+            "answer": generated_text,
+            "sources": sources,
+            "escalation_available": True,
+            "escalation_text": "Need more help? Contact the Program Office",
+            "escalation_link": "mailto:mam-mim@london.edu?subject=Student Inquiry",
+            "confidence": "high" if context else "low",
+            "safeguard_tier": 1
+        }
     
     def _prepare_user_message(self, query: str, context: str, sources: List[str], safeguard_tier: int = 1) -> str:
         """Prepare the user message with context and sources, adjusted for safeguard tier"""
@@ -178,6 +371,27 @@ Your wellbeing is the top priority. Please reach out for help - you don't have t
             "safeguard_tier": 3
         }
     
+    def _get_degraded_response(self, query: str, context: str, sources: List[str], safeguard_tier: int) -> Dict[str, any]:
+        """Retrieval-only response used when OpenAI fails or its circuit breaker is open
+        
+        Answers with the best matching knowledge base passages and their sources
+        instead of a generated answer; without any context it is the fallback response.
+        """
+        excerpt = (context or "").strip()
+        if not excerpt:
+            return self._get_fallback_response(query)
+        if len(excerpt) > self.degraded_answer_chars:
+            excerpt = excerpt[:self.degraded_answer_chars].rsplit(None, 1)[0] + " ..."
+        
+        answer = f"""I can't write a full answer right now, but these passages from the Program Office guidance look most relevant to your question:
+
+{excerpt}
+
+If this doesn't answer your question, please contact the Program Office."""
+        response = self._format_response(answer, context, sources, safeguard_tier)
+        response['confidence'] = 'degraded'
+        return response
+    
     def _get_fallback_response(self, query: str) -> Dict[str, any]:
         """Get fallback response when OpenAI fails"""
         return {
@@ -0,0 +1,80 @@
+import re
+from typing import Dict, Iterable, List
+
+
+class KeywordMatcher:
+    """Finds every occurrence of many keyword lists in one pass over a text
+
+    All keywords are folded into a character trie and compiled into a single
+    lookahead regex, so at each position of the text the regex engine follows
+    one trie branch (like an Aho-Corasick automaton) and reports the longest
+    keyword starting there. Every other keyword starting at that position is a
+    prefix of the longest one and is recovered from a precomputed table. The
+    result is the same set of matches as a separate `keyword in text` scan per
+    keyword: plain substring semantics, overlaps included.
+    """
+
+    def __init__(self, keyword_lists: Dict[str, Iterable[str]]):
+        self.categories = list(keyword_lists)
+        self._order = {}  # (category, keyword) -> position in its list
+        categories_by_keyword = {}
+
+        for category, keywords in keyword_lists.items():
+            for position, keyword in enumerate(keywords):
+                if not keyword:
+                    continue
+                self._order.setdefault((category, keyword), position)
+                categories_by_keyword.setdefault(keyword, set()).add(category)
+
+        trie = {}
+        for keyword in categories_by_keyword:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[''] = True
+
+        self._pattern = re.compile('(?=(' + self._trie_regex(trie) + '))') if trie else None
+
+        # For each keyword, the (category, keyword) hits implied by finding it:
+        # itself plus every shorter keyword that is a prefix of it
+        self._hits = {
+            keyword: tuple(
+                (category, prefix)
+                for prefix in categories_by_keyword if keyword.startswith(prefix)
+                for category in categories_by_keyword[prefix]
+            )
+            for keyword in categories_by_keyword
+        }
+
+    @classmethod
+    def _trie_regex(cls, node: Dict) -> str:
+        """Regex for a trie node; optional groups are greedy so the longest keyword wins"""
+        branches = [re.escape(char) + cls._trie_regex(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            body = '(?:' + body + ')?'
+        return body
+
+    def match(self, text: str) -> Dict[str, List[str]]:
+        """Return the keywords of each category found in text, in keyword-list order
+
+        text is matched as given; callers lower-case it first.
+        """
+        found = {category: [] for category in self.categories}
+        longest_matches = set(self._pattern.findall(text)) if self._pattern is not None else ()
+        if not longest_matches:
+            return found
+
+        hits = set()
+        for longest in longest_matches:
+            hits.update(self._hits[longest])
+
+        for category, keyword in hits:
+            found[category].append(keyword)
+        for category, keywords in found.items():
+            if len(keywords) > 1:
+                keywords.sort(key=lambda keyword: self._order[(category, keyword)])
+        return found
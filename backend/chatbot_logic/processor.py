@@ -1,5 +1,6 @@
 import re
 from typing import Dict, List, Tuple
+from chatbot_logic.keyword_matcher import KeywordMatcher
 
 
 class QueryProcessor:
@@ -40,13 +41,37 @@ class QueryProcessor:
             'speak to someone', 'talk to staff', 'human help', 'escalate',
             'need to talk', 'counselor', 'advisor', 'dean'
         ]
+        
+        # Query types, checked in order - the first type with a keyword match wins
+        self.query_type_keywords = [
+            ('academic', ['assignment', 'exam', 'test', 'grade', 'submit', 'deadline', 'assessment', 'deferral']),
+            ('administrative', ['transcript', 'enrollment', 'registration', 'fee', 'payment', 'schedule']),
+            ('technical', ['canvas', 'login', 'access', 'technical', 'password', 'download']),
+            ('policy', ['policy', 'rule', 'regulation', 'attendance', 'plagiarism', 'integrity']),
+            ('wellness', ['mental health', 'stress', 'anxiety', 'support', 'counseling'])
+        ]
+        
+        # Compile every keyword list into one matcher so a single pass over the
+        # lowered query yields the safeguard tier, query type and matched keywords
+        self.keyword_matcher = KeywordMatcher({
+            'escalation': self.escalation_triggers,
+            'critical': self.critical_keywords,
+            'cautious': self.cautious_keywords,
+            **dict(self.query_type_keywords)
+        })
     
     def process_query(self, query: str) -> Dict[str, any]:
         """Process and analyze the input query with 3-tier safeguard system"""
         processed_query = self.clean_query(query)
         
-        # Determine safeguard tier
-        safeguard_tier = self.determine_safeguard_tier(query)
+        # One keyword pass over the original query decides the safeguard tier
+        query_lower = query.lower()
+        matches = self.keyword_matcher.match(query_lower)
+        safeguard_tier = self._tier_from_matches(matches)
+        
+        # The query type is classified on the cleaned query; only rescan if cleaning changed it
+        cleaned_lower = processed_query.lower()
+        type_matches = matches if cleaned_lower == query_lower else self.keyword_matcher.match(cleaned_lower)
         
         analysis = {
             'cleaned_query': processed_query,
@@ -54,48 +79,16 @@ class QueryProcessor:
             'safeguard_tier': safeguard_tier,
             'requires_immediate_escalation': safeguard_tier == 3,
             'requires_cautious_response': safeguard_tier == 2,
-            'query_type': self.classify_query_type(processed_query),
-            'confidence_threshold': self.get_confidence_threshold(safeguard_tier)
+            'query_type': self._type_from_matches(type_matches),
+            'confidence_threshold': self.get_confidence_threshold(safeguard_tier),
+            'matched_keywords': {category: keywords for category, keywords in matches.items() if keywords}
         }
         
         return analysis
     
-    def determine_safeguard_tier(self, query: str) -> int:
-        """Determine which safeguard tier applies to the query
-        
-        Returns:
-            1: Normal - AI can handle directly
-            2: Cautious - Provide basic info + strong recommendation for human contact
-            3: Critical - Direct to resources immediately, no AI discussion
-        """
-        query_lower = query.lower()
-        
-        # Check for manual escalation requests first
-        for trigger in self.escalation_triggers:
-            if trigger in query_lower:
-                return 2  # User wants human contact
-        
-        # Check for Tier 3 (Critical) - Most sensitive topics
-        for keyword in self.critical_keywords:
-            if keyword in query_lower:
-                return 3
-        
-        # Check for Tier 2 (Cautious) - Moderately sensitive topics
-        for keyword in self.cautious_keywords:
-            if keyword in query_lower:
-                return 2
-        
-        # Default to Tier 1 (Normal) - Safe topics
-        return 1
-    
-    def get_confidence_threshold(self, safeguard_tier: int) -> float:
-        """Get confidence threshold based on safeguard tier"""
-        if safeguard_tier == 1:
-            return 0.7  # Higher threshold for normal queries
-        elif safeguard_tier == 2:
-            return 0.5  # Lower threshold, allow more cautious responses
-        else:  # Tier 3
-            return 0.0  # No threshold needed, direct escalation
+    def process_queries(self, queries: List[str]) -> List[Dict[str, any]]:
+        """process_query for many queries, e.g. when replaying logged questions"""
+        return [self.process_query(query) for query in queries]
     
     def clean_query(self, query: str) -> str:
         """Clean and normalize the query"""
@@ -115,22 +108,20 @@ class QueryProcessor:
             2: Cautious - Provide basic info + strong recommendation for human contact
             3: Critical - Direct to resources immediately, no AI discussion
         """
-        query_lower = query.lower()
-        
-        # Check for manual escalation requests first
-        for trigger in self.escalation_triggers:
-            if trigger in query_lower:
-                return 2  # User wants human contact
+        return self._tier_from_matches(self.keyword_matcher.match(query.lower()))
+    
+    def _tier_from_matches(self, matches: Dict[str, List[str]]) -> int:
+        # Manual escalation requests take precedence: the user wants human contact
+        if matches['escalation']:
+            return 2
         
-        # Check for Tier 3 (Critical) - Most sensitive topics
-        for keyword in self.critical_keywords:
-            if keyword in query_lower:
-                return 3
+        # Tier 3 (Critical) - Most sensitive topics
+        if matches['critical']:
+            return 3
         
-        # Check for Tier 2 (Cautious) - Moderately sensitive topics
-        for keyword in self.cautious_keywords:
-            if keyword in query_lower:
-                return 2
+        # Tier 2 (Cautious) - Moderately sensitive topics
+        if matches['cautious']:
+            return 2
         
         # Default to Tier 1 (Normal) - Safe topics
         return 1
@@ -146,31 +137,15 @@ class QueryProcessor:
     
     def classify_query_type(self, query: str) -> str:
         """Classify the type of query"""
-        query_lower = query.lower()
-        
-        # Academic/Assessment related
-        if any(word in query_lower for word in ['assignment', 'exam', 'test', 'grade', 'submit', 'deadline', 'assessment', 'deferral']):
-            return 'academic'
-        
-        # Administrative
-        elif any(word in query_lower for word in ['transcript', 'enrollment', 'registration', 'fee', 'payment', 'schedule']):
-            return 'administrative'
-        
-        # Technical/Canvas
-        elif any(word in query_lower for word in ['canvas', 'login', 'access', 'technical', 'password', 'download']):
-            return 'technical'
-        
-        # Policy related
-        elif any(word in query_lower for word in ['policy', 'rule', 'regulation', 'attendance', 'plagiarism', 'integrity']):
-            return 'policy'
-        
-        # Wellness/Support
-        elif any(word in query_lower for word in ['mental health', 'stress', 'anxiety', 'support', 'counseling']):
-            return 'wellness'
+        return self._type_from_matches(self.keyword_matcher.match(query.lower()))
+    
+    def _type_from_matches(self, matches: Dict[str, List[str]]) -> str:
+        for query_type, _ in self.query_type_keywords:
+            if matches[query_type]:
+                return query_type
         
         # General inquiry
-        else:
-            return 'general'
+        return 'general'
     
     def get_tier_3_escalation_response(self) -> Dict[str, any]:
         """Get immediate escalation response for Tier 3 queries"""
@@ -0,0 +1,206 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+import httpx
+import openai
+from metrics import REGISTRY
+
+OPENAI_CALLS = REGISTRY.counter(
+    'chatbot_openai_calls_total',
+    'OpenAI calls by outcome (success, error, rejected while the circuit breaker is open)',
+    ['outcome']
+)
+OPENAI_RETRIES = REGISTRY.counter('chatbot_openai_retries_total', 'OpenAI attempts retried after a transient error')
+
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of calling OpenAI while the circuit breaker is open"""
+
+
+class RetryPolicy:
+    """Jittered exponential backoff for transient OpenAI errors, within an overall deadline
+
+    Rate limits (429), server errors (5xx), timeouts and connection errors are
+    retried up to `max_retries` times. Each delay is drawn uniformly from
+    [0, min(max_delay, base_delay * 2**attempt)] ("full jitter", so workers
+    that failed together don't retry together), but is never shorter than a
+    Retry-After the server sent. No attempt starts or runs past `deadline`
+    seconds after the first one.
+    """
+
+    def __init__(self, max_retries: int = 2, base_delay: float = 0.5, max_delay: float = 8.0,
+                 deadline: float = 30.0, timeout: float = 20.0, connect_timeout: float = 5.0):
+        self.max_retries = max(0, max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        if isinstance(error, openai.APIConnectionError):  # Includes APITimeoutError
+            return True
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code == 429 or error.status_code >= 500
+        return False
+
+    def delay(self, attempt: int, error: Exception) -> float:
+        """Seconds to wait before retry number `attempt` + 1"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = self._retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        response = getattr(error, 'response', None)
+        if response is None:
+            return None
+        try:
+            return max(0.0, float(response.headers.get('retry-after')))
+        except (TypeError, ValueError):
+            return None
+
+    def attempt_timeout(self, remaining: float) -> httpx.Timeout:
+        """Timeout for one attempt: the per-attempt timeout, cut short by the deadline"""
+        timeout = max(0.001, min(self.timeout, remaining))
+        return httpx.Timeout(timeout, connect=min(self.connect_timeout, timeout))
+
+
+class CircuitBreaker:
+    """Stops calling OpenAI after repeated failures or slow calls, then probes it again
+
+    Closed: calls go through. After `failure_threshold` consecutive failed
+    calls (a call slower than `slow_call_seconds` counts as failed) it opens,
+    and for `reset_timeout` seconds calls are refused straight away so the
+    chatbot can answer in degraded mode instead of waiting on a struggling
+    upstream. Then one trial call is let through (half-open): success closes
+    the breaker, failure opens it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, slow_call_seconds: float = 10.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.slow_call_seconds = slow_call_seconds
+        self.clock = clock
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go to OpenAI now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record(self, success: bool, elapsed: float = 0.0):
+        """Record the outcome of a call allowed through"""
+        failed = not success or (self.slow_call_seconds and elapsed > self.slow_call_seconds)
+        with self._lock:
+            self._trial_in_flight = False
+            if not failed:
+                self.consecutive_failures = 0
+                self.state = self.CLOSED
+                return
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                    print(f"OpenAI circuit breaker opened after {self.consecutive_failures} failed or slow calls")
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+
+    def stats(self) -> Dict:
+        """Breaker state for /health"""
+        return {
+            'state': self.state,
+            'consecutive_failures': self.consecutive_failures,
+            'times_opened': self.times_opened,
+            'failure_threshold': self.failure_threshold,
+            'reset_timeout': self.reset_timeout,
+            'slow_call_seconds': self.slow_call_seconds
+        }
+
+
+def call_with_retry(create: Callable, policy: RetryPolicy, breaker: CircuitBreaker, **kwargs):
+    """Call `create(**kwargs)` (e.g. chat.completions.create) with retries, deadline and circuit breaker"""
+    if not breaker.allow():
+        OPENAI_CALLS.inc(outcome='rejected')
+        raise UpstreamUnavailable("OpenAI circuit breaker is open")
+    started = time.monotonic()
+    deadline = started + policy.deadline
+    attempt = 0
+    while True:
+        try:
+            response = create(timeout=policy.attempt_timeout(deadline - time.monotonic()), **kwargs)
+        except Exception as e:
+            delay = _retry_delay(policy, attempt, e, deadline)
+            if delay is None:
+                breaker.record(False, time.monotonic() - started)
+                OPENAI_CALLS.inc(outcome='error')
+                raise
+            print(f"OpenAI call failed ({e}), retrying in {delay:.2f}s")
+            OPENAI_RETRIES.inc()
+            attempt += 1
+            time.sleep(delay)
+            continue
+        breaker.record(True, time.monotonic() - started)
+        OPENAI_CALLS.inc(outcome='success')
+        return response
+
+
+async def acall_with_retry(create: Callable, policy: RetryPolicy, breaker: CircuitBreaker, **kwargs):
+    """Async variant of call_with_retry for the async OpenAI client"""
+    if not breaker.allow():
+        OPENAI_CALLS.inc(outcome='rejected')
+        raise UpstreamUnavailable("OpenAI circuit breaker is open")
+    started = time.monotonic()
+    deadline = started + policy.deadline
+    attempt = 0
+    while True:
+        try:
+            response = await create(timeout=policy.attempt_timeout(deadline - time.monotonic()), **kwargs)
+        except Exception as e:
+            delay = _retry_delay(policy, attempt, e, deadline)
+            if delay is None:
+                breaker.record(False, time.monotonic() - started)
+                OPENAI_CALLS.inc(outcome='error')
+                raise
+            print(f"OpenAI call failed ({e}), retrying in {delay:.2f}s")
+            OPENAI_RETRIES.inc()
+            attempt += 1
+            await asyncio.sleep(delay)
+            continue
+        breaker.record(True, time.monotonic() - started)
+        OPENAI_CALLS.inc(outcome='success')
+        return response
+
+
+def _retry_delay(policy: RetryPolicy, attempt: int, error: Exception, deadline: float) -> Optional[float]:
+    # None when the error should be raised: not transient, out of retries, or
+    # no time left before the deadline for another attempt after the delay
+    if attempt >= policy.max_retries or not policy.is_retryable(error):
+        return None
+    delay = policy.delay(attempt, error)
+    if time.monotonic() + delay >= deadline - 0.05:
+        return None
+    return delay
@@ -0,0 +1,95 @@
+from bisect import bisect_left, bisect_right
+from typing import Dict, List
+from token_counter import get_token_encoding
+
+
+class Chunker:
+    """Splits knowledge base sections into overlapping token windows
+
+    Each chunk keeps its section's title and source, and records which section
+    it came from, its position in that section and its character span in the
+    section content, so neighbouring chunks can be merged back together after
+    retrieval. Window edges are moved to the nearest word boundary.
+
+    max_tokens <= 0 disables splitting: every section becomes a single chunk.
+    """
+
+    def __init__(self, max_tokens: int = 256, overlap_tokens: int = 48, model_name: str = "gpt-3.5-turbo"):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = max(0, min(overlap_tokens, max_tokens // 2))
+        self.model_name = model_name
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_tokens > 0
+
+    def chunk_documents(self, sections: List[Dict]) -> List[Dict]:
+        """Chunks of every section, in section order"""
+        chunks = []
+        for section_index, section in enumerate(sections):
+            chunks.extend(self.split_document(section, section_index))
+        return chunks
+
+    def split_document(self, section: Dict, section_index: int) -> List[Dict]:
+        """Split one title/content/source section into overlapping chunks"""
+        content = section['content']
+        if not self.enabled:
+            return [self._make_chunk(section, section_index, 0, 1, 0, len(content), None)]
+
+        encoding = get_token_encoding(self.model_name)
+        tokens = encoding.encode(content)
+        if len(tokens) <= self.max_tokens:
+            return [self._make_chunk(section, section_index, 0, 1, 0, len(content), len(tokens))]
+
+        # Character offset of every token, plus the end of the text
+        _, offsets = encoding.decode_with_offsets(tokens)
+        offsets = list(offsets) + [len(content)]
+        # Tokens that begin a word: a window may start or end there without cutting a word
+        word_starts = [i for i in range(len(tokens)) if i == 0 or content[offsets[i]:offsets[i] + 1].isspace()]
+
+        windows = []
+        start = 0
+        while True:
+            end = min(start + self.max_tokens, len(tokens))
+            if end < len(tokens):
+                end = self._boundary_before(word_starts, end, start)
+            windows.append((start, end))
+            if end >= len(tokens):
+                break
+            start = self._boundary_after(word_starts, end - self.overlap_tokens, start, end)
+
+        return [
+            self._make_chunk(section, section_index, position, len(windows),
+                             offsets[start], offsets[end], end - start)
+            for position, (start, end) in enumerate(windows)
+        ]
+
+    @staticmethod
+    def _boundary_before(word_starts: List[int], position: int, lower: int) -> int:
+        """Last word start in (lower, position], or position if the word is longer than a window"""
+        i = bisect_right(word_starts, position) - 1
+        return word_starts[i] if i >= 0 and word_starts[i] > lower else position
+
+    @staticmethod
+    def _boundary_after(word_starts: List[int], position: int, lower: int, upper: int) -> int:
+        """First word start in [position, upper), always making progress past lower"""
+        position = max(position, lower + 1)
+        i = bisect_left(word_starts, position)
+        return word_starts[i] if i < len(word_starts) and word_starts[i] < upper else position
+
+    @staticmethod
+    def _make_chunk(section: Dict, section_index: int, position: int, count: int,
+                    start: int, end: int, token_count) -> Dict:
+        text = section['content'][start:end].strip()
+        return {
+            'title': section['title'],
+            'content': text,
+            'source': section['source'],
+            'full_text': f"{section['title']}: {text}",
+            'section': section_index,
+            'chunk': position,
+            'chunk_count': count,
+            'start': start,
+            'end': end,
+            'tokens': token_count
+        }
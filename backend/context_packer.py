@@ -0,0 +1,122 @@
+import re
+from typing import Dict, List
+from token_counter import get_token_encoding
+
+# Sentence boundaries used to find text repeated across passages
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+
+class ContextPacker:
+    """Fills a prompt token budget with the most useful retrieved passages
+
+    `budget_tokens` covers the whole prompt; the caller passes the tokens
+    already taken by the system prompt and user template as `reserved_tokens`,
+    and the rest is filled with passages in order of retrieval score
+    (fused score in hybrid mode, else similarity) per token. Passages that don't fit are skipped rather than ending the packing,
+    sentences repeated from a better ranked passage are dropped, and the
+    best passage is cut to size if nothing fits whole.
+    """
+
+    def __init__(self, budget_tokens: int = 1500, model_name: str = "gpt-3.5-turbo"):
+        self.budget_tokens = budget_tokens
+        self.model_name = model_name
+
+    def pack(self, passages: List[Dict], reserved_tokens: int = 0) -> Dict:
+        """Return context text, sources, retrieval scores and a token report for passages ranked best first"""
+        encoding = get_token_encoding(self.model_name)
+        available = max(0, self.budget_tokens - reserved_tokens)
+
+        def cost(passage_text: str, source: str, sources: List[str]) -> int:
+            # The passage plus its separator, and a line in the sources list if the source is new
+            tokens = len(encoding.encode(passage_text + "\n"))
+            if source and source not in sources:
+                tokens += len(encoding.encode(f"- {source}\n"))
+            return tokens
+
+        # Each repeated sentence is kept only in the best ranked passage containing it
+        candidates = []
+        scores = {}  # Retrieval scores of each candidate, by rank
+        seen_sentences = set()
+        duplicate_sentences = 0
+        for rank, passage in enumerate(passages):
+            sentences = [sentence for sentence in SENTENCE_BOUNDARY.split(passage['content']) if sentence.strip()]
+            fresh = []
+            for sentence in sentences:
+                key = " ".join(sentence.lower().split())
+                if key not in seen_sentences:
+                    seen_sentences.add(key)
+                    fresh.append(sentence)
+            duplicate_sentences += len(sentences) - len(fresh)
+            if not fresh:
+                continue
+
+            text = self._passage_text(passage['title'], " ".join(fresh))
+            score = passage.get('fusion_score', passage.get('similarity_score', 0.0))
+            density = score / max(1, cost(text, passage['source'], []))
+            candidates.append((density, rank, text, passage['source']))
+            scores[rank] = {
+                'title': passage['title'],
+                'source': passage['source'],
+                'similarity': passage.get('similarity_score'),
+                'bm25': passage.get('bm25_score'),
+                'fusion': passage.get('fusion_score')
+            }
+        candidates.sort(key=lambda candidate: (-candidate[0], candidate[1]))
+
+        selected = []  # (rank, passage text, source)
+        sources = []
+        used = 0
+        for _, rank, text, source in candidates:
+            tokens = cost(text, source, sources)
+            if used + tokens > available:
+                if selected:
+                    continue
+                # Nothing fits yet: cut this passage down rather than sending no context
+                source_tokens = tokens - len(encoding.encode(text + "\n"))
+                text = self._truncate(text, available - source_tokens, encoding)
+                if not text:
+                    continue
+                tokens = cost(text, source, sources)
+
+            selected.append((rank, text, source))
+            if source and source not in sources:
+                sources.append(source)
+            used += tokens
+
+        # Present passages in relevance order, whatever order they were packed in
+        selected.sort(key=lambda item: item[0])
+        sources = []
+        for _, _, source in selected:
+            if source and source not in sources:
+                sources.append(source)
+        context = "\n".join(text for _, text, _ in selected)
+
+        return {
+            'context': context,
+            'sources': sources,
+            'scores': [scores[rank] for rank, _, _ in selected],
+            'tokens': {
+                'budget': self.budget_tokens,
+                'reserved': reserved_tokens,
+                'context': used,
+                'total': reserved_tokens + used,
+                'passages': len(selected),
+                'candidates': len(passages),
+                'duplicate_sentences': duplicate_sentences
+            }
+        }
+
+    @staticmethod
+    def _passage_text(title: str, content: str) -> str:
+        return f"**{title}**\n{content}\n"
+
+    @staticmethod
+    def _truncate(text: str, max_tokens: int, encoding) -> str:
+        """Cut text to at most max_tokens tokens (including its separator) at a word boundary"""
+        if max_tokens <= 8:
+            return ""
+        tokens = encoding.encode(text)[:max_tokens - 4]
+        truncated = encoding.decode(tokens)
+        if " " in truncated:
+            truncated = truncated[:truncated.rfind(" ")]
+        return truncated.rstrip() + "...\n"
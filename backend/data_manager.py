@@ -1,170 +1,685 @@
 import os
 import re
+import copy
+import threading
+import time
+import traceback
+from datetime import datetime
 from typing import List, Dict, Tuple
-from sentence_transformers import SentenceTransformer
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-import pickle
+from bm25_index import BM25Index, reciprocal_rank_fusion
+from chunker import Chunker
+from context_packer import ContextPacker
+from embedding_store import EmbeddingStore, document_hash
+from lru_cache import LRUCache
+from metrics import span
+from vector_index import VectorIndex, create_index, normalize_embeddings, similarity_scores, top_k_indices
+
+
+class KnowledgeBaseState:
+    """One consistent snapshot of the searchable knowledge base
+    
+    Reloads build a complete new state off to the side and DataManager swaps
+    it in with a single assignment, so a request that grabbed the previous
+    state keeps using matching documents, embeddings and index.
+    
+    `documents` are the searchable chunks (one row of `embeddings` each);
+    `sections` are the parsed knowledge base sections they were cut from.
+    """
+    
+    def __init__(self, documents: List[Dict], embeddings: np.ndarray = None, index: VectorIndex = None,
+                 embeddings_version: str = "", report: Dict = None, generation: int = 0,
+                 sections: List[Dict] = None, sparse_index: BM25Index = None):
+        self.documents = documents
+        self.sections = sections if sections is not None else documents
+        self.sparse_index = sparse_index
+        self.embeddings = embeddings
+        self.index = index
+        self.embeddings_version = embeddings_version
+        self.report = report or {'encoded': 0, 'reused': 0, 'dropped': 0, 'total': len(documents)}
+        self.generation = generation
 
 
 class DataManager:
-    def __init__(self, knowledge_base_path: str = "data/knowledge_base.txt"):
+    def __init__(self, knowledge_base_path: str = "data/knowledge_base.txt", load: bool = True):
         self.knowledge_base_path = knowledge_base_path
-        self.documents = []
-        self.embeddings = None
+        self._state = KnowledgeBaseState([])
         self.model = None
-        self.embeddings_cache_path = "data/embeddings_cache.pkl"
-        self.load_data()
+        self.model_name = os.getenv('EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+        # Embedding backend: 'torch' (SentenceTransformer) or 'onnx' (ONNX Runtime,
+        # int8-quantized unless ONNX_QUANTIZE=false). Vectors from different
+        # backends are not interchangeable, so stored and cached embeddings are
+        # keyed by model and backend and switching re-embeds the knowledge base.
+        self.embedding_backend = os.getenv('EMBEDDING_BACKEND', 'torch').lower()
+        self.onnx_quantize = os.getenv('ONNX_QUANTIZE', 'true').lower() in ('1', 'true', 'yes')
+        if self.embedding_backend == 'onnx':
+            self.embedding_model_id = f"{self.model_name}+onnx{'-int8' if self.onnx_quantize else ''}"
+        else:
+            self.embedding_model_id = self.model_name
+        # Memory-mapped embeddings keyed by document content hash and model
+        self.embedding_store = EmbeddingStore("data/embeddings")
+        # Vector index configuration: 'flat' (exact) or 'ivf' (approximate);
+        # nprobe trades recall for latency on the ivf index
+        self.index_type = os.getenv('VECTOR_INDEX', 'flat').lower()
+        self.index_nlist = int(os.getenv('VECTOR_INDEX_NLIST', '0'))
+        self.index_nprobe = int(os.getenv('VECTOR_INDEX_NPROBE', '8'))
+        # Storage precision of the normalized embedding matrix: float32 or float16
+        self.embedding_dtype = np.dtype(os.getenv('EMBEDDING_DTYPE', 'float32'))
+        # Sections are embedded as overlapping windows measured in chat model tokens
+        self.chunker = Chunker(
+            max_tokens=int(os.getenv('CHUNK_MAX_TOKENS', '256')),
+            overlap_tokens=int(os.getenv('CHUNK_OVERLAP_TOKENS', '48')),
+            model_name=os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')
+        )
+        # Number of chunks retrieved per query, before neighbouring chunks are merged
+        self.retrieval_top_k = int(os.getenv('RETRIEVAL_TOP_K', '5'))
+        # Retrieval mode: 'dense' (embeddings), 'sparse' (BM25) or 'hybrid'
+        # (both, fused by reciprocal rank)
+        self.retrieval_mode = os.getenv('RETRIEVAL_MODE', 'hybrid').lower()
+        self.hybrid_candidates = int(os.getenv('HYBRID_CANDIDATES', '20'))
+        self.rrf_k = int(os.getenv('HYBRID_RRF_K', '60'))
+        # Fraction of the query's terms a BM25 hit must contain to count as relevant
+        self.sparse_min_coverage = float(os.getenv('SPARSE_MIN_COVERAGE', '0.5'))
+        # Above this many chunks, dense scoring only covers the top BM25 candidates (0 = off)
+        self.sparse_prefilter = int(os.getenv('SPARSE_PREFILTER', '0'))
+        # Retrieved passages are packed into a prompt budget measured in model tokens
+        self.context_packer = ContextPacker(
+            budget_tokens=int(os.getenv('PROMPT_TOKEN_BUDGET', '1500')),
+            model_name=self.chunker.model_name
+        )
+        # Embeddings of recent queries, so repeated questions skip the transformer
+        self.query_cache = LRUCache(
+            maxsize=int(os.getenv('QUERY_CACHE_SIZE', '1024')),
+            ttl=float(os.getenv('QUERY_CACHE_TTL', '3600'))
+        )
+        # Reloads are serialised; readers never wait on them
+        self._reload_lock = threading.Lock()
+        self.reload_in_progress = False
+        self.last_reload = {'timestamp': None, 'error': None}
+        # Startup progress; retrieval is only served once the state is 'ready'
+        self.readiness = {'state': 'not_loaded', 'error': None, 'load_seconds': None}
+        if load:
+            self.load()
+    
+    @property
+    def ready(self) -> bool:
+        """Whether the embedding model and knowledge base have finished loading"""
+        return self.readiness['state'] == 'ready'
+    
+    def load(self):
+        """Initial load of the knowledge base, embedding model and index"""
+        self.readiness = {'state': 'loading', 'error': None, 'load_seconds': None}
+        started = time.perf_counter()
+        try:
+            with self._reload_lock:
+                self.load_data()
+        except Exception as e:
+            self.readiness = {'state': 'failed', 'error': str(e),
+                              'load_seconds': round(time.perf_counter() - started, 2)}
+            raise
+        self.readiness = {'state': 'ready', 'error': None, 'load_seconds': round(time.perf_counter() - started, 2)}
+        print(f"Knowledge base ready in {self.readiness['load_seconds']}s")
+    
+    def load_in_background(self) -> threading.Thread:
+        """Run the initial load on a background thread so the server can start immediately"""
+        def run():
+            try:
+                self.load()
+            except Exception as e:
+                print(f"Error loading knowledge base: {e}")
+                print(traceback.format_exc())
+        
+        self.readiness = {'state': 'loading', 'error': None, 'load_seconds': None}
+        loader = threading.Thread(target=run, name="kb-load", daemon=True)
+        loader.start()
+        return loader
+    
+    @property
+    def state(self) -> KnowledgeBaseState:
+        """The current knowledge base snapshot"""
+        return self._state
+    
+    @property
+    def documents(self) -> List[Dict]:
+        """The searchable chunks"""
+        return self._state.documents
+    
+    @property
+    def sections(self) -> List[Dict]:
+        return self._state.sections
+    
+    @property
+    def embeddings(self) -> np.ndarray:
+        return self._state.embeddings
+    
+    @property
+    def index(self) -> VectorIndex:
+        return self._state.index
+    
+    @property
+    def embeddings_version(self) -> str:
+        return self._state.embeddings_version
+    
+    @property
+    def last_reload_report(self) -> Dict:
+        return self._state.report
+    
+    @property
+    def generation(self) -> int:
+        """Incremented every time a new knowledge base snapshot is swapped in"""
+        return self._state.generation
     
     def load_data(self):
-        """Load and parse the knowledge base from text file"""
+        """Load and parse the knowledge base from text file, then swap in the new snapshot"""
+        started = time.perf_counter()
         try:
-            with open(self.knowledge_base_path, 'r', encoding='utf-8') as file:
-                content = file.read()
-            
-            # Split content by section separators (---) or by ## headers
-            # First, remove the main header if it exists
-            lines = content.split('\n')
-            processed_lines = []
-            skip_main_header = True
-            
-            for line in lines:
-                if line.startswith('# ') and skip_main_header:
-                    skip_main_header = False
-                    continue
-                if line.strip():  # Skip empty lines after main header
-                    skip_main_header = False
-                    processed_lines.append(line)
-                elif not skip_main_header:
-                    processed_lines.append(line)
-            
-            content = '\n'.join(processed_lines)
-            
-            # Split by section separators (---) - handle both \n---\n and standalone ---
-            sections = re.split(r'\n?---\n?', content)
-            
-            for section in sections:
-                section = section.strip()
-                if section:  # Process any non-empty section
-                    # Extract title and content
-                    lines = section.split('\n')
-                    title = ""
-                    content_text = ""
-                    source = ""
-                    
-                    for line in lines:
-                        if line.startswith('## ') or line.startswith('### '):
-                            # Handle both ## and ### headers
-                            title = line.replace('## ', '').replace('### ', '').strip()
-                        elif line.startswith('Source: '):
-                            source = line.replace('Source: ', '').strip()
-                        elif line.strip() and not line.startswith('#') and not line.startswith('Source: ') and not line.startswith('---'):
-                            # Include all content lines, including those with formatting
-                            content_text += line.strip() + " "
-                    
-                    if title and content_text:
-                        self.documents.append({
-                            'title': title,
-                            'content': content_text.strip(),
-                            'source': source,
-                            'full_text': f"{title}: {content_text.strip()}"
-                        })
-            
-            print(f"Loaded {len(self.documents)} documents from knowledge base")
-            if len(self.documents) > 0:
-                print("Document titles:", [doc['title'] for doc in self.documents])
-            self.initialize_embeddings()
-            
+            sections = self.parse_documents()
         except FileNotFoundError:
             print(f"Knowledge base file not found: {self.knowledge_base_path}")
-            self.documents = []
+            self._swap_state(KnowledgeBaseState([]))
+            return
+        
+        print(f"Loaded {len(sections)} documents from knowledge base")
+        if len(sections) > 0:
+            # Large knowledge bases would print megabytes of titles
+            more = f" (and {len(sections) - 50} more)" if len(sections) > 50 else ""
+            print(f"Document titles: {[doc['title'] for doc in sections[:50]]}{more}")
+        
+        parsed = time.perf_counter()
+        chunks = self.chunker.chunk_documents(sections)
+        print(f"Split into {len(chunks)} chunks")
+        chunked = time.perf_counter()
+        state = self.initialize_embeddings(chunks)
+        state.sections = sections
+        sparse_started = time.perf_counter()
+        state.sparse_index = self.build_sparse_index(chunks)
+        # Time spent in each loading phase, for /health and scaling benchmarks
+        state.report.update({
+            'parse_seconds': round(parsed - started, 3),
+            'chunk_seconds': round(chunked - parsed, 3),
+            'sparse_index_seconds': round(time.perf_counter() - sparse_started, 3)
+        })
+        self._swap_state(state)
+    
+    def parse_documents(self) -> List[Dict]:
+        """Parse the knowledge base file into title/content/source documents"""
+        documents = []
+        with open(self.knowledge_base_path, 'r', encoding='utf-8') as file:
+            content = file.read()
+        
+        # Split content by section separators (---) or by ## headers
+        # First, remove the main header if it exists
+        lines = content.split('\n')
+        processed_lines = []
+        skip_main_header = True
+        
+        for line in lines:
+            if line.startswith('# ') and skip_main_header:
+                skip_main_header = False
+                continue
+            if line.strip():  # Skip empty lines after main header
+                skip_main_header = False
+                processed_lines.append(line)
+            elif not skip_main_header:
+                processed_lines.append(line)
+        
+        content = '\n'.join(processed_lines)
+        
+        # Split by section separators (---) - handle both \n---\n and standalone ---
+        sections = re.split(r'\n?---\n?', content)
+        
+        for section in sections:
+            section = section.strip()
+            if section:  # Process any non-empty section
+                # Extract title and content
+                lines = section.split('\n')
+                title = ""
+                content_text = ""
+                source = ""
+                
+                for line in lines:
+                    if line.startswith('## ') or line.startswith('### '):
+                        # Handle both ## and ### headers
+                        title = line.replace('## ', '').replace('### ', '').strip()
+                    elif line.startswith('Source: '):
+                        source = line.replace('Source: ', '').strip()
+                    elif line.strip() and not line.startswith('#') and not line.startswith('Source: ') and not line.startswith('---'):
+                        # Include all content lines, including those with formatting
+                        content_text += line.strip() + " "
+                
+                if title and content_text:
+                    documents.append({
+                        'title': title,
+                        'content': content_text.strip(),
+                        'source': source,
+                        'full_text': f"{title}: {content_text.strip()}"
+                    })
+        
+        return documents
     
-    def initialize_embeddings(self):
-        """Initialize the sentence transformer model and create embeddings"""
+    def load_embedding_model(self):
+        """Load the configured embedding backend"""
+        if self.embedding_backend == 'onnx':
+            print("Initializing ONNX Runtime embedding model...")
+            from onnx_encoder import OnnxEncoder
+            return OnnxEncoder(
+                self.model_name,
+                directory=os.getenv('ONNX_MODEL_DIR', 'data/onnx'),
+                quantize=self.onnx_quantize,
+                threads=int(os.getenv('ONNX_THREADS', os.getenv('OMP_NUM_THREADS', '0')))
+            ).load()
+        
         print("Initializing sentence transformer model...")
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        # Imported here: loading torch and transformers alone takes seconds
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(self.model_name)
+    
+    def initialize_embeddings(self, documents: List[Dict]) -> KnowledgeBaseState:
+        """Initialize the sentence transformer model and create embeddings for documents
         
-        # Check if cached embeddings exist
-        if os.path.exists(self.embeddings_cache_path):
-            try:
-                with open(self.embeddings_cache_path, 'rb') as f:
-                    cached_data = pickle.load(f)
-                    if len(cached_data['embeddings']) == len(self.documents):
-                        self.embeddings = cached_data['embeddings']
-                        print("Loaded cached embeddings")
-                        return
-            except Exception as e:
-                print(f"Error loading cached embeddings: {e}")
+        Only sections whose content hash is not in the embedding store are
+        encoded; vectors for unchanged sections are reused and vectors for
+        deleted sections are dropped. Returns a new state without touching
+        the one currently being served.
+        """
+        if self.model is None:
+            self.model = self.load_embedding_model()
+            # Cached query vectors are only valid for the model that produced them
+            self.query_cache.clear()
+        hashes = [document_hash(doc) for doc in documents]
         
-        # Create new embeddings
-        print("Creating embeddings for documents...")
-        texts = [doc['full_text'] for doc in self.documents]
-        self.embeddings = self.model.encode(texts)
+        # Reuse the stored embeddings as-is if they match every document's content
+        stored = self.embedding_store.load(self.embedding_model_id, self.embedding_dtype)
+        if stored is not None and stored['hashes'] == hashes:
+            print("Loaded cached embeddings")
+            index_started = time.perf_counter()
+            index = self.build_index(documents, stored['embeddings'], stored['version'])
+            return KnowledgeBaseState(
+                documents, stored['embeddings'], index, stored['version'],
+                {'encoded': 0, 'reused': len(hashes), 'dropped': 0, 'total': len(hashes),
+                 'encode_seconds': 0.0, 'index_seconds': round(time.perf_counter() - index_started, 3)}
+            )
         
-        # Cache the embeddings
+        stored_rows = {}
+        if stored is not None:
+            for row, content_hash in enumerate(stored['hashes']):
+                stored_rows.setdefault(content_hash, row)
+        
+        reuse_positions = [i for i, content_hash in enumerate(hashes) if content_hash in stored_rows]
+        encode_positions = [i for i, content_hash in enumerate(hashes) if content_hash not in stored_rows]
+        dropped = len(set(stored_rows) - set(hashes))
+        
+        # Encode only added or changed sections
+        print(f"Creating embeddings for {len(encode_positions)} of {len(hashes)} documents...")
+        texts = [documents[i]['full_text'] for i in encode_positions]
+        encode_started = time.perf_counter()
+        # Store embeddings L2-normalized so similarity search is a single dot product
+        encoded = normalize_embeddings(self.model.encode(texts), self.embedding_dtype) if texts else None
+        encode_seconds = time.perf_counter() - encode_started
+        
+        if encoded is not None:
+            dimension = encoded.shape[1]
+        else:
+            dimension = stored['embeddings'].shape[1] if stored is not None else 0
+        embeddings = np.empty((len(hashes), dimension), dtype=self.embedding_dtype)
+        if reuse_positions:
+            embeddings[reuse_positions] = stored['embeddings'][[stored_rows[hashes[i]] for i in reuse_positions]]
+        if encode_positions:
+            embeddings[encode_positions] = encoded
+        version = ""
+        
+        report = {
+            'encoded': len(encode_positions),
+            'reused': len(reuse_positions),
+            'dropped': dropped,
+            'total': len(hashes),
+            'encode_seconds': round(encode_seconds, 3)
+        }
+        print(f"Embeddings: {len(encode_positions)} encoded, {len(reuse_positions)} reused, {dropped} dropped")
+        
+        # Cache the embeddings and switch to the memory-mapped copy
         try:
-            os.makedirs(os.path.dirname(self.embeddings_cache_path), exist_ok=True)
-            with open(self.embeddings_cache_path, 'wb') as f:
-                pickle.dump({
-                    'embeddings': self.embeddings,
-                    'document_count': len(self.documents)
-                }, f)
+            self.embedding_store.save(embeddings, hashes, self.embedding_model_id)
+            stored = self.embedding_store.load(self.embedding_model_id, self.embedding_dtype)
+            if stored is not None:
+                embeddings = stored['embeddings']
+                version = stored['version']
             print("Embeddings cached successfully")
         except Exception as e:
             print(f"Error caching embeddings: {e}")
+        
+        index_started = time.perf_counter()
+        index = self.build_index(documents, embeddings, version, rebuild=True)
+        report['index_seconds'] = round(time.perf_counter() - index_started, 3)
+        return KnowledgeBaseState(documents, embeddings, index, version, report)
     
-    def search_similar_documents(self, query: str, top_k: int = 3) -> List[Dict]:
-        """Search for similar documents using semantic similarity"""
-        if not self.model or self.embeddings is None or len(self.documents) == 0:
-            return []
+    def _swap_state(self, state: KnowledgeBaseState):
+        """Atomically replace the served knowledge base snapshot"""
+        state.generation = self._state.generation + 1
+        self._state = state
+    
+    def reload(self) -> Dict:
+        """Re-read the knowledge base and swap in the result, re-embedding only changed sections
         
-        # Create embedding for the query
-        query_embedding = self.model.encode([query])
+        Requests keep being served from the previous snapshot until the new one
+        is complete. Returns a report with how many sections were encoded,
+        reused and dropped.
+        """
+        with self._reload_lock:
+            self.reload_in_progress = True
+            started = time.perf_counter()
+            try:
+                self.load_data()
+                self.last_reload = {'timestamp': datetime.now().isoformat(), 'error': None}
+                # A reload that succeeds after a failed initial load brings retrieval up
+                if not self.ready:
+                    self.readiness = {'state': 'ready', 'error': None,
+                                      'load_seconds': round(time.perf_counter() - started, 2)}
+                print(f"Knowledge base reloaded (generation {self.generation}): {self.last_reload_report}")
+                return self.last_reload_report
+            except Exception as e:
+                self.last_reload = {'timestamp': datetime.now().isoformat(), 'error': str(e)}
+                raise
+            finally:
+                self.reload_in_progress = False
+    
+    def reload_in_background(self) -> bool:
+        """Start a reload on a background thread; returns False if one is already running"""
+        if self.reload_in_progress or self._reload_lock.locked():
+            return False
         
-        # Calculate cosine similarity
-        similarities = cosine_similarity(query_embedding, self.embeddings)[0]
+        def run():
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"Error reloading knowledge base: {e}")
+                print(traceback.format_exc())
         
-        # Get top-k most similar documents
-        top_indices = np.argsort(similarities)[::-1][:top_k]
+        threading.Thread(target=run, name="kb-reload", daemon=True).start()
+        return True
+    
+    def watch_knowledge_base(self, interval: float = 5.0) -> threading.Thread:
+        """Poll the knowledge base file and reload it whenever it changes"""
+        def last_modified():
+            try:
+                return os.path.getmtime(self.knowledge_base_path)
+            except OSError:
+                return None
+        
+        def watch():
+            seen = last_modified()
+            while True:
+                time.sleep(interval)
+                current = last_modified()
+                if current is not None and current != seen:
+                    seen = current
+                    print(f"Knowledge base changed on disk, reloading {self.knowledge_base_path}")
+                    try:
+                        self.reload()
+                    except Exception as e:
+                        print(f"Error reloading knowledge base: {e}")
+        
+        watcher = threading.Thread(target=watch, name="kb-watcher", daemon=True)
+        watcher.start()
+        return watcher
+    
+    def reload_status(self) -> Dict:
+        """Generation counter and last reload outcome for the health endpoint"""
+        return {
+            'readiness': self.readiness['state'],
+            'readiness_error': self.readiness['error'],
+            'load_seconds': self.readiness['load_seconds'],
+            'generation': self.generation,
+            'reload_in_progress': self.reload_in_progress,
+            'last_reload': self.last_reload['timestamp'],
+            'last_reload_error': self.last_reload['error'],
+            'last_reload_report': self.last_reload_report
+        }
+    
+    @property
+    def index_cache_path(self) -> str:
+        """Path of the persisted vector index, stored next to the embeddings"""
+        return os.path.join(self.embedding_store.directory, f"vector_index_{self.index_type}.npz")
+    
+    def build_index(self, documents: List[Dict], embeddings: np.ndarray, version: str = "",
+                    rebuild: bool = False) -> VectorIndex:
+        """Build (or load the persisted) vector index over the document embeddings"""
+        if embeddings is None or len(documents) == 0:
+            return None
+        
+        if not rebuild and os.path.exists(self.index_cache_path):
+            try:
+                index = VectorIndex.load(self.index_cache_path, embeddings, version)
+                if self.index_nlist and getattr(index, 'nlist', self.index_nlist) != self.index_nlist:
+                    raise ValueError("configured nlist changed")
+                if hasattr(index, 'nprobe'):
+                    index.nprobe = self.index_nprobe
+                print(f"Loaded cached {self.index_type} vector index")
+                return index
+            except Exception as e:
+                print(f"Rebuilding vector index: {e}")
+        
+        print(f"Building {self.index_type} vector index...")
+        params = {'nlist': self.index_nlist, 'nprobe': self.index_nprobe} if self.index_type != 'flat' else {}
+        index = create_index(self.index_type, **params)
+        index.build(embeddings)
+        
+        if version:
+            try:
+                index.save(self.index_cache_path, version)
+            except Exception as e:
+                print(f"Error caching vector index: {e}")
+        return index
+    
+    def build_sparse_index(self, documents: List[Dict]) -> BM25Index:
+        """Build the in-memory BM25 inverted index over the chunk texts"""
+        if self.retrieval_mode == 'dense' and not self.sparse_prefilter:
+            return None
+        return BM25Index().build(doc['full_text'] for doc in documents)
+    
+    def encode_query(self, query: str) -> np.ndarray:
+        """Normalized embedding of a (cleaned) query, served from the LRU cache when possible"""
+        return self.encode_queries([query])[0]
+    
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Normalized embeddings of many queries as an (m, d) matrix
+        
+        Cached queries are served from the LRU cache; all the others are
+        encoded together in a single model call.
+        """
+        embeddings = [self.query_cache.get((self.embedding_model_id, query)) for query in queries]
+        missing = list(dict.fromkeys(query for query, embedding in zip(queries, embeddings) if embedding is None))
+        
+        if missing:
+            with span('encode'):
+                missing_embeddings = normalize_embeddings(self.model.encode(missing))
+            encoded = {}
+            for query, query_embedding in zip(missing, missing_embeddings):
+                query_embedding.flags.writeable = False
+                self.query_cache.put((self.embedding_model_id, query), query_embedding)
+                encoded[query] = query_embedding
+            embeddings = [encoded[query] if embedding is None else embedding
+                          for query, embedding in zip(queries, embeddings)]
+        
+        return np.vstack(embeddings) if embeddings else np.empty((0, 0), dtype=np.float32)
+    
+    def search_similar_documents(self, query: str, top_k: int = 3, nprobe: int = None) -> List[Dict]:
+        """Search for similar chunks using semantic similarity
+        
+        nprobe overrides the configured recall-vs-latency setting of an ivf index.
+        """
+        # Work on one snapshot so a concurrent reload cannot mix documents and index
+        return self._search_batch(self._state, [query], top_k, nprobe)[0]
+    
+    def search_similar_documents_batch(self, queries: List[str], top_k: int = 3,
+                                       nprobe: int = None) -> List[List[Dict]]:
+        """search_similar_documents for many queries: one encode call and one matrix product"""
+        return self._search_batch(self._state, queries, top_k, nprobe)
+    
+    def _search_batch(self, state: KnowledgeBaseState, queries: List[str], top_k: int,
+                      nprobe: int = None) -> List[List[Dict]]:
+        if not self.model or state.index is None or len(state.documents) == 0 or not queries:
+            return [[] for _ in queries]
+        
+        mode = self.retrieval_mode if state.sparse_index is not None else 'dense'
+        if mode == 'sparse':
+            with span('search'):
+                return [self._sparse_results(state, query, top_k) for query in queries]
+        
+        # Create (or reuse) normalized embeddings for the queries
+        query_embeddings = self.encode_queries(queries)
+        
+        with span('search'):
+            if mode == 'dense':
+                # Get top-k most similar documents from the vector index
+                return [
+                    [self._result(state, idx, similarity) for idx, similarity in dense_hits
+                     if similarity > 0.3]  # Threshold for relevance
+                    for dense_hits in self._dense_search_batch(state, queries, query_embeddings, top_k, nprobe)
+                ]
+            
+            candidate_count = max(top_k, self.hybrid_candidates)
+            dense_batch = self._dense_search_batch(state, queries, query_embeddings, candidate_count, nprobe)
+            return [
+                self._hybrid_results(state, query, query_embedding, dense_hits, top_k, candidate_count)
+                for query, query_embedding, dense_hits in zip(queries, query_embeddings, dense_batch)
+            ]
+    
+    def _sparse_results(self, state: KnowledgeBaseState, query: str, top_k: int) -> List[Dict]:
+        hits = state.sparse_index.search(query, top_k, self.sparse_min_coverage)
+        # Scale BM25 scores to (0, 1] relative to the best hit
+        return [self._result(state, idx, score / hits[0][1], bm25_score=score) for idx, score in hits]
+    
+    def _hybrid_results(self, state: KnowledgeBaseState, query: str, query_embedding: np.ndarray,
+                        dense_hits: List[Tuple[int, float]], top_k: int, candidate_count: int) -> List[Dict]:
+        """Fuse the dense and BM25 rankings of one query
+        
+        A chunk is relevant if it passes the dense threshold or contains
+        enough of the query's terms.
+        """
+        sparse_hits = state.sparse_index.search(query, candidate_count, self.sparse_min_coverage)
+        dense_scores = dict(dense_hits)
+        sparse_scores = dict(sparse_hits)
+        
+        missing = [idx for idx in sparse_scores if idx not in dense_scores]
+        if missing:
+            dense_scores.update(zip(missing, similarity_scores(state.embeddings[missing], query_embedding).tolist()))
         
         results = []
-        for idx in top_indices:
-            if similarities[idx] > 0.3:  # Threshold for relevance
-                doc = self.documents[idx].copy()
-                doc['similarity_score'] = float(similarities[idx])
-                results.append(doc)
+        fused = reciprocal_rank_fusion([[idx for idx, _ in dense_hits], [idx for idx, _ in sparse_hits]], self.rrf_k)
+        for idx, fusion_score in fused:
+            if dense_scores[idx] > 0.3 or idx in sparse_scores:
+                results.append(self._result(state, idx, dense_scores[idx], sparse_scores.get(idx), fusion_score))
+                if len(results) == top_k:
+                    break
         
         return results
     
-    def get_context_for_query(self, query: str, max_context_length: int = 3000) -> Tuple[str, List[str]]:
-        """Get relevant context and sources for a query"""
-        relevant_docs = self.search_similar_documents(query, top_k=3)
+    def _dense_search_batch(self, state: KnowledgeBaseState, queries: List[str], query_embeddings: np.ndarray,
+                            top_k: int, nprobe: int = None) -> List[List[Tuple[int, float]]]:
+        """Top-k (chunk index, cosine similarity) pairs for every query
         
-        if not relevant_docs:
-            return "", []
+        On a corpus larger than SPARSE_PREFILTER chunks, only the best BM25
+        candidates of each query are scored against its embedding.
+        """
+        if self.sparse_prefilter and state.sparse_index is not None and len(state.documents) > self.sparse_prefilter:
+            return [
+                self._prefiltered_dense_search(state, query, query_embedding, top_k, nprobe)
+                for query, query_embedding in zip(queries, query_embeddings)
+            ]
+        return state.index.search_batch(query_embeddings, top_k=top_k, nprobe=nprobe)
+    
+    def _prefiltered_dense_search(self, state: KnowledgeBaseState, query: str, query_embedding: np.ndarray,
+                                  top_k: int, nprobe: int = None) -> List[Tuple[int, float]]:
+        candidates = np.array([idx for idx, _ in state.sparse_index.search(query, self.sparse_prefilter)], dtype=np.int64)
+        if len(candidates) >= top_k:
+            candidates.sort()
+            scores = similarity_scores(state.embeddings[candidates], query_embedding)
+            return [(int(candidates[i]), float(scores[i])) for i in top_k_indices(scores, top_k)]
         
-        context_parts = []
-        sources = []
-        current_length = 0
+        return state.index.search(query_embedding, top_k=top_k, nprobe=nprobe)
+    
+    @staticmethod
+    def _result(state: KnowledgeBaseState, idx: int, similarity: float, bm25_score: float = None,
+                fusion_score: float = None) -> Dict:
+        doc = state.documents[idx].copy()
+        doc['similarity_score'] = similarity
+        if bm25_score is not None:
+            doc['bm25_score'] = bm25_score
+        if fusion_score is not None:
+            doc['fusion_score'] = fusion_score
+        return doc
+    
+    @staticmethod
+    def merge_neighbouring_chunks(chunks: List[Dict], sections: List[Dict]) -> List[Dict]:
+        """Merge retrieved chunks that overlap or touch in the same section into one passage
         
-        for doc in relevant_docs:
-            # Truncate content if too long instead of skipping entirely
-            content = doc['content']
-            if len(content) > 2000:
-                content = content[:2000] + "..."
-            
-            doc_text = f"**{doc['title']}**\n{content}\n"
-            
-            if current_length + len(doc_text) <= max_context_length:
-                context_parts.append(doc_text)
-                if doc['source']:
-                    sources.append(doc['source'])
-                current_length += len(doc_text)
-            else:
-                break
+        A merged passage keeps the best scores of its chunks; passages are
+        returned best first (by fused rank score in hybrid mode).
+        """
+        by_section = {}
+        for chunk in chunks:
+            by_section.setdefault(chunk['section'], []).append(chunk)
         
-        context = "\n".join(context_parts)
-        return context, sources
+        passages = []
+        for section_index, section_chunks in by_section.items():
+            section_chunks.sort(key=lambda chunk: chunk['start'])
+            run = [section_chunks[0]]
+            for chunk in section_chunks[1:]:
+                if chunk['start'] <= run[-1]['end']:
+                    run.append(chunk)
+                else:
+                    passages.append(DataManager._merge_run(run, sections[section_index]))
+                    run = [chunk]
+            passages.append(DataManager._merge_run(run, sections[section_index]))
+        
+        passages.sort(key=lambda passage: passage.get('fusion_score', passage['similarity_score']), reverse=True)
+        return passages
+    
+    @staticmethod
+    def _merge_run(run: List[Dict], section: Dict) -> Dict:
+        if len(run) == 1:
+            return run[0]
+        
+        passage = run[0].copy()
+        passage['end'] = max(chunk['end'] for chunk in run)
+        passage['content'] = section['content'][passage['start']:passage['end']].strip()
+        passage['full_text'] = f"{passage['title']}: {passage['content']}"
+        passage['merged_chunks'] = len(run)
+        passage['similarity_score'] = max(chunk['similarity_score'] for chunk in run)
+        if 'fusion_score' in passage:
+            passage['fusion_score'] = max(chunk['fusion_score'] for chunk in run)
+        return passage
+    
+    def get_context_for_query(self, query: str, reserved_tokens: int = 0) -> Tuple[str, List[str]]:
+        """Get relevant context and sources for a query"""
+        packed = self.pack_context_for_query(query, reserved_tokens)
+        return packed['context'], packed['sources']
+    
+    def get_context_for_queries(self, queries: List[str], reserved_tokens: List[int] = None) -> List[Tuple[str, List[str]]]:
+        """get_context_for_query for many queries, retrieved as one batch"""
+        return [(packed['context'], packed['sources']) for packed in self.pack_context_for_queries(queries, reserved_tokens)]
+    
+    def pack_context_for_query(self, query: str, reserved_tokens: int = 0) -> Dict:
+        """Retrieve and pack context for a query into the prompt token budget
+        
+        The best matching chunks are retrieved, neighbouring chunks of the same
+        section merged back into continuous passages, and the passages packed
+        into PROMPT_TOKEN_BUDGET minus `reserved_tokens` (system prompt and user
+        template). Returns the context, its sources and a token report.
+        """
+        return self.pack_context_for_queries([query], [reserved_tokens])[0]
+    
+    def pack_context_for_queries(self, queries: List[str], reserved_tokens: List[int] = None) -> List[Dict]:
+        """pack_context_for_query for many queries, retrieved as one batch"""
+        state = self._state
+        reserved_tokens = reserved_tokens or [0] * len(queries)
+        chunk_batch = self._search_batch(state, queries, self.retrieval_top_k)
+        with span('context'):
+            return [
+                self.context_packer.pack(self.merge_neighbouring_chunks(chunks, state.sections), reserved)
+                for chunks, reserved in zip(chunk_batch, reserved_tokens)
+            ]
     
     def add_document(self, title: str, content: str, source: str = ""):
         """Add a new document to the knowledge base"""
@@ -175,15 +690,33 @@ class DataManager:
             'full_text': f"{title}: {content}"
         }
         
-        self.documents.append(new_doc)
+        if not self.model:
+            return
         
-        # Update embeddings
-        if self.model:
-            new_embedding = self.model.encode([new_doc['full_text']])
-            if self.embeddings is not None:
-                self.embeddings = np.vstack([self.embeddings, new_embedding])
+        # Build the extended snapshot off to the side, then swap it in
+        with self._reload_lock:
+            state = self._state
+            new_chunks = self.chunker.split_document(new_doc, len(state.sections))
+            new_embeddings = normalize_embeddings(
+                self.model.encode([chunk['full_text'] for chunk in new_chunks]), self.embedding_dtype
+            )
+            if state.embeddings is not None and len(state.embeddings):
+                embeddings = np.vstack([state.embeddings, new_embeddings])
+            else:
+                embeddings = new_embeddings
+            documents = state.documents + new_chunks
+            
+            if state.index is not None:
+                # Extend a copy so requests on the previous snapshot are unaffected
+                index = copy.copy(state.index)
+                index.extend(embeddings)
             else:
-                self.embeddings = new_embedding
+                index = self.build_index(documents, embeddings)
+            
+            # The in-memory matrix no longer matches the stored version
+            self._swap_state(KnowledgeBaseState(documents, embeddings, index, "", state.report,
+                                                sections=state.sections + [new_doc],
+                                                sparse_index=self.build_sparse_index(documents)))
 
 
 def load_knowledge_base(file_path: str) -> str:
@@ -193,6 +726,10 @@ def load_knowledge_base(file_path: str) -> str:
     return knowledge_base
 
 def log_chat(file_path: str, log_entry: str) -> None:
-    """Log chat interactions"""
+    """Legacy function for backward compatibility: appends one line, opening the file each time
+    
+    The app logs interactions through chat_logger.ChatLogger, which batches
+    writes on a background thread.
+    """
     with open(file_path, 'a') as file:
         file.write(log_entry + '\n')
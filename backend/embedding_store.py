@@ -0,0 +1,109 @@
+import os
+import json
+import hashlib
+import uuid
+from typing import Dict, List, Optional
+import numpy as np
+
+
+def document_hash(doc: Dict) -> str:
+    """Content hash of the text that gets embedded for a document"""
+    return hashlib.sha256(doc['full_text'].encode('utf-8')).hexdigest()
+
+
+class EmbeddingStore:
+    """Versioned on-disk embedding store: a .npy matrix plus a JSON manifest
+
+    The matrix is opened with mmap_mode='r', so loading is a page-table
+    operation rather than a deserialise and every worker process on the
+    host shares the same page cache. Each save writes a new uniquely named
+    matrix file and then atomically swaps the manifest, so readers that
+    still have the previous version mapped are never affected.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, directory: str = "data/embeddings"):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, "manifest.json")
+
+    def read_manifest(self) -> Optional[Dict]:
+        """Return the current manifest, or None if the store is empty or unreadable"""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Error reading embedding manifest: {e}")
+            return None
+
+        if manifest.get('format_version') != self.FORMAT_VERSION:
+            print(f"Ignoring embedding store with format version {manifest.get('format_version')}")
+            return None
+        return manifest
+
+    def load(self, model_name: str, dtype=np.float32) -> Optional[Dict]:
+        """Memory-map the stored embeddings if they were made by model_name in dtype
+
+        Returns a dict with 'embeddings' (read-only memmap), 'hashes' (one
+        content hash per row) and 'version', or None if nothing usable is stored.
+        """
+        manifest = self.read_manifest()
+        if manifest is None:
+            return None
+        if manifest.get('model') != model_name or manifest.get('dtype') != np.dtype(dtype).name:
+            print(f"Stored embeddings were made with {manifest.get('model')} ({manifest.get('dtype')}), ignoring them")
+            return None
+
+        try:
+            embeddings = np.load(os.path.join(self.directory, manifest['matrix']), mmap_mode='r')
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error loading stored embeddings: {e}")
+            return None
+
+        if embeddings.ndim != 2 or len(embeddings) != len(manifest['hashes']):
+            print("Stored embeddings do not match their manifest, ignoring them")
+            return None
+
+        return {
+            'embeddings': embeddings,
+            'hashes': manifest['hashes'],
+            'version': manifest['version'],
+        }
+
+    def save(self, embeddings: np.ndarray, hashes: List[str], model_name: str) -> str:
+        """Write a new version of the store and return its version id"""
+        if len(embeddings) != len(hashes):
+            raise ValueError("Need exactly one content hash per embedding row")
+
+        os.makedirs(self.directory, exist_ok=True)
+        previous = self.read_manifest()
+        version = uuid.uuid4().hex[:12]
+        matrix_name = f"embeddings-{version}.npy"
+
+        np.save(os.path.join(self.directory, matrix_name), np.ascontiguousarray(embeddings))
+
+        manifest = {
+            'format_version': self.FORMAT_VERSION,
+            'version': version,
+            'model': model_name,
+            'dtype': np.dtype(embeddings.dtype).name,
+            'dimension': int(embeddings.shape[1]) if embeddings.ndim == 2 else 0,
+            'count': len(hashes),
+            'matrix': matrix_name,
+            'hashes': list(hashes),
+        }
+        temp_path = f"{self.manifest_path}.{version}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, self.manifest_path)
+
+        # Unlinking is safe even while other processes still have the old file mapped
+        if previous and previous.get('matrix') != matrix_name:
+            try:
+                os.remove(os.path.join(self.directory, previous['matrix']))
+            except OSError:
+                pass
+
+        return version
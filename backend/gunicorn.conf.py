@@ -0,0 +1,43 @@
+"""
+Gunicorn settings for multi-worker deployments of the LBS RAG Chatbot
+
+    cd backend && gunicorn -c gunicorn.conf.py app:app
+    cd backend && gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:app
+
+With preload_app the app is imported once in the master before the workers
+are forked, so the SentenceTransformer weights, the parsed knowledge base and
+the BM25 index are loaded once and shared copy-on-write by every worker rather
+than loaded again per worker. The embedding matrix is memory-mapped from the
+embedding store and shared through the page cache either way.
+"""
+
+import gc
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5003')
+workers = int(os.getenv('WEB_CONCURRENCY', '4'))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+
+if preload_app:
+    # Tells app.py to load synchronously and leave thread start-up to post_fork
+    os.environ['PREFORK_WORKERS'] = 'true'
+
+# Split the cores between the workers' torch thread pools instead of letting
+# every worker start one thread per core. Read by torch when the app is loaded.
+os.environ.setdefault('OMP_NUM_THREADS', str(max(1, (os.cpu_count() or 1) // workers)))
+
+
+def when_ready(server):
+    # Runs in the master after the preload, before any worker is forked. Frozen
+    # objects are skipped by the garbage collector, so collections in the
+    # workers don't write to (and so copy) the pages holding the shared state.
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        import app as chat_app  # Already imported in the master (directly or via asgi.py)
+        chat_app.start_worker_tasks()
@@ -0,0 +1,237 @@
+import contextlib
+import contextvars
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+# Latency buckets in seconds, from sub-millisecond lookups to slow OpenAI calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(names, values)
+    ]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class Metric:
+    """Base class: a named metric with a fixed set of label names"""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> str:
+        return "\n".join([f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+                         + list(self.samples())) + "\n"
+
+    def samples(self) -> Iterable[str]:
+        return []
+
+
+class Counter(Metric):
+    """Monotonically increasing count per label combination"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    """Cumulative bucket counts, sum and count of observed values per label combination"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = sorted((key, (list(state[0]), state[1], state[2])) for key, state in self._values.items())
+        for key, (bucket_counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames + ('le',), key + (_format_value(bound),))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_bucket{_format_labels(self.labelnames + ('le',), key + ('+Inf',))} {count}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+
+class CallbackMetric(Metric):
+    """Gauge or counter whose values are read from a callback at scrape time
+
+    The callback returns {label values tuple: value}, e.g. hit counters kept
+    by a cache that already counts them.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str],
+                 callback: Callable[[], Dict[Tuple[str, ...], float]], type_name: str = "gauge"):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+        self.type_name = type_name
+
+    def samples(self) -> Iterable[str]:
+        for key, value in sorted(self.callback().items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class MetricsRegistry:
+    """The metrics exposed on /metrics, rendered in the Prometheus text format"""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, labelnames: Iterable[str],
+                 callback: Callable[[], Dict[Tuple[str, ...], float]], type_name: str = "gauge") -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, labelnames, callback, type_name))
+
+    def render(self) -> str:
+        rendered = []
+        for metric in list(self._metrics.values()):
+            try:
+                rendered.append(metric.render())
+            except Exception as e:
+                print(f"Error rendering metric {metric.name}: {e}")
+        return "".join(rendered)
+
+
+REGISTRY = MetricsRegistry()
+
+# Chat pipeline metrics shared by the backend modules
+STAGE_SECONDS = REGISTRY.histogram(
+    'chatbot_stage_seconds',
+    'Time spent in each chat pipeline stage (process_query, encode, search, context, openai, format)',
+    ['stage']
+)
+OPENAI_TOKENS = REGISTRY.counter(
+    'chatbot_openai_tokens_total', 'Tokens reported by OpenAI responses', ['type']
+)
+# Streaming responses outlive their request handler, so they are timed separately
+TIME_TO_FIRST_TOKEN = REGISTRY.histogram(
+    'chatbot_time_to_first_token_seconds', 'Time from receiving a streaming chat request to its first generated text'
+)
+STREAM_SECONDS = REGISTRY.histogram(
+    'chatbot_stream_seconds', 'Time from receiving a streaming chat request to the end of its event stream'
+)
+
+
+class Trace:
+    """Per-request trace: an id plus the time spent in each stage and other values worth logging"""
+
+    def __init__(self, trace_id: str = None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.started = time.perf_counter()
+        self.spans: Dict[str, float] = {}
+        self.values: Dict = {}
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar('trace', default=None)
+
+
+def start_trace(trace_id: str = None) -> Trace:
+    """Begin the trace of the request handled in the current context"""
+    trace = Trace(trace_id)
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextlib.contextmanager
+def span(stage: str):
+    """Time a pipeline stage into STAGE_SECONDS and the current request's trace"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.spans[stage] = trace.spans.get(stage, 0.0) + elapsed
+
+
+def record_token_usage(usage):
+    """Count the prompt/completion tokens of an OpenAI response's `usage`, if present"""
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+    completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+    OPENAI_TOKENS.inc(prompt_tokens, type='prompt')
+    OPENAI_TOKENS.inc(completion_tokens, type='completion')
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.values['prompt_tokens'] = trace.values.get('prompt_tokens', 0) + prompt_tokens
+        trace.values['completion_tokens'] = trace.values.get('completion_tokens', 0) + completion_tokens
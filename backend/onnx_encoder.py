@@ -0,0 +1,153 @@
+import inspect
+import json
+import os
+import re
+import warnings
+from typing import Dict, List
+import numpy as np
+
+
+class OnnxEncoder:
+    """SentenceTransformer embeddings computed with ONNX Runtime on the CPU
+
+    The whole SentenceTransformer pipeline (transformer, pooling and, if the
+    model has it, normalization) is exported to ONNX once and, with
+    quantize=True, its weights are quantized to int8 with dynamic quantization
+    (activations are quantized on the fly, so no calibration data is needed).
+    The export is cached under `directory`; later loads need only onnxruntime
+    and tokenizers, not torch or sentence-transformers.
+
+    Implements the part of the SentenceTransformer API DataManager uses:
+    encode(texts) -> (n, d) float32 array.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, model_name: str, directory: str = "data/onnx", quantize: bool = True, threads: int = 0):
+        self.model_name = model_name
+        self.directory = os.path.join(directory, re.sub(r'[^A-Za-z0-9._-]+', '_', model_name).strip('_'))
+        self.quantize = quantize
+        self.threads = threads
+        self.config: Dict = {}
+        self.tokenizer = None
+        self._session = None
+        self._session_pid = None
+
+    @property
+    def model_path(self) -> str:
+        return os.path.join(self.directory, "model-int8.onnx" if self.quantize else "model.onnx")
+
+    def load(self) -> 'OnnxEncoder':
+        """Load the cached export, exporting (and quantizing) the model first if needed"""
+        config_path = os.path.join(self.directory, "encoder.json")
+        config = None
+        if os.path.exists(config_path):
+            with open(config_path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        if (config is None or config.get('format_version') != self.FORMAT_VERSION
+                or config.get('model') != self.model_name or not os.path.exists(self.model_path)):
+            config = self.export()
+        self.config = config
+
+        from tokenizers import Tokenizer
+        self.tokenizer = Tokenizer.from_file(os.path.join(self.directory, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=config['max_seq_length'])
+        self.tokenizer.enable_padding(pad_id=config['pad_token_id'], pad_token=config['pad_token'])
+        return self
+
+    def export(self) -> Dict:
+        """Export the SentenceTransformer to ONNX (plus an int8 copy) and return the encoder config"""
+        print(f"Exporting {self.model_name} to ONNX...")
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(self.model_name, device='cpu')
+        model.eval()
+        sample = model.tokenizer(["An example sentence to trace the model with", "Another one"],
+                                 padding=True, return_tensors='pt')
+        input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+
+        class Pipeline(torch.nn.Module):
+            def __init__(self, sentence_transformer):
+                super().__init__()
+                self.sentence_transformer = sentence_transformer
+
+            def forward(self, *inputs):
+                return self.sentence_transformer(dict(zip(input_names, inputs)))['sentence_embedding']
+
+        os.makedirs(self.directory, exist_ok=True)
+        # Write under temporary names and rename, so other processes never load a partial file
+        suffix = f".{os.getpid()}.tmp"
+        fp32_path = os.path.join(self.directory, "model.onnx")
+        int8_path = os.path.join(self.directory, "model-int8.onnx")
+
+        dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+        dynamic_axes['sentence_embedding'] = {0: 'batch'}
+        # The TorchScript exporter: it needs no extra packages and handles these models well
+        options = {'dynamo': False} if 'dynamo' in inspect.signature(torch.onnx.export).parameters else {}
+        pipeline = Pipeline(model)
+        sample = tuple(sample[name] for name in input_names)
+        with warnings.catch_warnings(), torch.no_grad():
+            warnings.simplefilter('ignore')
+            dimension = int(pipeline(*sample).shape[1])
+            torch.onnx.export(pipeline, sample, fp32_path + suffix,
+                              input_names=input_names, output_names=['sentence_embedding'],
+                              dynamic_axes=dynamic_axes, opset_version=17, **options)
+        os.replace(fp32_path + suffix, fp32_path)
+
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(fp32_path, int8_path + suffix, weight_type=QuantType.QInt8)
+        os.replace(int8_path + suffix, int8_path)
+
+        model.tokenizer.save_pretrained(self.directory)
+        config = {
+            'format_version': self.FORMAT_VERSION,
+            'model': self.model_name,
+            'input_names': input_names,
+            'max_seq_length': model.max_seq_length,
+            'pad_token': model.tokenizer.pad_token,
+            'pad_token_id': model.tokenizer.pad_token_id,
+            'dimension': dimension
+        }
+        config_path = os.path.join(self.directory, "encoder.json")
+        with open(config_path + suffix, 'w', encoding='utf-8') as f:
+            json.dump(config, f)
+        os.replace(config_path + suffix, config_path)
+        print(f"Exported {self.model_name} to {self.directory}")
+        return config
+
+    def session(self):
+        """This process's inference session
+
+        Created lazily per process: ONNX Runtime's thread pool does not
+        survive a fork, so pre-forked workers each open their own session.
+        """
+        if self._session is None or self._session_pid != os.getpid():
+            import onnxruntime
+            options = onnxruntime.SessionOptions()
+            if self.threads > 0:
+                options.intra_op_num_threads = self.threads
+                options.inter_op_num_threads = 1
+            self._session = onnxruntime.InferenceSession(self.model_path, options, providers=['CPUExecutionProvider'])
+            self._session_pid = os.getpid()
+        return self._session
+
+    def encode(self, texts: List[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """Embeddings of texts as an (n, d) float32 array"""
+        if isinstance(texts, str):
+            texts = [texts]
+        session = self.session()
+        embeddings = np.empty((len(texts), self.config['dimension']), dtype=np.float32)
+
+        # Batch texts of similar length together to keep padding short
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            encodings = self.tokenizer.encode_batch([texts[i] for i in batch])
+            inputs = {
+                'input_ids': np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+                'attention_mask': np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64),
+                'token_type_ids': np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+            }
+            embeddings[batch] = session.run(None, {name: inputs[name] for name in self.config['input_names']})[0]
+        return embeddings
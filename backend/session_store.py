@@ -0,0 +1,160 @@
+import copy
+import importlib
+import re
+import secrets
+from typing import Dict, List, Optional
+from lru_cache import LRUCache
+from token_counter import get_token_encoding
+
+# Messages that lean on the previous turn: opening connectives ("and what
+# about...") or references back to something already discussed ("that", "it")
+FOLLOW_UP_START = re.compile(r"^(and|but|also|so|then|what about|how about|what if|same for|or)\b", re.IGNORECASE)
+FOLLOW_UP_REFERENCE = re.compile(
+    r"\b(it|its|those|these|they|them|their|the same|above|previous|earlier)\b"
+    # "this"/"that" as pronouns ("what does that mean?"), not determiners ("this year")
+    r"|\b(this|that)\b(?=\s*(?:[?.!,]|$|(?:is|was|does|do|mean|means|apply|applies|work|one|too|also)\b))",
+    re.IGNORECASE
+)
+
+
+class InMemorySessionBackend:
+    """Default session backend: sessions in process memory, LRU-bounded with a TTL
+
+    Any class with the same get/set/delete/stats methods can be plugged in
+    with SESSION_BACKEND=module:ClassName (constructed with maxsize and ttl),
+    e.g. one backed by Redis so sessions are shared between workers. Sessions
+    are plain JSON-serializable dicts.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 3600):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, conversation_id: str) -> Optional[Dict]:
+        return self._cache.get(conversation_id)
+
+    def set(self, conversation_id: str, session: Dict):
+        self._cache.put(conversation_id, session)
+
+    def delete(self, conversation_id: str):
+        self._cache.pop(conversation_id)
+
+    def stats(self) -> Dict:
+        return {'backend': 'memory', **self._cache.stats()}
+
+
+def load_session_backend(spec: str = "memory", maxsize: int = 10000, ttl: float = 3600):
+    """The session backend named by spec: 'memory' or 'module:ClassName'"""
+    if not spec or spec == "memory":
+        return InMemorySessionBackend(maxsize, ttl)
+    module_name, _, class_name = spec.partition(':')
+    return getattr(importlib.import_module(module_name), class_name)(maxsize=maxsize, ttl=ttl)
+
+
+class SessionManager:
+    """Token-bounded conversation history per conversation id
+
+    Each session keeps its most recent turns verbatim, up to `history_tokens`
+    tokens in total (an answer is cut to half that when stored). Older turns
+    are compacted into one-line summaries of the question and the start of
+    the answer, and the oldest summary lines are dropped beyond
+    `summary_tokens`. So the history a prompt carries is bounded however long
+    the conversation runs, and retrieval keeps the rest of the prompt budget.
+
+    Follow-ups ("and what about the deadline for that?") are rewritten into
+    standalone retrieval queries by prefixing the previous turn's retrieval
+    query, so they find the passages the conversation is about.
+    """
+
+    def __init__(self, backend=None, history_tokens: int = 300, summary_tokens: int = 150,
+                 follow_up_max_words: int = 12, model_name: str = "gpt-3.5-turbo"):
+        self.backend = backend or InMemorySessionBackend()
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens
+        self.follow_up_max_words = follow_up_max_words
+        self.model_name = model_name
+
+    def _encode(self, text: str) -> List[int]:
+        return get_token_encoding(self.model_name).encode(text)
+
+    def _clip(self, text: str, max_tokens: int) -> str:
+        tokens = self._encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+        return get_token_encoding(self.model_name).decode(tokens[:max_tokens]).rstrip() + " ..."
+
+    def new_id(self) -> str:
+        """A fresh conversation id; unguessable, since holding the id is what gives access to the conversation"""
+        return secrets.token_urlsafe(24)
+
+    def exists(self, conversation_id: str) -> bool:
+        return self.backend.get(conversation_id) is not None
+
+    def load(self, conversation_id: str) -> Dict:
+        """The conversation's session, or a new empty one"""
+        session = self.backend.get(conversation_id)
+        if session is None:
+            return {'summary': [], 'turns': [], 'turn_count': 0}
+        # A copy, so a request never sees another one's half-finished update
+        return copy.deepcopy(session)
+
+    def delete(self, conversation_id: str):
+        self.backend.delete(conversation_id)
+
+    def is_follow_up(self, session: Dict, query: str) -> bool:
+        if not session['turns']:
+            return False
+        if FOLLOW_UP_START.search(query):
+            return True
+        words = len(query.split())
+        return words <= 4 or (words <= self.follow_up_max_words and bool(FOLLOW_UP_REFERENCE.search(query)))
+
+    def standalone_query(self, session: Dict, query: str) -> str:
+        """Retrieval query for a message: follow-ups are prefixed with the topic of the previous turn"""
+        if not self.is_follow_up(session, query):
+            return query
+        # The previous retrieval query starts with the conversation's topic; keep that part
+        previous = " ".join(session['turns'][-1]['retrieval_query'].split()[:30])
+        return f"{previous} {query}"
+
+    def messages(self, session: Dict) -> List[Dict[str, str]]:
+        """Chat messages carrying the conversation so far, to go before the new user message"""
+        messages = []
+        if session['summary']:
+            messages.append({'role': 'system', 'content': "Earlier in this conversation:\n" + "\n".join(session['summary'])})
+        for turn in session['turns']:
+            messages.append({'role': 'user', 'content': turn['user']})
+            if turn['assistant']:
+                messages.append({'role': 'assistant', 'content': turn['assistant']})
+        return messages
+
+    def add_turn(self, conversation_id: str, session: Dict, query: str, retrieval_query: str, answer: str = ""):
+        """Append a turn, compact the history back within its token bounds and save the session"""
+        answer = self._clip(answer or "", self.history_tokens // 2)
+        session['turns'].append({
+            'user': query,
+            'retrieval_query': retrieval_query,
+            'assistant': answer,
+            'tokens': len(self._encode(query)) + len(self._encode(answer))
+        })
+        session['turn_count'] += 1
+
+        while session['turns'] and sum(turn['tokens'] for turn in session['turns']) > self.history_tokens:
+            session['summary'].append(self._summarize(session['turns'].pop(0)))
+        while session['summary'] and len(self._encode("\n".join(session['summary']))) > self.summary_tokens:
+            session['summary'].pop(0)
+
+        self.backend.set(conversation_id, session)
+
+    def _summarize(self, turn: Dict) -> str:
+        line = f"- Student asked: {self._clip(' '.join(turn['user'].split()), 25)}"
+        if turn['assistant']:
+            first_sentence = re.split(r'(?<=[.!?])\s', turn['assistant'].strip(), maxsplit=1)[0]
+            line += f" Answer: {self._clip(' '.join(first_sentence.split()), 25)}"
+        return line
+
+    def stats(self) -> Dict:
+        return {
+            'history_tokens': self.history_tokens,
+            'summary_tokens': self.summary_tokens,
+            **self.backend.stats()
+        }
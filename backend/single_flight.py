@@ -0,0 +1,172 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class Flight:
+    """A call in flight for one key, finished by its leader with finish() or fail()
+
+    Followers block in wait() until then and get the same result, or the same
+    exception. Finishing twice is harmless: the first outcome stands.
+    """
+
+    def __init__(self, flights: 'SingleFlight' = None, key: Hashable = None):
+        self._flights = flights
+        self._key = key
+        self._done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def finish(self, result: Any = None):
+        self._end(result, None)
+
+    def fail(self, error: BaseException):
+        self._end(None, error)
+
+    def _end(self, result, error):
+        if self._flights is not None:
+            with self._flights._lock:
+                if self._done.is_set():
+                    return
+                del self._flights._calls[self._key]
+                self.result, self.error = result, error
+                self._done.set()
+        elif not self._done.is_set():
+            self.result, self.error = result, error
+            self._done.set()
+
+    def wait(self) -> Any:
+        self._done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class AsyncFlight:
+    """Flight for coroutines on one event loop; followers await wait()"""
+
+    def __init__(self, flights: 'SingleFlight' = None, key: Hashable = None):
+        self._flights = flights
+        self._key = key
+        self._future = asyncio.get_running_loop().create_future()
+
+    def finish(self, result: Any = None):
+        if self._end():
+            self._future.set_result(result)
+
+    def fail(self, error: BaseException):
+        if self._end():
+            if isinstance(error, asyncio.CancelledError):
+                self._future.cancel()
+            else:
+                self._future.set_exception(error)
+                self._future.exception()  # Retrieved here, so asyncio doesn't warn when nobody was waiting
+
+    def _end(self) -> bool:
+        if self._future.done():
+            return False
+        if self._flights is not None:
+            with self._flights._lock:
+                del self._flights._futures[self._key]
+        return True
+
+    async def wait(self) -> Any:
+        # Shielded so a waiter that disconnects doesn't cancel everyone else's result
+        return await asyncio.shield(self._future)
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive with the same key while it is running wait for it and get the same
+    result, or the same exception. Nothing is cached: once the call finishes,
+    the next caller with that key runs the function again.
+
+    do() coordinates threads and ado() coroutines on one event loop; the two
+    keep separate in-flight tables. start() and astart() are the same without a
+    function, for leaders that produce the result themselves, e.g. while
+    streaming it. Counters are kept for /health and /metrics.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Flight] = {}
+        self._futures: Dict[Hashable, AsyncFlight] = {}
+        self.executions = 0
+        self.shared = 0
+
+    def start(self, key: Hashable) -> Tuple[Flight, bool]:
+        """Lead or join the flight for key; returns (flight, leader)
+
+        The leader must end the flight with finish() or fail(); others wait() for it.
+        """
+        if not self.enabled:
+            return Flight(), True
+        with self._lock:
+            flight = self._calls.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._calls[key] = Flight(self, key)
+                self.executions += 1
+            else:
+                self.shared += 1
+        return flight, leader
+
+    def astart(self, key: Hashable) -> Tuple[AsyncFlight, bool]:
+        """start() for coroutines; followers await flight.wait()"""
+        if not self.enabled:
+            return AsyncFlight(), True
+        with self._lock:
+            flight = self._futures.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._futures[key] = AsyncFlight(self, key)
+                self.executions += 1
+            else:
+                self.shared += 1
+        return flight, leader
+
+    def do(self, key: Hashable, function: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run function() or join the in-flight call for key; returns (result, shared)"""
+        flight, leader = self.start(key)
+        if not leader:
+            return flight.wait(), True
+
+        try:
+            result = function()
+        except BaseException as e:
+            flight.fail(e)
+            raise
+        flight.finish(result)
+        return result, False
+
+    async def ado(self, key: Hashable, function: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Async variant of do(): await function() or join the in-flight call for key"""
+        flight, leader = self.astart(key)
+        if not leader:
+            return await flight.wait(), True
+
+        try:
+            result = await function()
+        except BaseException as e:
+            flight.fail(e)
+            raise
+        flight.finish(result)
+        return result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls) + len(self._futures)
+
+    def stats(self) -> Dict:
+        """Counters for monitoring"""
+        total = self.executions + self.shared
+        return {
+            'enabled': self.enabled,
+            'in_flight': self.in_flight(),
+            'executions': self.executions,
+            'shared': self.shared,
+            'shared_rate': round(self.shared / total, 4) if total else 0.0
+        }
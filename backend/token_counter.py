@@ -0,0 +1,15 @@
+from functools import lru_cache
+import tiktoken
+
+
+@lru_cache(maxsize=None)
+def get_token_encoding(model_name: str = "gpt-3.5-turbo") -> tiktoken.Encoding:
+    """tiktoken encoding of a chat model, so text can be measured in prompt tokens"""
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model_name: str = "gpt-3.5-turbo") -> int:
+    return len(get_token_encoding(model_name).encode(text))
@@ -0,0 +1,276 @@
+import os
+import uuid
+from typing import List, Tuple
+import numpy as np
+
+
+class VectorIndex:
+    """Base class for the vector indexes used by DataManager for similarity search
+
+    Indexes expect L2-normalized rows (see normalize_embeddings) and a normalized
+    query, so cosine similarity is a plain dot product. The matrix is shared with
+    DataManager rather than copied.
+    """
+
+    kind = "base"
+
+    def __init__(self):
+        self.size = 0
+        self.dimension = 0
+
+    def build(self, embeddings: np.ndarray):
+        """Build the index over an (n, d) embedding matrix"""
+        raise NotImplementedError
+
+    def extend(self, embeddings: np.ndarray):
+        """Index the rows appended to the shared matrix since the last build"""
+        raise NotImplementedError
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 3, **params) -> List[Tuple[int, float]]:
+        """Return (document index, cosine similarity) pairs, best first"""
+        raise NotImplementedError
+
+    def search_batch(self, query_embeddings: np.ndarray, top_k: int = 3, **params) -> List[List[Tuple[int, float]]]:
+        """search() for every row of an (m, d) query matrix"""
+        return [self.search(query_embedding, top_k, **params) for query_embedding in query_embeddings]
+
+    def save(self, path: str, version: str = ""):
+        """Persist the index structure, tagged with the embedding store version it was built from"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Prefork workers may save the same index at once: write a private file
+        # and swap it in, so readers never load a half-written one
+        temp_path = f"{path}.{uuid.uuid4().hex[:12]}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                np.savez(f, kind=np.array(self.kind), version=np.array(version), size=np.array(self.size),
+                         dimension=np.array(self.dimension), **self._state())
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _state(self) -> dict:
+        return {}
+
+    def _restore(self, state, embeddings: np.ndarray):
+        raise NotImplementedError
+
+    @classmethod
+    def load(cls, path: str, embeddings: np.ndarray, version: str = "") -> "VectorIndex":
+        """Load a persisted index, reattaching it to the given embeddings
+
+        Raises ValueError if the stored index was built from different embeddings.
+        """
+        with np.load(path, allow_pickle=False) as state:
+            kind = str(state['kind'])
+            if kind not in INDEX_TYPES:
+                raise ValueError(f"Unknown index type in {path}: {kind}")
+            if str(state['version']) != version:
+                raise ValueError(f"Stored index in {path} was built from another embeddings version")
+            if int(state['size']) != len(embeddings) or int(state['dimension']) != embeddings.shape[1]:
+                raise ValueError(f"Stored index in {path} does not match the embeddings")
+            index = INDEX_TYPES[kind]()
+            index._restore(state, embeddings)
+        return index
+
+
+def normalize_embeddings(embeddings: np.ndarray, dtype=np.float32) -> np.ndarray:
+    """L2-normalize rows and return them as a C-contiguous matrix of the given dtype"""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if embeddings.size == 0:
+        return np.empty((0, embeddings.shape[-1] if embeddings.ndim == 2 else 0), dtype=dtype)
+    if embeddings.ndim == 1:
+        embeddings = embeddings.reshape(1, -1)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(embeddings / norms, dtype=dtype)
+
+
+def similarity_scores(matrix: np.ndarray, query: np.ndarray, block_size: int = 16384) -> np.ndarray:
+    """Dot product of every row with the query, as float32 scores
+
+    query may also be a (d, m) matrix of m queries, giving (n, m) scores.
+    float16 matrices are upcast block by block, since numpy has no fast
+    half-precision matrix-vector product.
+    """
+    if matrix.dtype == np.float32:
+        return matrix @ query
+    return np.concatenate([
+        matrix[start:start + block_size].astype(np.float32, copy=False) @ query
+        for start in range(0, len(matrix), block_size)
+    ]) if len(matrix) else np.empty(0, dtype=np.float32)
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Indices of the top_k highest scores, best first, without sorting every score"""
+    if top_k <= 0:
+        return np.empty(0, dtype=int)
+    if top_k >= len(scores):
+        return np.argsort(scores)[::-1]
+    candidates = np.argpartition(scores, -top_k)[-top_k:]
+    return candidates[np.argsort(scores[candidates])[::-1]]
+
+
+class FlatIndex(VectorIndex):
+    """Exact brute-force cosine search over every document (the baseline)"""
+
+    kind = "flat"
+
+    def __init__(self):
+        super().__init__()
+        self.embeddings = None
+
+    def build(self, embeddings: np.ndarray):
+        self.embeddings = embeddings
+        self.size, self.dimension = self.embeddings.shape
+
+    def extend(self, embeddings: np.ndarray):
+        self.build(embeddings)
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 3, **params) -> List[Tuple[int, float]]:
+        if self.embeddings is None or self.size == 0:
+            return []
+        similarities = similarity_scores(self.embeddings, query_embedding)
+        top_indices = top_k_indices(similarities, top_k)
+        return [(int(idx), float(similarities[idx])) for idx in top_indices]
+
+    def search_batch(self, query_embeddings: np.ndarray, top_k: int = 3, **params) -> List[List[Tuple[int, float]]]:
+        """Score many queries with one matrix-matrix product per block of queries"""
+        if self.embeddings is None or self.size == 0:
+            return [[] for _ in query_embeddings]
+        query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+        # Keep the (documents x queries) score block around 64M floats
+        block = max(1, (1 << 26) // self.size)
+        results = []
+        for start in range(0, len(query_embeddings), block):
+            similarities = similarity_scores(self.embeddings, query_embeddings[start:start + block].T)
+            for column in np.ascontiguousarray(similarities.T):
+                results.append([(int(idx), float(column[idx])) for idx in top_k_indices(column, top_k)])
+        return results
+
+    def _restore(self, state, embeddings: np.ndarray):
+        self.build(embeddings)
+
+
+class IVFIndex(VectorIndex):
+    """Inverted-file index: spherical k-means clusters, only nprobe clusters are scanned per query
+
+    nprobe is the recall-vs-latency knob: nprobe == nlist is an exact search,
+    smaller values scan fewer documents at the cost of occasionally missing one.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, nlist: int = 0, nprobe: int = 8, iterations: int = 10, seed: int = 42):
+        super().__init__()
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.iterations = iterations
+        self.seed = seed
+        self.vectors = None
+        self.centroids = None
+        self.list_ids = None
+        self.list_offsets = None
+
+    def build(self, embeddings: np.ndarray):
+        self.vectors = embeddings
+        self.size, self.dimension = self.vectors.shape
+        nlist = self.nlist or int(np.sqrt(self.size))
+        nlist = max(1, min(nlist, self.size))
+        self.centroids = self._train(self.vectors, nlist)
+        self._assign_lists(self._nearest_centroid(self.vectors))
+
+    def extend(self, embeddings: np.ndarray):
+        if self.vectors is None:
+            self.build(embeddings)
+            return
+        assignments = np.empty(self.size, dtype=np.int64)
+        for list_no in range(len(self.centroids)):
+            start, end = self.list_offsets[list_no], self.list_offsets[list_no + 1]
+            assignments[self.list_ids[start:end]] = list_no
+        new_assignments = self._nearest_centroid(embeddings[self.size:])
+        self.vectors = embeddings
+        self.size = len(self.vectors)
+        self._assign_lists(np.concatenate([assignments, new_assignments]))
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 3, nprobe: int = None, **params) -> List[Tuple[int, float]]:
+        if self.vectors is None or self.size == 0:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        nprobe = max(1, min(nprobe or self.nprobe, len(self.centroids)))
+
+        probe_lists = top_k_indices(self.centroids @ query, nprobe)
+        candidates = np.concatenate([
+            self.list_ids[self.list_offsets[list_no]:self.list_offsets[list_no + 1]]
+            for list_no in probe_lists
+        ])
+        if len(candidates) == 0:
+            return []
+
+        similarities = similarity_scores(self.vectors[candidates], query)
+        order = top_k_indices(similarities, top_k)
+        return [(int(candidates[i]), float(similarities[i])) for i in order]
+
+    def _train(self, vectors: np.ndarray, nlist: int) -> np.ndarray:
+        """Spherical k-means on (a sample of) the normalized vectors"""
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(len(vectors), nlist * 256)
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)].astype(np.float32)
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(self.iterations):
+            assignments = self._nearest_centroid(sample, centroids)
+            order = np.argsort(assignments, kind='stable')
+            counts = np.bincount(assignments, minlength=nlist)
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            filled = counts > 0
+            centroids[filled] = np.add.reduceat(sample[order], starts[filled], axis=0)
+            # Re-seed empty clusters so every list stays useful
+            empty = np.flatnonzero(~filled)
+            centroids[empty] = sample[rng.integers(sample_size, size=len(empty))]
+            centroids = normalize_embeddings(centroids)
+        return centroids
+
+    def _nearest_centroid(self, vectors: np.ndarray, centroids: np.ndarray = None, batch_size: int = 8192) -> np.ndarray:
+        centroids = self.centroids if centroids is None else centroids
+        if len(vectors) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([
+            np.argmax(vectors[start:start + batch_size].astype(np.float32, copy=False) @ centroids.T, axis=1)
+            for start in range(0, len(vectors), batch_size)
+        ])
+
+    def _assign_lists(self, assignments: np.ndarray):
+        self.list_ids = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=len(self.centroids))
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def _state(self) -> dict:
+        return {
+            'centroids': self.centroids,
+            'list_ids': self.list_ids,
+            'list_offsets': self.list_offsets,
+        }
+
+    def _restore(self, state, embeddings: np.ndarray):
+        self.vectors = embeddings
+        self.size, self.dimension = self.vectors.shape
+        self.centroids = state['centroids']
+        self.nlist = len(self.centroids)
+        self.list_ids = state['list_ids']
+        self.list_offsets = state['list_offsets']
+
+
+INDEX_TYPES = {
+    FlatIndex.kind: FlatIndex,
+    IVFIndex.kind: IVFIndex,
+}
+
+
+def create_index(kind: str = "flat", **params) -> VectorIndex:
+    """Create an empty index of the given type ('flat' or 'ivf')"""
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown vector index type: {kind} (expected one of {', '.join(INDEX_TYPES)})")
+    if kind == FlatIndex.kind:
+        return FlatIndex()
+    return INDEX_TYPES[kind](**params)
@@ -189,8 +189,15 @@ document.addEventListener('DOMContentLoaded', function() {
     
     function clearCurrentChat() {
         if (confirm('Are you sure you want to clear this chat? This action cannot be undone.')) {
-            chatSessions[currentSessionId].messages = [];
-            chatSessions[currentSessionId].title = 'New Chat';
+            const session = chatSessions[currentSessionId];
+            session.messages = [];
+            session.title = 'New Chat';
+            // Forget the conversation on the server too; the next message starts a new one
+            if (session.conversationId) {
+                fetch(`${API_URL}/api/conversations/${encodeURIComponent(session.conversationId)}`, { method: 'DELETE' })
+                    .catch(error => console.error('Error clearing conversation:', error));
+                delete session.conversationId;
+            }
             chatSessions[currentSessionId].timestamp = new Date().toISOString();
             saveChatSessions();
             
@@ -215,7 +222,61 @@ document.addEventListener('DOMContentLoaded', function() {
             saveChatSessions();
             renderChatHistory();
         }
-    }    function addMessage(content, isUser = false, sources = [], escalationLink = null, saveToSession = true) {
+    }
+
+    function formatBotContent(content) {
+        // Format newlines, bullet points and bold text in bot messages
+        return content
+            .replace(/\\n/g, '<br>')  // Handle escaped newlines
+            .replace(/\n/g, '<br>')   // Handle actual newlines
+            .replace(/- /g, '• ')
+            .replace(/\*\*(.*?)\*\*/g, '<strong>$1</strong>'); // Bold text
+    }
+
+    async function readEventStream(response, onDelta) {
+        // Parse server-sent events from /api/chat/stream; resolves with the final 'done' payload
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let finalData = null;
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const rawEvent = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let eventName = 'message';
+                const dataLines = [];
+                rawEvent.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) {
+                        eventName = line.slice(6).trim();
+                    } else if (line.startsWith('data:')) {
+                        dataLines.push(line.slice(5).trim());
+                    }
+                });
+                if (dataLines.length === 0) continue;
+
+                const payload = JSON.parse(dataLines.join('\n'));
+                if (eventName === 'delta') {
+                    onDelta(payload.text);
+                } else if (eventName === 'done') {
+                    finalData = payload;
+                }
+            }
+        }
+
+        if (!finalData) {
+            throw new Error('Response stream ended without a final message');
+        }
+        return finalData;
+    }
+
+    function addMessage(content, isUser = false, sources = [], escalationLink = null, saveToSession = true) {
         const messageDiv = document.createElement('div');
         messageDiv.className = `message ${isUser ? 'user-message' : 'bot-message'}`;
         
@@ -226,11 +287,7 @@ document.addEventListener('DOMContentLoaded', function() {
         } else {
             // For bot messages, format newlines and bullet points properly
             console.log('Original content:', JSON.stringify(content)); // Debug line
-            const formattedContent = content
-                .replace(/\\n/g, '<br>')  // Handle escaped newlines
-                .replace(/\n/g, '<br>')   // Handle actual newlines
-                .replace(/- /g, '• ')
-                .replace(/\*\*(.*?)\*\*/g, '<strong>$1</strong>'); // Bold text
+            const formattedContent = formatBotContent(content);
             console.log('Formatted content:', formattedContent); // Debug line
             contentDiv.innerHTML = formattedContent;
         }
@@ -341,19 +398,44 @@ document.addEventListener('DOMContentLoaded', function() {
             });
         }, 100);
         
-        // Send to backend
-        fetch(`${API_URL}/api/chat`, {
+        // Send to backend and render the answer as it streams in
+        const requestStarted = performance.now();
+        const session = chatSessions[currentSessionId];
+        let streamedText = '';
+        fetch(`${API_URL}/api/chat/stream`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify({ query: message })
+            // The conversation id the backend issued for this chat lets it answer follow-ups
+            // in context; null asks it to start a conversation
+            body: JSON.stringify({ query: message, conversation_id: session.conversationId || null })
+        })
+        .then(response => {
+            const contentType = response.headers.get('Content-Type') || '';
+            if (!response.body || !contentType.includes('text/event-stream')) {
+                // Validation and server errors come back as plain JSON
+                return response.json();
+            }
+            return readEventStream(response, text => {
+                if (!streamedText) {
+                    console.log(`Time to first token: ${Math.round(performance.now() - requestStarted)} ms`);
+                    typingDiv.classList.remove('typing');
+                }
+                streamedText += text;
+                typingDiv.innerHTML = formatBotContent(streamedText);
+                messagesDiv.scrollTop = messagesDiv.scrollHeight;
+            });
         })
-        .then(response => response.json())
         .then(data => {
-            // Remove typing indicator
+            // Replace the streamed text with the final formatted message
             messagesDiv.removeChild(typingDiv);
             
+            if (data.conversation_id && data.conversation_id !== session.conversationId) {
+                session.conversationId = data.conversation_id;
+                saveChatSessions();
+            }
+            
             // Handle different response formats
             let responseText = '';
             let sources = [];
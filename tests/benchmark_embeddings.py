@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Embedding backend parity check and benchmark for the LBS RAG Chatbot
+Encodes the knowledge base chunks and a query set with the PyTorch
+SentenceTransformer and with the ONNX Runtime backend (fp32 and int8), then
+reports how often retrieval returns the same top-k chunks and how long query
+and corpus encoding take on this CPU.
+Runs offline once the embedding model is available - no server or API key needed.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from data_manager import DataManager
+from onnx_encoder import OnnxEncoder
+from vector_index import normalize_embeddings, top_k_indices
+from test_safeguard_regression import HAND_WRITTEN_QUERIES
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+
+def top_k(query_embeddings, corpus_embeddings, k):
+    scores = query_embeddings @ corpus_embeddings.T
+    return [list(top_k_indices(row, k)) for row in scores]
+
+
+def latency_ms(model, queries, repeats):
+    """Per-query encode latencies in milliseconds, one query per call"""
+    latencies = []
+    for _ in range(repeats):
+        for query in queries:
+            start = time.perf_counter()
+            model.encode([query])
+            latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+def run_benchmark(model_name, knowledge_base, k=5, repeats=3):
+    data_manager = DataManager(knowledge_base, load=False)
+    chunks = data_manager.chunker.chunk_documents(data_manager.parse_documents())
+    corpus = [chunk['full_text'] for chunk in chunks]
+    queries = [query for query in HAND_WRITTEN_QUERIES if query.strip()]
+    queries += [chunk['title'].lstrip('#').strip() for chunk in chunks if chunk['chunk'] == 0]
+
+    from sentence_transformers import SentenceTransformer
+    onnx_dir = os.path.join(BACKEND_DIR, 'data', 'onnx')
+    backends = {
+        'torch': SentenceTransformer(model_name, device='cpu'),
+        'onnx': OnnxEncoder(model_name, onnx_dir, quantize=False).load(),
+        'onnx-int8': OnnxEncoder(model_name, onnx_dir, quantize=True).load(),
+    }
+
+    print("🔢 Embedding Backend Parity & Latency Benchmark")
+    print(f"Model: {model_name}  |  {len(corpus)} chunks  |  {len(queries)} queries  |  top-{k}")
+    print("=" * 92)
+    print(f"{'backend':<11} {'corpus s':>9} {'query p50':>10} {'query p95':>10} {'speedup':>8} "
+          f"{'cosine':>8} {'top-1 same':>11} {f'top-{k} overlap':>14}")
+
+    encoded = {}
+    results = {}
+    for name, model in backends.items():
+        model.encode(queries[:4])  # Warm up
+        start = time.perf_counter()
+        corpus_embeddings = normalize_embeddings(model.encode(corpus))
+        corpus_seconds = time.perf_counter() - start
+        query_embeddings = normalize_embeddings(model.encode(queries))
+        encoded[name] = (corpus_embeddings, query_embeddings)
+        results[name] = (corpus_seconds, latency_ms(model, queries, repeats))
+
+    reference_corpus, reference_queries = encoded['torch']
+    reference = top_k(reference_queries, reference_corpus, k)
+    reference_p50 = np.percentile(results['torch'][1], 50)
+    for name, (corpus_embeddings, query_embeddings) in encoded.items():
+        corpus_seconds, latencies = results[name]
+        # Each backend searches its own corpus embeddings, as after an automatic re-embed
+        ranked = top_k(query_embeddings, corpus_embeddings, k)
+        top1 = np.mean([a[0] == b[0] for a, b in zip(ranked, reference)])
+        overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(ranked, reference)])
+        cosine = np.mean(np.sum(query_embeddings * reference_queries, axis=1))
+        print(f"{name:<11} {corpus_seconds:>9.2f} {np.percentile(latencies, 50):>7.2f} ms "
+              f"{np.percentile(latencies, 95):>7.2f} ms {reference_p50 / np.percentile(latencies, 50):>7.2f}x "
+              f"{cosine:>8.4f} {top1:>11.1%} {overlap:>14.1%}")
+
+    # int8 query vectors searched against torch corpus vectors (no re-embed)
+    mixed = top_k(encoded['onnx-int8'][1], reference_corpus, k)
+    mixed_overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(mixed, reference)])
+    print("=" * 92)
+    print(f"onnx-int8 queries against torch corpus embeddings: top-{k} overlap {mixed_overlap:.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the torch and ONNX Runtime embedding backends")
+    parser.add_argument('--model', default=os.getenv('EMBEDDING_MODEL', 'all-MiniLM-L6-v2'))
+    parser.add_argument('--knowledge-base', default=os.path.join(BACKEND_DIR, 'data', 'knowledge_base.txt'))
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    run_benchmark(args.model, args.knowledge_base, args.top_k, args.repeats)
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end benchmark for the LBS RAG Chatbot
+Loads a knowledge base into the real app (Flask, or the ASGI mode with
+--server asgi) with the OpenAI clients replaced by a local stub that answers
+after a fixed delay, then measures:
+- retrieval quality on a labelled query set: recall@k and MRR over sections
+- per-stage latency percentiles, taken from the request traces in the chat log
+- throughput and client-side latency under N concurrent clients
+- knowledge base load time and peak RSS
+Results are written as JSON (--output) so runs can be compared; --baseline
+prints the changes from an earlier run.
+Runs offline once the embedding model is available - no server or API key needed.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import glob
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(TESTS_DIR, '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+PERCENTILES = (50, 90, 95, 99)
+# Settings that change what is measured, recorded with every run
+RECORDED_SETTINGS = ['EMBEDDING_MODEL', 'EMBEDDING_BACKEND', 'EMBEDDING_DTYPE', 'VECTOR_INDEX', 'VECTOR_INDEX_NLIST',
+                     'VECTOR_INDEX_NPROBE', 'RETRIEVAL_MODE', 'RETRIEVAL_TOP_K', 'HYBRID_CANDIDATES',
+                     'SPARSE_PREFILTER', 'CHUNK_MAX_TOKENS', 'CHUNK_OVERLAP_TOKENS', 'PROMPT_TOKEN_BUDGET',
+                     'CHAT_MAX_CONCURRENCY', 'ASGI_RETRIEVAL_THREADS', 'QUERY_CACHE_SIZE', 'ANSWER_CACHE_SIZE',
+                     'COALESCE_REQUESTS', 'OMP_NUM_THREADS']
+# Metrics shown by --baseline
+COMPARED_METRICS = ('recall@', 'mrr', 'load_seconds', 'encode_seconds', 'index_seconds', 'peak_rss_mb',
+                    'throughput_rps', 'latency_ms.p50', 'latency_ms.p95', 'latency_ms.p99')
+
+STUB_ANSWER = ("Based on the LBS policies, here is what you need to know:\n\n"
+               "- Check the relevant policy section for the exact deadlines\n"
+               "- Submit any request through the official form with supporting evidence\n"
+               "- Contact the Program Office if you are unsure\n\n"
+               "Please let me know if you have any other questions.")
+
+
+class StubCompletions:
+    """Stands in for client.chat.completions: a canned answer after `latency` seconds"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    def _response(self, messages):
+        self.calls += 1
+        # Roughly four characters per token is close enough for the usage counters
+        prompt_tokens = sum(len(message['content']) for message in messages) // 4
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=STUB_ANSWER))],
+            usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=len(STUB_ANSWER) // 4)
+        )
+
+    def create(self, messages, **kwargs):
+        time.sleep(self.latency)
+        return self._response(messages)
+
+
+class AsyncStubCompletions(StubCompletions):
+    async def create(self, messages, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._response(messages)
+
+
+def configure_environment(args, log_dir):
+    """App settings for the run; anything already set in the environment wins"""
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark-stub')
+    os.environ['KNOWLEDGE_BASE_PATH'] = os.path.abspath(args.knowledge_base)
+    os.environ['BACKGROUND_MODEL_LOAD'] = 'false'
+    os.environ['KB_WATCH_INTERVAL'] = '0'
+    os.environ.pop('PREFORK_WORKERS', None)
+    # Stage timings are read back from the chat log
+    os.environ['CHAT_LOG_ENABLED'] = 'true'
+    os.environ['CHAT_LOG_DIR'] = log_dir
+    os.environ['CHAT_LOG_QUEUE_SIZE'] = str(max(10000, 2 * args.requests * max(args.clients)))
+    os.environ.setdefault('ONNX_MODEL_DIR', os.path.join(BACKEND_DIR, 'data', 'onnx'))
+    os.environ.setdefault('RATE_LIMIT_PER_MINUTE', '0')
+    if not args.caches:
+        # Every request runs the whole pipeline unless --caches is given
+        os.environ.setdefault('QUERY_CACHE_SIZE', '0')
+        os.environ.setdefault('ANSWER_CACHE_SIZE', '0')
+        os.environ.setdefault('COALESCE_REQUESTS', 'false')
+
+
+def load_labelled_queries(path):
+    """JSON lines of {"query": ..., "relevant": [section titles]}"""
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+@contextlib.contextmanager
+def app_output(verbose):
+    """The app prints a few lines per request; hide them unless --verbose"""
+    if verbose:
+        yield
+        return
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return round(int(line.split()[1]) / 1024, 1)
+    return None
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    summary = {f"p{p}": round(float(np.percentile(values, p)), 2) for p in PERCENTILES}
+    summary['mean'] = round(float(np.mean(values)), 2)
+    return summary
+
+
+def evaluate_retrieval(chat_app, labelled, ks):
+    """recall@k and MRR of the sections retrieved for each labelled query
+
+    Sections are ranked by their best chunk among the top 4 * max(ks) chunks,
+    searched with the same cleaned query the chat pipeline uses. Titles are
+    compared without the leading '#' that ### headings leave on them.
+    """
+    depth = max(ks)
+    queries = [chat_app.query_processor.process_query(item['query'])['cleaned_query'] for item in labelled]
+    started = time.perf_counter()
+    results = chat_app.data_manager.search_similar_documents_batch(queries, top_k=depth * 4)
+    search_seconds = time.perf_counter() - started
+
+    recalls = {k: [] for k in ks}
+    reciprocal_ranks = []
+    misses = []
+    for item, chunks in zip(labelled, results):
+        ranked = list(dict.fromkeys(chunk['title'].lstrip('#').strip() for chunk in chunks))[:depth]
+        relevant = set(item['relevant'])
+        for k in ks:
+            recalls[k].append(len(relevant & set(ranked[:k])) / len(relevant))
+        rank = next((i + 1 for i, title in enumerate(ranked) if title in relevant), None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+        if rank is None:
+            misses.append({'query': item['query'], 'relevant': item['relevant'], 'retrieved': ranked[:3]})
+
+    report = {'queries': len(labelled)}
+    report.update({f"recall@{k}": round(float(np.mean(recalls[k])), 4) for k in ks})
+    report['mrr'] = round(float(np.mean(reciprocal_ranks)), 4)
+    report['batch_search_ms_per_query'] = round(search_seconds / max(1, len(queries)) * 1000, 2)
+    report['misses'] = misses
+    return report
+
+
+def run_flask_clients(chat_app, queries, clients, requests_per_client):
+    """Each client thread posts its share of the queries one after another"""
+    def client(worker):
+        http = chat_app.app.test_client()
+        results = []
+        for i in range(requests_per_client):
+            query = queries[(worker * requests_per_client + i) % len(queries)]
+            started = time.perf_counter()
+            response = http.post('/api/chat', json={'message': query})
+            results.append((response.status_code, time.perf_counter() - started, response.headers.get('X-Trace-Id')))
+        return results
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        return [result for results in pool.map(client, range(clients)) for result in results]
+
+
+def run_asgi_clients(queries, clients, requests_per_client):
+    """Each client coroutine posts its share of the queries one after another"""
+    import httpx
+    import asgi
+
+    async def main():
+        transport = httpx.ASGITransport(app=asgi.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://benchmark', timeout=None) as http:
+            async def client(worker):
+                results = []
+                for i in range(requests_per_client):
+                    query = queries[(worker * requests_per_client + i) % len(queries)]
+                    started = time.perf_counter()
+                    response = await http.post('/api/chat', json={'message': query})
+                    results.append((response.status_code, time.perf_counter() - started,
+                                    response.headers.get('X-Trace-Id')))
+                return results
+
+            return await asyncio.gather(*[client(worker) for worker in range(clients)])
+
+    return [result for results in asyncio.run(main()) for result in results]
+
+
+def run_load(chat_app, server, queries, clients, requests_per_client):
+    started = time.perf_counter()
+    if server == 'asgi':
+        results = run_asgi_clients(queries, clients, requests_per_client)
+    else:
+        results = run_flask_clients(chat_app, queries, clients, requests_per_client)
+    seconds = time.perf_counter() - started
+    return {
+        'clients': clients,
+        'requests': len(results),
+        'errors': sum(1 for status, _, _ in results if status != 200),
+        'seconds': round(seconds, 3),
+        'throughput_rps': round(len(results) / seconds, 2),
+        'latency_ms': percentiles([elapsed * 1000 for _, elapsed, _ in results]),
+        'trace_ids': [trace_id for _, _, trace_id in results if trace_id]
+    }
+
+
+def read_chat_log(log_dir):
+    """Chat log entries by trace id"""
+    entries = {}
+    for path in glob.glob(os.path.join(log_dir, '*.jsonl')):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry.get('trace_id'):
+                    entries[entry['trace_id']] = entry
+    return entries
+
+
+def add_stage_latencies(level, entries):
+    """Per-stage latency percentiles and outcome counts of a load level's requests"""
+    stages = {}
+    outcomes = {}
+    for trace_id in level.pop('trace_ids'):
+        entry = entries.get(trace_id)
+        if entry is None:
+            continue
+        outcomes[entry['outcome']] = outcomes.get(entry['outcome'], 0) + 1
+        for stage, milliseconds in entry['latency_ms'].items():
+            stages.setdefault(stage, []).append(milliseconds)
+    level['stages_ms'] = {stage: percentiles(values) for stage, values in sorted(stages.items())}
+    level['outcomes'] = outcomes
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=TESTS_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def flatten(report, prefix=''):
+    """Numeric values of a report keyed by dotted path; load levels keyed by client count"""
+    values = {}
+    for key, value in report.items():
+        if key == 'load' and isinstance(value, list):
+            for level in value:
+                values.update(flatten(level, f"{prefix}load.clients={level['clients']}."))
+        elif isinstance(value, dict):
+            values.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[prefix + key] = value
+    return values
+
+
+def print_comparison(baseline, report):
+    old, new = flatten(baseline), flatten(report)
+    print(f"Compared with {baseline.get('timestamp')} ({baseline.get('git_commit') or 'unknown commit'})")
+    print(f"{'metric':<44} {'baseline':>10} {'this run':>10} {'change':>8}")
+    for key in new:
+        if key in old and any(metric in key for metric in COMPARED_METRICS) and '.stages_ms.' not in key:
+            change = f"{(new[key] - old[key]) / old[key]:+.1%}" if old[key] else ''
+            print(f"{key:<44} {old[key]:>10} {new[key]:>10} {change:>8}")
+
+
+def run_benchmark(args):
+    work_dir = os.path.abspath(args.work_dir)
+    os.makedirs(work_dir, exist_ok=True)
+    log_dir = tempfile.mkdtemp(prefix='chat_logs-', dir=work_dir)
+    configure_environment(args, log_dir)
+    labelled = load_labelled_queries(args.queries)
+    # Embeddings and indexes are stored under data/ relative to the working
+    # directory; a separate one keeps benchmark corpora out of the served store
+    os.chdir(work_dir)
+
+    print("🏁 Offline RAG Benchmark")
+    print("=" * 72)
+    started = time.perf_counter()
+    with app_output(args.verbose):
+        import app as chat_app
+    import_seconds = time.perf_counter() - started
+    if not chat_app.data_manager or not chat_app.data_manager.ready:
+        raise SystemExit("❌ Knowledge base failed to load - see the output above")
+    rss_after_load = rss_mb()
+    peak_after_load = peak_rss_mb()
+
+    chat_app.response_generator.client = SimpleNamespace(chat=SimpleNamespace(
+        completions=StubCompletions(args.openai_latency)))
+    chat_app.response_generator.async_client = SimpleNamespace(chat=SimpleNamespace(
+        completions=AsyncStubCompletions(args.openai_latency)))
+
+    data_manager = chat_app.data_manager
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'host': {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()},
+        'config': {
+            'server': args.server,
+            'clients': args.clients,
+            'requests_per_client': args.requests,
+            'openai_latency_ms': round(args.openai_latency * 1000, 1),
+            'caches': args.caches,
+            'queries': os.path.abspath(args.queries),
+            'settings': {name: os.environ[name] for name in RECORDED_SETTINGS if name in os.environ}
+        },
+        'knowledge_base': {
+            'path': data_manager.knowledge_base_path,
+            'sections': len(data_manager.sections),
+            'chunks': len(data_manager.documents),
+            'load_seconds': data_manager.readiness['load_seconds'],
+            'import_seconds': round(import_seconds, 2),
+            # Time in each loading phase, and how many chunks were encoded or reused
+            'phases': {key: value for key, value in data_manager.last_reload_report.items()
+                       if key.endswith('_seconds')},
+            'embeddings': {key: value for key, value in data_manager.last_reload_report.items()
+                           if not key.endswith('_seconds')}
+        }
+    }
+    print(f"Knowledge base: {report['knowledge_base']['sections']} sections, {report['knowledge_base']['chunks']} "
+          f"chunks, loaded in {report['knowledge_base']['load_seconds']}s")
+
+    with app_output(args.verbose):
+        report['retrieval'] = evaluate_retrieval(chat_app, labelled, args.k)
+    recall_summary = "  ".join(f"recall@{k} {report['retrieval'][f'recall@{k}']:.3f}" for k in args.k)
+    print(f"Retrieval ({len(labelled)} labelled queries): {recall_summary}  MRR {report['retrieval']['mrr']:.3f}")
+
+    queries = [item['query'] for item in labelled]
+    with app_output(args.verbose):
+        run_load(chat_app, args.server, queries, 1, min(len(queries), 10))  # Warm up
+    print(f"Load ({args.server}, stub OpenAI latency {args.openai_latency * 1000:.0f} ms)")
+    print(f"{'clients':>8} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    report['load'] = []
+    for clients in args.clients:
+        with app_output(args.verbose):
+            level = run_load(chat_app, args.server, queries, clients, args.requests)
+        report['load'].append(level)
+        latency = level['latency_ms']
+        print(f"{clients:>8} {level['requests']:>9} {level['errors']:>7} {level['throughput_rps']:>8.1f} "
+              f"{latency['p50']:>9.1f} {latency['p95']:>9.1f} {latency['p99']:>9.1f}")
+
+    chat_app.chat_logger.flush(30)
+    entries = read_chat_log(log_dir)
+    for level in report['load']:
+        add_stage_latencies(level, entries)
+    shutil.rmtree(log_dir, ignore_errors=True)
+
+    report['memory'] = {'rss_after_load_mb': rss_after_load, 'peak_rss_after_load_mb': peak_after_load,
+                        'rss_mb': rss_mb(), 'peak_rss_mb': peak_rss_mb()}
+    print("Stage p50 / p95 ms at the highest concurrency:")
+    for stage, summary in report['load'][-1]['stages_ms'].items():
+        print(f"  {stage:<14} {summary['p50']:>9.2f} {summary['p95']:>9.2f}")
+    print(f"Peak RSS: {report['memory']['peak_rss_mb']} MB (after load {peak_after_load} MB)")
+    print("=" * 72)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            print_comparison(json.load(f), report)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline retrieval quality and load benchmark with a stubbed OpenAI")
+    parser.add_argument('--knowledge-base', default=os.path.join(BACKEND_DIR, 'data', 'knowledge_base.txt'))
+    parser.add_argument('--queries', default=os.path.join(TESTS_DIR, 'retrieval_queries.jsonl'),
+                        help='Labelled queries: JSON lines of {"query": ..., "relevant": [section titles]}')
+    parser.add_argument('--server', choices=['flask', 'asgi'], default='flask')
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=20, help='Requests per client at each concurrency')
+    parser.add_argument('--openai-latency', type=float, default=0.5, help='Seconds the stub takes to answer')
+    parser.add_argument('--k', type=int, nargs='+', default=[1, 3, 5])
+    parser.add_argument('--caches', action='store_true',
+                        help='Keep the query/answer caches and request coalescing (off by default)')
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'lbs_chatbot_benchmark'),
+                        help='Working directory for stored embeddings and indexes, reused between runs')
+    parser.add_argument('--verbose', action='store_true', help="Show the app's own output")
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare with')
+    args = parser.parse_args()
+
+    run_benchmark(args)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Safeguard classification microbenchmark for the LBS RAG Chatbot
+Compares the original per-keyword substring scans (tier, then query type) against
+the single-pass keyword matcher used by QueryProcessor.process_query, on realistic
+queries, on the keyword-dense regression corpus, and as the keyword lists grow.
+Runs offline - no server or API key needed.
+"""
+
+import argparse
+import random
+import string
+import time
+
+from test_safeguard_regression import HAND_WRITTEN_QUERIES, build_corpus, legacy_query_type, legacy_safeguard_tier
+from chatbot_logic.keyword_matcher import KeywordMatcher
+from chatbot_logic.processor import QueryProcessor
+
+
+def time_per_query(fn, queries, repeats):
+    """Best-of-N mean latency per query in microseconds"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for query in queries:
+            fn(query)
+        best = min(best, (time.perf_counter() - start) / len(queries))
+    return best * 1e6
+
+
+def compare(label, processor, queries, repeats):
+    def legacy(query):
+        # The original process_query: clean, tier scan on the raw query, type scan on the cleaned one
+        processed_query = processor.clean_query(query)
+        safeguard_tier = legacy_safeguard_tier(processor, query)
+        analysis = {
+            'cleaned_query': processed_query,
+            'original_query': query,
+            'safeguard_tier': safeguard_tier,
+            'requires_immediate_escalation': safeguard_tier == 3,
+            'requires_cautious_response': safeguard_tier == 2,
+            'query_type': legacy_query_type(processed_query),
+            'confidence_threshold': processor.get_confidence_threshold(safeguard_tier)
+        }
+        return analysis['safeguard_tier'], analysis['query_type']
+
+    def single_pass(query):
+        analysis = processor.process_query(query)
+        return analysis['safeguard_tier'], analysis['query_type']
+
+    legacy_us = time_per_query(legacy, queries, repeats)
+    matcher_us = time_per_query(single_pass, queries, repeats)
+    agree = all(legacy(query) == single_pass(query) for query in queries)
+
+    print(f"{label:<28} {legacy_us:>10.2f} {matcher_us:>11.2f} {legacy_us / matcher_us:>7.1f}x {'✅' if agree else '❌':>8}")
+
+
+def with_extra_keywords(count, seed=0):
+    """A processor whose keyword lists carry `count` extra (never matching) keywords"""
+    processor = QueryProcessor()
+    rng = random.Random(seed)
+    for i in range(count):
+        keyword = 'zq' + ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 12)))
+        [processor.escalation_triggers, processor.critical_keywords, processor.cautious_keywords][i % 3].append(keyword)
+
+    processor.keyword_matcher = KeywordMatcher({
+        'escalation': processor.escalation_triggers,
+        'critical': processor.critical_keywords,
+        'cautious': processor.cautious_keywords,
+        **dict(processor.query_type_keywords)
+    })
+    return processor
+
+
+def run_benchmark(generated=20000, repeats=5):
+    processor = QueryProcessor()
+    realistic = HAND_WRITTEN_QUERIES * 100
+    corpus = build_corpus(generated=generated)
+
+    print("🛡️ Safeguard Classification Microbenchmark")
+    print("=" * 72)
+    print(f"{'queries':<28} {'legacy µs':>10} {'matcher µs':>11} {'speedup':>8} {'same':>8}")
+
+    compare(f"hand-written ({len(realistic)})", processor, realistic, repeats)
+    compare(f"regression corpus ({len(corpus)})", processor, corpus, repeats)
+    for extra in [100, 1000]:
+        compare(f"hand-written, +{extra} keywords", with_extra_keywords(extra), realistic, repeats)
+
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark safeguard tier and query type classification")
+    parser.add_argument('--generated', type=int, default=20000)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    run_benchmark(args.generated, args.repeats)
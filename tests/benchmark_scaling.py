@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Corpus scaling benchmark for the LBS RAG Chatbot
+Generates synthetic knowledge bases of each requested size with
+tools/generate_corpus.py (reusing ones already generated), runs
+tests/benchmark_rag.py on each with each retrieval backend in a fresh process,
+and tabulates parse/chunk, embedding, index build and total load time, peak
+RSS, query latency and recall against corpus size. The table is written as JSON
+and optionally CSV for charting.
+Runs offline once the embedding model is available - no server or API key needed.
+Embedding 1M sections on a CPU takes hours; embeddings are stored per corpus
+size in --work-dir, so later backends and reruns reuse them.
+"""
+
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS_DIR, '..', 'tools'))
+from generate_corpus import write_corpus
+
+# Retrieval backends: app settings for each
+BACKENDS = {
+    'flat': {'RETRIEVAL_MODE': 'dense', 'VECTOR_INDEX': 'flat'},
+    'ivf': {'RETRIEVAL_MODE': 'dense', 'VECTOR_INDEX': 'ivf'},
+    'bm25': {'RETRIEVAL_MODE': 'sparse'},
+    'hybrid': {'RETRIEVAL_MODE': 'hybrid', 'VECTOR_INDEX': 'flat'},
+}
+COLUMNS = ['sections', 'backend', 'chunks', 'parse_seconds', 'chunk_seconds', 'encode_seconds', 'index_seconds',
+           'sparse_index_seconds', 'load_seconds', 'peak_rss_mb', 'recall@5', 'mrr', 'encode_p50_ms',
+           'search_p50_ms', 'search_p95_ms', 'total_p50_ms', 'throughput_rps']
+
+
+def corpus_files(corpus_dir, sections, queries, seed):
+    corpus_path = os.path.join(corpus_dir, f"knowledge_base_{sections}.txt")
+    queries_path = os.path.join(corpus_dir, f"queries_{sections}.jsonl")
+    if not (os.path.exists(corpus_path) and os.path.exists(queries_path)):
+        write_corpus(sections, corpus_dir, queries, seed)
+    return corpus_path, queries_path
+
+
+def run_one(sections, backend, corpus_path, queries_path, args):
+    """benchmark_rag.py on one corpus with one backend; returns a table row"""
+    output = os.path.join(tempfile.gettempdir(), f"benchmark_scaling_{sections}_{backend}_{os.getpid()}.json")
+    command = [sys.executable, os.path.join(TESTS_DIR, 'benchmark_rag.py'),
+               '--knowledge-base', corpus_path, '--queries', queries_path, '--clients', str(args.clients),
+               '--requests', str(args.requests), '--openai-latency', '0', '--k', '1', '5',
+               '--work-dir', os.path.join(args.work_dir, str(sections)), '--output', output]
+    env = dict(os.environ, **BACKENDS[backend])
+    completed = subprocess.run(command, env=env, capture_output=True, text=True)
+    if completed.returncode != 0 or not os.path.exists(output):
+        print(completed.stdout[-2000:], completed.stderr[-2000:])
+        raise RuntimeError(f"benchmark_rag.py failed for {sections} sections with {backend}")
+    with open(output, encoding='utf-8') as f:
+        report = json.load(f)
+    os.remove(output)
+
+    knowledge_base = report['knowledge_base']
+    level = report['load'][-1]
+    stages = level['stages_ms']
+    row = {
+        'sections': knowledge_base['sections'],
+        'backend': backend,
+        'chunks': knowledge_base['chunks'],
+        'load_seconds': knowledge_base['load_seconds'],
+        'peak_rss_mb': report['memory']['peak_rss_mb'],
+        'recall@5': report['retrieval']['recall@5'],
+        'mrr': report['retrieval']['mrr'],
+        'encode_p50_ms': stages.get('encode', {}).get('p50'),
+        'search_p50_ms': stages.get('search', {}).get('p50'),
+        'search_p95_ms': stages.get('search', {}).get('p95'),
+        'total_p50_ms': stages.get('total', {}).get('p50'),
+        'throughput_rps': level['throughput_rps']
+    }
+    row.update(knowledge_base['phases'])
+    return row
+
+
+def run_benchmark(args):
+    print("📈 Corpus Scaling Benchmark")
+    print("=" * 118)
+    rows = []
+    for sections in args.sizes:
+        corpus_path, queries_path = corpus_files(args.corpus_dir, sections, args.queries, args.seed)
+        for backend in args.backends:
+            print(f"Running {sections} sections with {backend}...")
+            rows.append(run_one(sections, backend, corpus_path, queries_path, args))
+
+    print("=" * 118)
+    print(f"{'sections':>9} {'backend':<7} {'chunks':>8} {'encode s':>9} {'index s':>8} {'load s':>8} "
+          f"{'peak MB':>8} {'recall@5':>9} {'MRR':>6} {'search p50':>11} {'search p95':>11} {'total p50':>10}")
+    for row in rows:
+        print(f"{row['sections']:>9} {row['backend']:<7} {row['chunks']:>8} {row['encode_seconds']:>9.2f} "
+              f"{row['index_seconds']:>8.2f} {row['load_seconds']:>8.2f} {row['peak_rss_mb']:>8.0f} "
+              f"{row['recall@5']:>9.3f} {row['mrr']:>6.3f} {row['search_p50_ms'] or 0:>8.2f} ms "
+              f"{row['search_p95_ms'] or 0:>8.2f} ms {row['total_p50_ms'] or 0:>7.2f} ms")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(rows, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.csv:
+        with open(args.csv, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Table written to {args.csv}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load time, memory, latency and recall against corpus size")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 30000, 100000])
+    parser.add_argument('--backends', nargs='+', choices=sorted(BACKENDS), default=['flat', 'ivf', 'bm25', 'hybrid'])
+    parser.add_argument('--queries', type=int, default=200, help='Labelled queries per corpus')
+    parser.add_argument('--requests', type=int, default=50, help='Chat requests per backend')
+    parser.add_argument('--clients', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--corpus-dir', default=os.path.join(TESTS_DIR, '..', 'backend', 'data', 'synthetic'))
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'lbs_chatbot_scaling'))
+    parser.add_argument('--output', default='scaling_results.json')
+    parser.add_argument('--csv', help='Also write the table as CSV')
+    args = parser.parse_args()
+
+    run_benchmark(args)
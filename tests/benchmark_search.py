@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Similarity search microbenchmark for the LBS RAG Chatbot
+Compares the original per-query cosine_similarity + full argsort against the
+pre-normalized float32/float16 matrix with a dot product and argpartition top-k,
+and a whole batch of queries scored with one matrix-matrix product.
+Runs offline on random embeddings - no server, model or API key needed.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from vector_index import create_index, normalize_embeddings
+
+
+def baseline_search(query_embedding, embeddings, top_k):
+    """The original DataManager.search_similar_documents scoring"""
+    similarities = cosine_similarity(query_embedding, embeddings)[0]
+    return np.argsort(similarities)[::-1][:top_k]
+
+
+def time_per_query(fn, queries, repeats):
+    """Best-of-N mean latency per query in milliseconds"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for query in queries:
+            fn(query)
+        best = min(best, (time.perf_counter() - start) / len(queries))
+    return best * 1000
+
+
+def run_benchmark(sizes, dimension=384, queries=50, top_k=3, repeats=3):
+    rng = np.random.default_rng(0)
+
+    print("🚀 Similarity Search Microbenchmark")
+    print("=" * 82)
+    print(f"{'documents':>10} {'baseline ms':>12} {'float32 ms':>11} {'float16 ms':>11} {'batch ms':>9} "
+          f"{'speedup':>8} {'top-k ok':>9}")
+
+    for size in sizes:
+        raw = rng.normal(size=(size, dimension)).astype(np.float32)
+        query_vectors = rng.normal(size=(queries, dimension)).astype(np.float32)
+
+        index32 = create_index('flat')
+        index32.build(normalize_embeddings(raw, np.float32))
+        index16 = create_index('flat')
+        index16.build(normalize_embeddings(raw, np.float16))
+        normalized_queries = normalize_embeddings(query_vectors)
+
+        baseline_ms = time_per_query(lambda q: baseline_search(q.reshape(1, -1), raw, top_k), query_vectors, repeats)
+        float32_ms = time_per_query(lambda q: index32.search(q, top_k), normalized_queries, repeats)
+        float16_ms = time_per_query(lambda q: index16.search(q, top_k), normalized_queries, repeats)
+        # One call for the whole query set, reported per query
+        batch_ms = time_per_query(lambda q: index32.search_batch(q, top_k), [normalized_queries], repeats) / queries
+
+        # The optimized path must return exactly the same documents in the same order
+        batch_results = index32.search_batch(normalized_queries, top_k)
+        agree = all(
+            list(baseline_search(raw_q.reshape(1, -1), raw, top_k))
+            == [idx for idx, _ in index32.search(norm_q, top_k)]
+            == [idx for idx, _ in batch_hits]
+            for raw_q, norm_q, batch_hits in zip(query_vectors, normalized_queries, batch_results)
+        )
+
+        print(f"{size:>10} {baseline_ms:>12.3f} {float32_ms:>11.3f} {float16_ms:>11.3f} {batch_ms:>9.3f} "
+              f"{baseline_ms / float32_ms:>7.1f}x {'✅' if agree else '❌':>8}")
+
+    print("=" * 82)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark similarity search over the embedding matrix")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--dimension', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--top-k', type=int, default=3)
+    args = parser.parse_args()
+
+    run_benchmark(args.sizes, args.dimension, args.queries, args.top_k)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Multi-worker memory benchmark for the LBS RAG Chatbot
+Starts the backend under gunicorn (backend/gunicorn.conf.py) with the app
+preloaded in the master and then with every worker loading its own copy, sends
+retrieval-only batch requests so every worker has run the embedding model, and
+compares the memory of the process trees. RSS counts shared pages once per
+process; PSS splits them between the processes sharing them, so the PSS total
+is the memory the deployment actually uses.
+Needs gunicorn and the embedding model (EMBEDDING_MODEL); no API key needed.
+"""
+
+import argparse
+import os
+import secrets
+import subprocess
+import sys
+import time
+
+import requests
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+QUERIES = [
+    "What is the attendance policy?",
+    "How do I submit assignments on Canvas?",
+    "When is the deferral deadline?",
+    "How do I get my transcript?",
+]
+
+
+def memory_kb(pid):
+    """Rss, Pss and private (unshared) memory of a process in kB"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        'rss': fields['Rss'],
+        'pss': fields['Pss'],
+        'private': fields['Private_Clean'] + fields['Private_Dirty']
+    }
+
+
+def child_pids(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def wait_until_ready(base_url, workers, timeout):
+    """Poll /health until `workers` distinct worker processes report ready"""
+    ready_pids = set()
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            status = requests.get(f"{base_url}/health", timeout=5).json()
+            if status.get('ready'):
+                ready_pids.add(status['pid'])
+                if len(ready_pids) >= workers:
+                    return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"Only {len(ready_pids)} of {workers} workers ready after {timeout}s")
+
+
+def measure(preload, workers, port, rounds, timeout):
+    admin_token = secrets.token_hex(16)
+    env = dict(os.environ, GUNICORN_PRELOAD='true' if preload else 'false', ADMIN_TOKEN=admin_token,
+               WEB_CONCURRENCY=str(workers), GUNICORN_BIND=f"127.0.0.1:{port}", ANSWER_CACHE_SIZE='0')
+    env.pop('PREFORK_WORKERS', None)
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                              cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        started = time.time()
+        wait_until_ready(base_url, workers, timeout)
+        startup_seconds = time.time() - started
+
+        # Enough retrieval requests that every worker encodes queries with the model
+        served_by = set()
+        for i in range(rounds * workers):
+            queries = [f"{query} ({i})" for query in QUERIES]
+            requests.post(f"{base_url}/api/chat/batch", json={'queries': queries, 'generate': False},
+                          headers={'X-Admin-Token': admin_token}, timeout=60).raise_for_status()
+            served_by.add(requests.get(f"{base_url}/health", timeout=5).json()['pid'])
+
+        master = memory_kb(server.pid)
+        worker_memory = [memory_kb(pid) for pid in child_pids(server.pid)]
+        totals = {key: master[key] + sum(worker[key] for worker in worker_memory) for key in master}
+        return {
+            'startup_seconds': startup_seconds,
+            'master': master,
+            'workers': worker_memory,
+            'totals': totals,
+            'workers_seen': len(served_by)
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def run_benchmark(worker_counts, port=5013, rounds=3, timeout=600):
+    print("🧠 Multi-worker Memory Benchmark")
+    print("=" * 86)
+    print(f"{'mode':<12} {'workers':>7} {'startup s':>10} {'master RSS':>11} {'worker RSS':>11} "
+          f"{'worker priv':>12} {'total RSS':>10} {'total PSS':>10}")
+
+    for workers in worker_counts:
+        for preload in [False, True]:
+            result = measure(preload, workers, port, rounds, timeout)
+            worker_rss = sum(worker['rss'] for worker in result['workers']) / len(result['workers'])
+            worker_private = sum(worker['private'] for worker in result['workers']) / len(result['workers'])
+            print(f"{'preload' if preload else 'per-worker':<12} {workers:>7} {result['startup_seconds']:>10.1f} "
+                  f"{result['master']['rss'] / 1024:>8.0f} MB {worker_rss / 1024:>8.0f} MB "
+                  f"{worker_private / 1024:>9.0f} MB {result['totals']['rss'] / 1024:>7.0f} MB "
+                  f"{result['totals']['pss'] / 1024:>7.0f} MB")
+
+    print("=" * 86)
+    print("worker RSS/priv are per-worker means; PSS is what the deployment really uses")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare gunicorn memory with and without a preloaded model")
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4])
+    parser.add_argument('--port', type=int, default=5013)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--timeout', type=int, default=600)
+    args = parser.parse_args()
+
+    run_benchmark(args.workers, args.port, args.rounds, args.timeout)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Admission control test for the LBS RAG Chatbot
+Checks the per-client token bucket (burst, refill, Retry-After, independent
+clients) and the concurrency gate (slot limit, queue deadline, queue bound)
+for both threads and coroutines.
+Runs offline - no server needed. Use with pytest or run directly.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from admission import ConcurrencyGate, Overloaded, TokenBucketLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_burst_then_refill():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(rate=1.0, burst=3, clock=clock)
+    assert [limiter.acquire('a') for _ in range(3)] == [0, 0, 0]
+    wait = limiter.acquire('a')
+    assert 0.9 < wait <= 1.0
+    assert limiter.acquire('b') == 0  # Clients have their own buckets
+    clock.now += 1.0
+    assert limiter.acquire('a') == 0
+    assert limiter.acquire('a') > 0
+    clock.now += 100
+    assert [limiter.acquire('a') for _ in range(4)].count(0) == 3  # Refill is capped at the burst
+    assert limiter.stats()['limited'] == 3
+
+
+def test_token_bucket_forgets_oldest_clients():
+    limiter = TokenBucketLimiter(rate=1.0, burst=1, max_clients=2)
+    for client in ['a', 'b', 'c']:
+        limiter.acquire(client)
+    assert limiter.stats()['clients'] == 2
+    assert limiter.acquire('a') == 0
+
+
+def test_disabled_limiter_allows_everything():
+    limiter = TokenBucketLimiter(rate=0, burst=1)
+    assert all(limiter.acquire('a') == 0 for _ in range(100))
+
+
+COUNT_LOCK = threading.Lock()
+
+
+def run_in_slot(gate, active, peak, delay=0.2):
+    try:
+        with gate.slot():
+            with COUNT_LOCK:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(delay)
+            with COUNT_LOCK:
+                active.pop()
+        return 'ok'
+    except Overloaded:
+        return 'overloaded'
+
+
+def test_gate_bounds_concurrency():
+    gate = ConcurrencyGate(max_concurrent=3, queue_timeout=5, max_queue=100)
+    active, peak = [], []
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        results = list(pool.map(lambda _: run_in_slot(gate, active, peak, 0.1), range(10)))
+    assert results == ['ok'] * 10
+    assert max(peak) <= 3
+    assert gate.stats()['active'] == 0 and gate.stats()['admitted'] == 10
+
+
+def test_gate_queue_deadline_and_bound():
+    gate = ConcurrencyGate(max_concurrent=1, queue_timeout=0.2, max_queue=1)
+    active, peak = [], []
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        started = time.perf_counter()
+        results = list(pool.map(lambda _: run_in_slot(gate, active, peak, 1.0), range(3)))
+    # One runs, one waits out the queue deadline, one finds the queue full
+    assert sorted(results) == ['ok', 'overloaded', 'overloaded']
+    assert time.perf_counter() - started < 1.5
+    assert gate.stats()['rejected'] == 2 and gate.stats()['waiting'] == 0
+
+
+def test_async_gate():
+    gate = ConcurrencyGate(max_concurrent=2, queue_timeout=0.3, max_queue=10)
+    active, peak = [], []
+
+    async def request(delay):
+        try:
+            async with gate.aslot():
+                active.append(1)
+                peak.append(len(active))
+                await asyncio.sleep(delay)
+                active.pop()
+            return 'ok'
+        except Overloaded:
+            return 'overloaded'
+
+    async def main():
+        quick = await asyncio.gather(*[request(0.05) for _ in range(6)])
+        slow = await asyncio.gather(*[request(1.0) for _ in range(3)])
+        return quick, slow
+
+    quick, slow = asyncio.run(main())
+    assert quick == ['ok'] * 6
+    assert sorted(slow) == ['ok', 'ok', 'overloaded']
+    assert max(peak) <= 2
+    assert gate.stats()['active'] == 0 and gate.stats()['waiting'] == 0
+
+
+if __name__ == "__main__":
+    print("🚦 Admission Control Test")
+    print("=" * 40)
+    failed = 0
+    for test in [test_token_bucket_burst_then_refill, test_token_bucket_forgets_oldest_clients,
+                 test_disabled_limiter_allows_everything, test_gate_bounds_concurrency,
+                 test_gate_queue_deadline_and_bound, test_async_gate]:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 40)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Answer cache test for the LBS RAG Chatbot
+Checks that the semantic answer cache serves paraphrases only for the same
+safeguard tier and knowledge base generation, never stores or serves Tier 2/3
+responses unless those tiers are explicitly allowed, expires entries after the
+TTL and evicts the least recently used ones, and that the chat pipeline caches
+only fresh Tier 1 answers that did not draw on a conversation's earlier turns.
+Uses a small knowledge base in a temporary directory and a fake embedding
+model, so it runs offline once the tiktoken encoding is available - no server,
+API key or sentence-transformers download needed. Use with pytest or run directly.
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from chatbot_logic.answer_cache import SemanticAnswerCache
+
+ANSWER = {'response': "The library is open from 8am to midnight.", 'confidence': 'high', 'sources': []}
+
+
+class FakeEncoder:
+    """Stands in for the sentence transformer: hashed bag-of-words vectors"""
+
+    def encode(self, texts):
+        vectors = np.zeros((len(texts), 32), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, int(hashlib.md5(word.encode()).hexdigest(), 16) % 32] += 1.0
+        return vectors
+
+
+def unit_vector(*weights, dimension=8):
+    vector = np.zeros(dimension, dtype=np.float32)
+    vector[:len(weights)] = weights
+    return vector / np.linalg.norm(vector)
+
+
+def test_paraphrase_hits_and_other_queries_miss():
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.store(unit_vector(1.0), 1, 0, ANSWER)
+    assert cache.lookup(unit_vector(1.0, 0.1), 1, 0) == ANSWER
+    assert cache.lookup(unit_vector(1.0, 1.0), 1, 0) is None
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (1, 1)
+
+    # Callers get their own copy of the cached response
+    cache.lookup(unit_vector(1.0), 1, 0)['response'] = "edited"
+    assert cache.lookup(unit_vector(1.0), 1, 0) == ANSWER
+
+
+def test_tier_2_and_3_are_never_stored_or_served():
+    cache = SemanticAnswerCache()
+    cache.store(unit_vector(1.0), 2, 0, ANSWER)
+    cache.store(unit_vector(1.0), 3, 0, ANSWER)
+    assert cache.stats()['size'] == 0
+
+    # A Tier 1 entry is not served to the same question at another tier
+    cache.store(unit_vector(1.0), 1, 0, ANSWER)
+    assert cache.lookup(unit_vector(1.0), 2, 0) is None
+    assert cache.lookup(unit_vector(1.0), 3, 0) is None
+
+    # Tier 2 only when explicitly allowed, and Tier 3 still never
+    allowed = SemanticAnswerCache(cacheable_tiers=(1, 2))
+    allowed.store(unit_vector(1.0), 2, 0, ANSWER)
+    allowed.store(unit_vector(0.0, 1.0), 3, 0, ANSWER)
+    assert allowed.stats()['size'] == 1
+    assert allowed.lookup(unit_vector(1.0), 2, 0) == ANSWER
+    assert allowed.lookup(unit_vector(1.0), 1, 0) is None
+    assert allowed.lookup(unit_vector(0.0, 1.0), 3, 0) is None
+
+
+def test_new_generation_invalidates_entries():
+    cache = SemanticAnswerCache()
+    cache.store(unit_vector(1.0), 1, 4, ANSWER)
+    assert cache.lookup(unit_vector(1.0), 1, 5) is None
+    assert cache.lookup(unit_vector(1.0), 1, 4) == ANSWER
+
+
+def test_entries_expire_after_ttl():
+    cache = SemanticAnswerCache(ttl=0.1)
+    cache.store(unit_vector(1.0), 1, 0, ANSWER)
+    assert cache.lookup(unit_vector(1.0), 1, 0) == ANSWER
+    time.sleep(0.15)
+    assert cache.lookup(unit_vector(1.0), 1, 0) is None
+    assert cache.stats()['expirations'] == 1 and cache.stats()['size'] == 0
+
+
+def test_least_recently_used_is_evicted():
+    cache = SemanticAnswerCache(maxsize=2)
+    cache.store(unit_vector(1.0), 1, 0, dict(ANSWER, response="first"))
+    cache.store(unit_vector(0.0, 1.0), 1, 0, dict(ANSWER, response="second"))
+    assert cache.lookup(unit_vector(1.0), 1, 0)['response'] == "first"
+    cache.store(unit_vector(0.0, 0.0, 1.0), 1, 0, dict(ANSWER, response="third"))
+    assert cache.stats()['evictions'] == 1
+    assert cache.lookup(unit_vector(0.0, 1.0), 1, 0) is None
+    assert cache.lookup(unit_vector(1.0), 1, 0)['response'] == "first"
+
+
+def load_chat_app(monkeypatch, directory):
+    """Import the Flask app offline, serving a small knowledge base with the fake encoder"""
+    monkeypatch.setenv('OPENAI_API_KEY', os.environ.get('OPENAI_API_KEY', 'test-key'))
+    monkeypatch.setenv('CHAT_LOG_ENABLED', 'false')
+    monkeypatch.setenv('BACKGROUND_MODEL_LOAD', 'false')
+    monkeypatch.setenv('KNOWLEDGE_BASE_PATH', os.path.join(directory, 'missing.txt'))
+    import app as chat_app
+    from data_manager import DataManager
+    from embedding_store import EmbeddingStore
+
+    path = os.path.join(directory, 'knowledge_base.txt')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("# LBS Knowledge Base\n\n## Library Opening Hours\n"
+                "The library is open from 8am to midnight on weekdays.\nSource: Library Guide\n")
+    data_manager = DataManager(path, load=False)
+    data_manager.embedding_store = EmbeddingStore(os.path.join(directory, 'embeddings'))
+    data_manager.model = FakeEncoder()
+    data_manager.load()
+    monkeypatch.setattr(chat_app, 'data_manager', data_manager)
+    monkeypatch.setattr(chat_app, 'answer_cache', SemanticAnswerCache())
+    return chat_app
+
+
+def prepare(chat_app, query, tier=1):
+    analysis = dict(chat_app.query_processor.process_query(query), safeguard_tier=tier)
+    return chat_app.prepare_chat_batch([query], [analysis])[0]
+
+
+def test_pipeline_caches_only_fresh_tier_1_answers(monkeypatch):
+    with tempfile.TemporaryDirectory() as directory:
+        chat_app = load_chat_app(monkeypatch, directory)
+        query = "When is the library open?"
+
+        prepared = prepare(chat_app, query)
+        assert prepared['response'] is None and prepared['query_embedding'] is not None
+        chat_app.finish_chat(prepared, ANSWER)
+        cached = prepare(chat_app, query)
+        assert cached['cached'] and cached['response'] == ANSWER
+
+        # Tier 2 neither reuses the Tier 1 answer nor stores its own
+        cautious = prepare(chat_app, query, tier=2)
+        assert not cautious['cached'] and cautious['response'] is None
+        chat_app.finish_chat(cautious, ANSWER)
+        assert chat_app.answer_cache.stats()['size'] == 1
+        assert prepare(chat_app, query, tier=2)['response'] is None
+
+        # A reload starts a new generation, so earlier answers are not served
+        chat_app.data_manager.reload()
+        assert prepare(chat_app, query)['response'] is None
+
+
+def test_answers_from_history_or_failures_are_not_cached(monkeypatch):
+    with tempfile.TemporaryDirectory() as directory:
+        chat_app = load_chat_app(monkeypatch, directory)
+        query = "When is the library open?"
+        sessions = chat_app.session_manager
+        conversation_id = sessions.new_id()
+        sessions.add_turn(conversation_id, sessions.load(conversation_id), "I study in the evenings.",
+                          "I study in the evenings.", "Noted.")
+        analysis, conversation = chat_app.process_turn(query, conversation_id)
+        assert conversation['history']
+
+        chat_app.finish_chat(chat_app.prepare_chat_batch([query], [analysis], [conversation])[0], ANSWER)
+        chat_app.finish_chat(prepare(chat_app, query), dict(ANSWER, confidence='degraded'))
+        chat_app.finish_chat(prepare(chat_app, query), dict(ANSWER, confidence='system_error'))
+        assert chat_app.answer_cache.stats()['size'] == 0
+        assert prepare(chat_app, query)['response'] is None
+
+
+if __name__ == "__main__":
+    print("🗄️ Answer Cache Test")
+    print("=" * 40)
+    failed = 0
+    for test in [test_paraphrase_hits_and_other_queries_miss, test_tier_2_and_3_are_never_stored_or_served,
+                 test_new_generation_invalidates_entries, test_entries_expire_after_ttl,
+                 test_least_recently_used_is_evicted, test_pipeline_caches_only_fresh_tier_1_answers,
+                 test_answers_from_history_or_failures_are_not_cached]:
+        try:
+            with pytest.MonkeyPatch.context() as monkeypatch:
+                test(monkeypatch) if test.__code__.co_argcount else test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 40)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+BM25 index test for the LBS RAG Chatbot
+Checks that the inverted index scores documents exactly as Okapi BM25 computed
+by hand, that stopwords are ignored and rare terms and short documents weigh
+more, that min_coverage filters out documents matching too few query terms,
+and that reciprocal rank fusion orders documents by their summed 1/(k + rank).
+Runs offline - no server, tokenizer or embedding model needed. Use with pytest or run directly.
+"""
+
+import math
+import os
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from bm25_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+DOCUMENTS = [
+    "The library is open from 8am to midnight on weekdays.",
+    "Library fines are charged for overdue library books.",
+    "Extension requests must be submitted 48 hours before the deadline.",
+    "The careers service offers coaching and a careers portal for every programme.",
+]
+
+
+def reference_scores(query, documents, k1=1.5, b=0.75):
+    """Okapi BM25 straight from the formula, one document at a time"""
+    terms = set(tokenize(query))
+    counts = [Counter(tokenize(document)) for document in documents]
+    average_length = sum(sum(count.values()) for count in counts) / len(counts)
+    scores = []
+    for count in counts:
+        length = sum(count.values())
+        score = 0.0
+        for term in terms:
+            containing = sum(1 for other in counts if term in other)
+            if term not in count:
+                continue
+            idf = math.log(1 + (len(counts) - containing + 0.5) / (containing + 0.5))
+            score += idf * count[term] * (k1 + 1) / (count[term] + k1 * (1 - b + b * length / average_length))
+        scores.append(score)
+    return scores
+
+
+def test_tokenize_drops_stopwords_and_punctuation():
+    assert tokenize("When is the Library open, please?") == ["library", "open"]
+    assert tokenize("48-hour MBA2 deadline") == ["48", "hour", "mba2", "deadline"]
+
+
+def test_scores_match_okapi_bm25():
+    index = BM25Index().build(DOCUMENTS)
+    for query in ("library opening hours", "careers coaching", "overdue library books deadline"):
+        expected = reference_scores(query, DOCUMENTS)
+        results = index.search(query, top_k=len(DOCUMENTS))
+        assert [doc_id for doc_id, _ in results] == \
+            sorted((i for i, score in enumerate(expected) if score > 0), key=lambda i: -expected[i])
+        for doc_id, score in results:
+            assert math.isclose(score, expected[doc_id], rel_tol=1e-5), (query, doc_id, score, expected[doc_id])
+
+
+def test_rare_terms_and_short_documents_weigh_more():
+    index = BM25Index().build(["apple banana", "apple cherry", "apple durian", "banana " + "fig " * 20])
+    # "cherry" is in one document, "apple" in three
+    assert index.search("cherry apple", top_k=1)[0][0] == 1
+    # Same single occurrence of "banana": the shorter document scores higher
+    results = dict(index.search("banana", top_k=4))
+    assert results[0] > results[3]
+
+
+def test_min_coverage_and_empty_queries():
+    index = BM25Index().build(DOCUMENTS)
+    assert {doc_id for doc_id, _ in index.search("library careers", top_k=4)} == {0, 1, 3}
+    assert index.search("library careers", top_k=4, min_coverage=1.0) == []
+    assert [doc_id for doc_id, _ in index.search("library books", top_k=4, min_coverage=1.0)] == [1]
+    assert index.search("the and of", top_k=4) == []
+    assert index.search("library", top_k=0) == []
+    assert BM25Index().build([]).search("library") == []
+    assert len(index.search("library", top_k=1)) == 1
+
+
+def test_reciprocal_rank_fusion_order():
+    dense = [3, 1, 2]
+    sparse = [1, 4, 3]
+    fused = reciprocal_rank_fusion([dense, sparse], k=60)
+    assert [doc_id for doc_id, _ in fused] == [1, 3, 4, 2]
+    scores = dict(fused)
+    assert math.isclose(scores[1], 1 / 62 + 1 / 61)
+    assert math.isclose(scores[3], 1 / 61 + 1 / 63)
+    assert math.isclose(scores[4], 1 / 62)
+    assert math.isclose(scores[2], 1 / 63)
+
+    # A document ranked by both lists beats one ranked first by only one of them
+    assert reciprocal_rank_fusion([[7, 8], [9, 8]], k=1)[0][0] == 8
+    assert reciprocal_rank_fusion([]) == []
+
+
+if __name__ == "__main__":
+    print("🔎 BM25 Index Test")
+    print("=" * 40)
+    failed = 0
+    for test in [test_tokenize_drops_stopwords_and_punctuation, test_scores_match_okapi_bm25,
+                 test_rare_terms_and_short_documents_weigh_more, test_min_coverage_and_empty_queries,
+                 test_reciprocal_rank_fusion_order]:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 40)
+    sys.exit(1 if failed else 0)
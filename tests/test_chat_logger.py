@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Chat log test for the LBS RAG Chatbot
+Checks that the background chat logger writes every queued entry as JSON lines,
+rotates files by size, drops entries instead of blocking when its queue is
+full, and survives write errors.
+Runs offline - no server needed. Use with pytest or run directly.
+"""
+
+import glob
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from chat_logger import ChatLogger
+
+
+def read_entries(directory):
+    entries = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.jsonl'))):
+        with open(path, encoding='utf-8') as f:
+            entries.extend(json.loads(line) for line in f)
+    return entries
+
+
+def test_entries_written_as_json_lines():
+    with tempfile.TemporaryDirectory() as directory:
+        logger = ChatLogger(directory, flush_interval=0.05)
+        for i in range(500):
+            assert logger.log({'i': i, 'query': f"question {i}", 'score': 0.5})
+        assert logger.flush()
+        entries = read_entries(directory)
+        assert sorted(entry['i'] for entry in entries) == list(range(500))
+        assert logger.stats()['written'] == 500
+
+
+def test_rotates_by_size():
+    with tempfile.TemporaryDirectory() as directory:
+        logger = ChatLogger(directory, batch_size=10, flush_interval=0.01, max_bytes=2000)
+        for i in range(300):
+            logger.log({'i': i, 'padding': 'x' * 100})
+        assert logger.flush()
+        assert len(glob.glob(os.path.join(directory, '*.jsonl'))) > 1
+        assert len(read_entries(directory)) == 300
+
+
+def test_full_queue_drops_without_blocking():
+    with tempfile.TemporaryDirectory() as directory:
+        logger = ChatLogger(directory, max_queue=10, flush_interval=0.01)
+        started = time.perf_counter()
+        results = [logger.log({'i': i}) for i in range(10000)]
+        assert time.perf_counter() - started < 1.0
+        assert logger.flush()
+        assert results.count(False) == logger.stats()['dropped'] > 0
+        assert len(read_entries(directory)) == logger.stats()['written'] == results.count(True)
+
+
+def test_write_errors_are_counted_not_raised():
+    with tempfile.TemporaryDirectory() as directory:
+        blocked = os.path.join(directory, 'not-a-directory')
+        open(blocked, 'w').close()
+        logger = ChatLogger(blocked, flush_interval=0.01)
+        assert logger.log({'i': 1})
+        assert logger.flush()
+        assert logger.stats()['failed'] == 1
+
+
+if __name__ == "__main__":
+    print("📝 Chat Log Test")
+    print("=" * 40)
+    failed = 0
+    for test in [test_entries_written_as_json_lines, test_rotates_by_size,
+                 test_full_queue_drops_without_blocking, test_write_errors_are_counted_not_raised]:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 40)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Chunker test for the LBS RAG Chatbot
+Checks that long sections are split into token windows that stay within the
+chunk size, start and end on word boundaries, overlap their neighbours and
+together cover the whole section, that every chunk keeps its section's title
+and source, and that retrieved chunks which overlap or touch in the same
+section are merged back into one passage with their best score.
+Runs offline once the tiktoken encoding is available - no server or embedding
+model needed. Use with pytest or run directly.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from chunker import Chunker
+from data_manager import DataManager
+from token_counter import count_tokens
+
+# Distinct words, so a chunk that cuts a word in half is easy to spot
+WORDS = [f"term{i}" for i in range(300)]
+LONG_SECTION = {'title': "Library Opening Hours", 'content': " ".join(WORDS), 'source': "Library Guide"}
+SHORT_SECTION = {'title': "Exam Timetable", 'content': "Exams are held in the final two weeks of term.",
+                 'source': "Exam Guide"}
+
+
+def test_long_section_is_split_within_chunk_size():
+    chunks = Chunker(max_tokens=40, overlap_tokens=8).split_document(LONG_SECTION, 0)
+    assert len(chunks) > 1
+    for position, chunk in enumerate(chunks):
+        assert chunk['tokens'] <= 40
+        assert count_tokens(chunk['content']) <= 40
+        assert (chunk['section'], chunk['chunk'], chunk['chunk_count']) == (0, position, len(chunks))
+        assert chunk['content'] == LONG_SECTION['content'][chunk['start']:chunk['end']].strip()
+
+
+def test_chunks_end_on_word_boundaries():
+    words = set(WORDS)
+    for chunk in Chunker(max_tokens=40, overlap_tokens=8).split_document(LONG_SECTION, 0):
+        assert all(word in words for word in chunk['content'].split()), chunk['content']
+
+
+def test_neighbouring_chunks_overlap_and_cover_the_section():
+    chunks = Chunker(max_tokens=40, overlap_tokens=8).split_document(LONG_SECTION, 0)
+    assert chunks[0]['start'] == 0
+    assert chunks[-1]['end'] == len(LONG_SECTION['content'])
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert previous['start'] < chunk['start'] < previous['end']
+        assert chunk['content'].split()[0] in previous['content'].split()
+
+    # Without overlap the windows only touch
+    chunks = Chunker(max_tokens=40, overlap_tokens=0).split_document(LONG_SECTION, 0)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert set(previous['content'].split()).isdisjoint(chunk['content'].split())
+    assert sum(len(chunk['content'].split()) for chunk in chunks) == len(WORDS)
+
+
+def test_chunks_keep_title_and_source():
+    chunks = Chunker(max_tokens=40, overlap_tokens=8).chunk_documents([SHORT_SECTION, LONG_SECTION])
+    assert chunks[0]['section'] == 0 and chunks[0]['chunk_count'] == 1
+    assert chunks[0]['content'] == SHORT_SECTION['content']
+    for chunk in chunks[1:]:
+        assert chunk['section'] == 1
+        assert (chunk['title'], chunk['source']) == (LONG_SECTION['title'], LONG_SECTION['source'])
+        assert chunk['full_text'] == f"{LONG_SECTION['title']}: {chunk['content']}"
+
+
+def test_disabled_chunker_keeps_whole_sections():
+    chunks = Chunker(max_tokens=0).chunk_documents([SHORT_SECTION, LONG_SECTION])
+    assert [chunk['content'] for chunk in chunks] == [SHORT_SECTION['content'], LONG_SECTION['content']]
+    assert all(chunk['chunk_count'] == 1 for chunk in chunks)
+
+
+def test_overlapping_retrieved_chunks_are_merged():
+    chunks = Chunker(max_tokens=40, overlap_tokens=8).chunk_documents([SHORT_SECTION, LONG_SECTION])
+    long_chunks = [chunk for chunk in chunks if chunk['section'] == 1]
+    first, second, last = (dict(long_chunks[0], similarity_score=0.4), dict(long_chunks[1], similarity_score=0.7),
+                           dict(long_chunks[-1], similarity_score=0.5))
+    short = dict(chunks[0], similarity_score=0.6)
+
+    passages = DataManager.merge_neighbouring_chunks([last, short, second, first], [SHORT_SECTION, LONG_SECTION])
+    assert [passage['similarity_score'] for passage in passages] == [0.7, 0.6, 0.5]
+    merged = passages[0]
+    assert merged['merged_chunks'] == 2
+    assert (merged['start'], merged['end']) == (first['start'], second['end'])
+    assert merged['content'] == LONG_SECTION['content'][first['start']:second['end']].strip()
+    assert merged['full_text'] == f"{LONG_SECTION['title']}: {merged['content']}"
+    assert passages[2] is last
+
+
+if __name__ == "__main__":
+    print("✂️ Chunker Test")
+    print("=" * 40)
+    failed = 0
+    for test in [test_long_section_is_split_within_chunk_size, test_chunks_end_on_word_boundaries,
+                 test_neighbouring_chunks_overlap_and_cover_the_section, test_chunks_keep_title_and_source,
+                 test_disabled_chunker_keeps_whole_sections, test_overlapping_retrieved_chunks_are_merged]:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 40)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Context packer test for the LBS RAG Chatbot
+Checks that packed context never exceeds the prompt token budget left after
+the reserved tokens, that passages which don't fit are skipped in favour of
+later ones that do (and the best one is cut to size if nothing fits whole),
+that sentences repeated from a better ranked passage are dropped, and that
+passages and sources come out in relevance order.
+Runs offline once the tiktoken encoding is available - no server or embedding
+model needed. Use with pytest or run directly.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from context_packer import ContextPacker
+from token_counter import count_tokens
+
+
+def passage(title, content, score, source=None):
+    return {'title': title, 'content': content, 'source': source or f"{title} Guide", 'similarity_score': score}
+
+
+LIBRARY = passage("Library", "The library is open from 8am to midnight on weekdays.", 0.9)
+EXTENSIONS = passage("Extensions", "Extension requests must be submitted 48 hours before the deadline.", 0.8)
+EXAMS = passage("Exams", "Examinations are held in the final two weeks of each term.", 0.7)
+LONG = passage("Handbook", " ".join(f"Rule {i} of the student handbook applies to every programme." for i in range(60)), 0.95)
+
+
+def test_context_stays_within_budget():
+    for budget in (60, 120, 400):
+        for reserved in (0, 20):
+            packed = ContextPacker(budget_tokens=budget).pack([LONG, LIBRARY, EXTENSIONS, EXAMS], reserved)
+            tokens = packed['tokens']
+            assert tokens['total'] == reserved + tokens['context'] <= budget, (budget, reserved, tokens)
+            assert count_tokens(packed['context']) <= tokens['context']
+
+
+def test_passages_that_dont_fit_are_skipped():
+    small = [LIBRARY, EXTENSIONS, EXAMS]
+    budget = sum(count_tokens(f"**{p['title']}**\n{p['content']}\n\n") + count_tokens(f"- {p['source']}\n")
+                 for p in small) + 5
+    packed = ContextPacker(budget_tokens=budget).pack([LONG, LIBRARY, EXTENSIONS, EXAMS])
+    assert "Handbook" not in packed['context']
+    assert packed['sources'] == ["Library Guide", "Extensions Guide", "Exams Guide"]
+    assert [score['title'] for score in packed['scores']] == ["Library", "Extensions", "Exams"]
+    assert (packed['tokens']['passages'], packed['tokens']['candidates']) == (3, 4)
+
+
+def test_best_passage_is_truncated_when_nothing_fits():
+    packed = ContextPacker(budget_tokens=80).pack([LONG])
+    assert packed['context'].startswith("**Handbook**\nRule 0") and packed['context'].endswith("...\n")
+    assert packed['tokens']['context'] <= 80
+    assert packed['sources'] == ["Handbook Guide"]
+
+    # No room left at all: no context rather than an over-long prompt
+    packed = ContextPacker(budget_tokens=80).pack([LONG, LIBRARY], reserved_tokens=80)
+    assert packed['context'] == "" and packed['sources'] == []
+    assert packed['tokens']['total'] == 80
+
+
+def test_repeated_sentences_are_dropped():
+    repeated = passage("Library Hours", "The library is open from 8am to midnight on weekdays. "
+                       "Weekend hours are 10am to 6pm.", 0.85, source="Library Guide")
+    copy = passage("Library Copy", "the library is open  from 8am to midnight on weekdays.", 0.8)
+    packed = ContextPacker(budget_tokens=400).pack([LIBRARY, repeated, copy, EXAMS])
+    assert packed['context'].count("open from 8am") == 1
+    assert "Weekend hours are 10am to 6pm." in packed['context']
+    assert "Library Copy" not in packed['context']
+    assert packed['tokens']['duplicate_sentences'] == 2
+    assert packed['sources'] == ["Library Guide", "Exams Guide"]
+    assert [score['title'] for score in packed['scores']] == ["Library", "Library Hours", "Exams"]
+
+
+def test_fusion_score_ranks_passages_in_hybrid_mode():
+    low_similarity = dict(EXAMS, similarity_score=0.1, fusion_score=0.05)
+    high_similarity = dict(LIBRARY, similarity_score=0.9, fusion_score=0.01)
+    budget = count_tokens(f"**{EXAMS['title']}**\n{EXAMS['content']}\n\n- {EXAMS['source']}\n") + 2
+    packed = ContextPacker(budget_tokens=budget).pack([low_similarity, high_similarity])
+    assert packed['sources'] == ["Exams Guide"]
+    assert packed['scores'][0]['fusion'] == 0.05
+
+
+if __name__ == "__main__":
+    print("📦 Context Packer Test")
+    print("=" * 40)
+    failed = 0
+    for test in [test_context_stays_within_budget, test_passages_that_dont_fit_are_skipped,
+                 test_best_passage_is_truncated_when_nothing_fits, test_repeated_sentences_are_dropped,
+                 test_fusion_score_ranks_passages_in_hybrid_mode]:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 40)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Conversation safeguard test for the LBS RAG Chatbot
+Checks that a Tier 3 message and its escalation response are never stored in
+a conversation's history, so the crisis text is neither sent to OpenAI with a
+later question nor prefixed to a follow-up's retrieval query, including when
+the escalation is shared with an identical request from another conversation.
+Imports the app offline with an empty knowledge base - no server, API key or
+embedding model needed once the tiktoken encoding is available.
+Use with pytest or run directly.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+CRISIS = "I have been thinking about suicide"
+
+
+def load_chat_app(monkeypatch):
+    """Import the Flask app offline; Tier 3 escalations need no knowledge base or model"""
+    monkeypatch.setenv('OPENAI_API_KEY', os.environ.get('OPENAI_API_KEY', 'test-key'))
+    monkeypatch.setenv('CHAT_LOG_ENABLED', 'false')
+    monkeypatch.setenv('BACKGROUND_MODEL_LOAD', 'false')
+    monkeypatch.setenv('KNOWLEDGE_BASE_PATH', os.path.join(tempfile.gettempdir(), 'lbs-missing-knowledge-base.txt'))
+    import app as chat_app
+    return chat_app
+
+
+def start_conversation(chat_app):
+    """A conversation that has already talked about the library"""
+    sessions = chat_app.session_manager
+    conversation_id = sessions.new_id()
+    sessions.add_turn(conversation_id, sessions.load(conversation_id), "When is the library open?",
+                      "When is the library open?", "From 8am to midnight on weekdays.")
+    return conversation_id
+
+
+def test_crisis_turn_is_not_remembered(monkeypatch):
+    chat_app = load_chat_app(monkeypatch)
+    conversation_id = start_conversation(chat_app)
+
+    analysis, conversation = chat_app.process_turn(CRISIS, conversation_id)
+    assert analysis['requires_immediate_escalation']
+    prepared = chat_app.run_chat(CRISIS, analysis, conversation)
+    assert prepared['response'] == chat_app.query_processor.get_tier_3_escalation_response()
+
+    analysis, conversation = chat_app.process_turn("what about exams?", conversation_id)
+    assert [message['content'] for message in conversation['history']] == \
+        ["When is the library open?", "From 8am to midnight on weekdays."]
+    assert "suicide" not in analysis['cleaned_query']
+    assert analysis['cleaned_query'].startswith("When is the library open?")
+
+
+def test_shared_escalation_is_not_remembered(monkeypatch):
+    chat_app = load_chat_app(monkeypatch)
+    leader_id, follower_id = start_conversation(chat_app), start_conversation(chat_app)
+
+    analysis, leader = chat_app.process_turn(CRISIS, leader_id)
+    prepared = chat_app.run_chat(CRISIS, analysis, leader)
+    _, follower = chat_app.process_turn(CRISIS, follower_id)
+    chat_app.share_chat(prepared, follower)
+
+    for conversation_id in (leader_id, follower_id):
+        session = chat_app.session_manager.load(conversation_id)
+        assert all("suicide" not in message['content'] for message in chat_app.session_manager.messages(session))
+        analysis, _ = chat_app.process_turn("what about exams?", conversation_id)
+        assert "suicide" not in analysis['cleaned_query']
+
+
+if __name__ == "__main__":
+    print("🆘 Conversation Safeguard Test")
+    print("=" * 40)
+    failed = 0
+    for test in [test_crisis_turn_is_not_remembered, test_shared_escalation_is_not_remembered]:
+        try:
+            with pytest.MonkeyPatch.context() as monkeypatch:
+                test(monkeypatch)
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 40)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Embedding store test for the LBS RAG Chatbot
+Checks that stored embeddings come back memory-mapped with their content
+hashes, that embeddings made by another model or in another precision (or
+whose matrix doesn't match its manifest) are rejected rather than served, and
+that saving a new version replaces the old matrix file.
+Runs offline - no server or embedding model needed. Use with pytest or run directly.
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from embedding_store import EmbeddingStore, document_hash
+
+
+def make_embeddings(rows=4, dimension=8):
+    return np.random.default_rng(0).standard_normal((rows, dimension)).astype(np.float32)
+
+
+def test_round_trip_is_memory_mapped():
+    with tempfile.TemporaryDirectory() as directory:
+        store = EmbeddingStore(directory)
+        assert store.load('model-a') is None
+        embeddings = make_embeddings()
+        hashes = [f"hash-{i}" for i in range(len(embeddings))]
+        version = store.save(embeddings, hashes, 'model-a')
+
+        stored = store.load('model-a')
+        assert isinstance(stored['embeddings'], np.memmap)
+        assert np.array_equal(stored['embeddings'], embeddings)
+        assert stored['hashes'] == hashes and stored['version'] == version
+
+
+def test_other_model_or_dtype_is_rejected():
+    with tempfile.TemporaryDirectory() as directory:
+        store = EmbeddingStore(directory)
+        store.save(make_embeddings(), [f"hash-{i}" for i in range(4)], 'model-a')
+        assert store.load('model-b') is None
+        assert store.load('model-a+onnx-int8') is None
+        assert store.load('model-a', np.float16) is None
+        assert store.load('model-a', np.float32) is not None
+
+
+def test_mismatched_manifest_is_rejected():
+    with tempfile.TemporaryDirectory() as directory:
+        store = EmbeddingStore(directory)
+        store.save(make_embeddings(), [f"hash-{i}" for i in range(4)], 'model-a')
+        manifest = store.read_manifest()
+        manifest['hashes'] = manifest['hashes'][:3]
+        with open(store.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        assert store.load('model-a') is None
+
+        with open(store.manifest_path, 'w', encoding='utf-8') as f:
+            f.write("{not json")
+        assert store.load('model-a') is None
+
+
+def test_new_version_replaces_old_matrix():
+    with tempfile.TemporaryDirectory() as directory:
+        store = EmbeddingStore(directory)
+        first = store.save(make_embeddings(), [f"hash-{i}" for i in range(4)], 'model-a')
+        second = store.save(make_embeddings(rows=2), ["hash-0", "hash-9"], 'model-a')
+        assert first != second
+        assert sorted(name for name in os.listdir(directory) if name.endswith('.npy')) == [f"embeddings-{second}.npy"]
+        assert store.load('model-a')['hashes'] == ["hash-0", "hash-9"]
+
+
+def test_hash_follows_embedded_text():
+    section = {'title': "Library", 'content': "Open 8am to midnight.", 'full_text': "Library: Open 8am to midnight."}
+    edited = dict(section, full_text="Library: Open 9am to midnight.")
+    assert document_hash(section) == document_hash(dict(section))
+    assert document_hash(section) != document_hash(edited)
+
+
+if __name__ == "__main__":
+    print("💾 Embedding Store Test")
+    print("=" * 40)
+    failed = 0
+    for test in [test_round_trip_is_memory_mapped, test_other_model_or_dtype_is_rejected,
+                 test_mismatched_manifest_is_rejected, test_new_version_replaces_old_matrix,
+                 test_hash_follows_embedded_text]:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 40)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Knowledge base reload test for the LBS RAG Chatbot
+Checks that stored embeddings are reused only for the model that made them,
+that a reload encodes only added or changed sections (and reports how many were
+encoded, reused and dropped), that concurrent readers only ever see a whole
+snapshot while reloads swap new ones in (one generation each), and that a
+reload which succeeds after a failed initial load brings retrieval up.
+Uses a small knowledge base in a temporary directory and a fake embedding
+model, so it runs offline once the tiktoken encoding is available - no server,
+API key or sentence-transformers download needed. Use with pytest or run directly.
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from data_manager import DataManager
+from embedding_store import EmbeddingStore
+
+SECTIONS = {
+    'Library Opening Hours': "The library is open from 8am to midnight on weekdays and 10am to 6pm at weekends.",
+    'Assignment Extensions': "Extension requests must be submitted 48 hours before the deadline with documentation.",
+    'Exam Timetable': "Examinations are held in the final two weeks of each term in the main building.",
+}
+
+
+class FakeEncoder:
+    """Stands in for the sentence transformer: hashed bag-of-words vectors, and a log of what was encoded"""
+
+    def __init__(self, dimension=32, fail=False):
+        self.dimension = dimension
+        self.fail = fail
+        self.encoded = []
+
+    def encode(self, texts):
+        if self.fail:
+            raise RuntimeError("embedding model unavailable")
+        self.encoded.extend(texts)
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dimension] += 1.0
+        return vectors
+
+
+def write_knowledge_base(path, sections):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("# LBS Knowledge Base\n\n")
+        f.write("\n---\n".join(f"## {title}\n{content}\nSource: {title} Guide\n" for title, content in sections.items()))
+
+
+def make_data_manager(directory, encoder=None, sections=SECTIONS):
+    path = os.path.join(directory, 'knowledge_base.txt')
+    write_knowledge_base(path, sections)
+    data_manager = DataManager(path, load=False)
+    data_manager.embedding_store = EmbeddingStore(os.path.join(directory, 'embeddings'))
+    data_manager.model = encoder or FakeEncoder()
+    return data_manager
+
+
+def test_embeddings_from_another_model_are_not_reused():
+    with tempfile.TemporaryDirectory() as directory:
+        data_manager = make_data_manager(directory)
+        data_manager.load()
+        assert data_manager.last_reload_report['encoded'] == len(SECTIONS)
+
+        # Same knowledge base and store, new process: the stored vectors are reused as-is
+        restarted = make_data_manager(directory)
+        restarted.load()
+        assert restarted.last_reload_report['reused'] == len(SECTIONS)
+        assert restarted.model.encoded == []
+
+        # Same sections, different embedding model: every stored vector is stale
+        switched = make_data_manager(directory)
+        switched.embedding_model_id = 'another-model'
+        switched.load()
+        assert switched.last_reload_report['encoded'] == len(SECTIONS)
+        assert switched.last_reload_report['reused'] == 0
+        assert len(switched.model.encoded) == len(SECTIONS)
+        assert switched.embedding_store.read_manifest()['model'] == 'another-model'
+
+
+def test_reload_encodes_only_changed_sections():
+    with tempfile.TemporaryDirectory() as directory:
+        encoder = FakeEncoder()
+        data_manager = make_data_manager(directory, encoder)
+        data_manager.load()
+        library_vector = np.array(data_manager.embeddings[0])
+
+        # One section edited, one deleted, one unchanged and two added
+        edited = dict(SECTIONS)
+        edited['Assignment Extensions'] = "Extension requests must be submitted 72 hours before the deadline."
+        del edited['Exam Timetable']
+        edited['Careers Service'] = "Book a one-to-one careers coaching session through the careers portal."
+        edited['Student Clubs'] = "There are over 80 student-led clubs covering industries and interests."
+        write_knowledge_base(data_manager.knowledge_base_path, edited)
+        encoder.encoded.clear()
+
+        report = data_manager.reload()
+        assert (report['encoded'], report['reused'], report['dropped'], report['total']) == (3, 1, 2, 4)
+        assert sorted(text.split(':')[0] for text in encoder.encoded) == \
+            ['Assignment Extensions', 'Careers Service', 'Student Clubs']
+        assert np.array_equal(data_manager.embeddings[0], library_vector)
+        assert [doc['title'] for doc in data_manager.sections] == list(edited)
+
+        # Reloading an unchanged file encodes nothing
+        encoder.encoded.clear()
+        report = data_manager.reload()
+        assert (report['encoded'], report['reused'], report['dropped']) == (0, 4, 0)
+        assert encoder.encoded == []
+
+
+def test_readers_never_see_a_half_swapped_snapshot():
+    with tempfile.TemporaryDirectory() as directory:
+        data_manager = make_data_manager(directory)
+        data_manager.load()
+        generation = data_manager.generation
+        larger = {**SECTIONS, 'Careers Service': "Book a one-to-one careers coaching session online.",
+                  'Student Clubs': "There are over 80 student-led clubs covering industries and interests."}
+        problems = []
+        stop = threading.Event()
+
+        def read():
+            while not stop.is_set():
+                state = data_manager.state
+                sizes = {len(state.documents), len(state.embeddings), state.index.size, state.sparse_index.size}
+                if len(sizes) != 1 or len(state.documents) not in (len(SECTIONS), len(larger)):
+                    problems.append(sizes)
+                try:
+                    data_manager.search_similar_documents("careers coaching session", top_k=2)
+                except Exception as e:
+                    problems.append(repr(e))
+
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        for i in range(10):
+            write_knowledge_base(data_manager.knowledge_base_path, larger if i % 2 == 0 else SECTIONS)
+            data_manager.reload()
+        stop.set()
+        for reader in readers:
+            reader.join()
+
+        assert problems == []
+        assert data_manager.generation == generation + 10
+        assert len(data_manager.documents) == len(SECTIONS)
+        assert not data_manager.reload_status()['reload_in_progress']
+
+
+def test_reload_recovers_from_failed_load():
+    with tempfile.TemporaryDirectory() as directory:
+        encoder = FakeEncoder(fail=True)
+        data_manager = make_data_manager(directory, encoder)
+        try:
+            data_manager.load()
+            assert False, "load should have failed"
+        except RuntimeError:
+            pass
+        assert data_manager.readiness['state'] == 'failed' and not data_manager.ready
+
+        encoder.fail = False
+        report = data_manager.reload()
+        assert data_manager.ready
+        assert data_manager.readiness['error'] is None
+        assert report['encoded'] == len(SECTIONS)
+        assert data_manager.search_similar_documents("When is the library open?", top_k=1)
+
+
+def test_failed_reload_keeps_serving():
+    with tempfile.TemporaryDirectory() as directory:
+        encoder = FakeEncoder()
+        data_manager = make_data_manager(directory, encoder)
+        data_manager.load()
+        generation = data_manager.generation
+
+        write_knowledge_base(data_manager.knowledge_base_path, {**SECTIONS, 'Careers': "Book a careers coach online."})
+        encoder.fail = True
+        try:
+            data_manager.reload()
+            assert False, "reload should have failed"
+        except RuntimeError:
+            pass
+        assert data_manager.ready and data_manager.generation == generation
+        assert data_manager.reload_status()['last_reload_error'] == "embedding model unavailable"
+        assert len(data_manager.documents) == len(SECTIONS)
+
+
+if __name__ == "__main__":
+    print("🔄 Knowledge Base Reload Test")
+    print("=" * 40)
+    failed = 0
+    for test in [test_embeddings_from_another_model_are_not_reused, test_reload_encodes_only_changed_sections,
+                 test_readers_never_see_a_half_swapped_snapshot, test_reload_recovers_from_failed_load,
+                 test_failed_reload_keeps_serving]:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 40)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+OpenAI resilience test for the LBS RAG Chatbot
+Points the response generator at a local fake OpenAI server that answers with
+scripted rate limits, server errors and slow responses, and checks that
+transient errors are retried, client errors are not, the per-call deadline
+holds, the circuit breaker opens on failed or slow calls (including streams
+that break off partway) and recovers, and that failures are answered from
+retrieval alone with the sources.
+Runs offline - no server or API key needed. Use with pytest or run directly.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from chatbot_logic.generator import ResponseGenerator
+
+ANSWER = "Submit the extenuating circumstances form within 5 days."
+CONTEXT = "**Extenuating Circumstances**\nStudents must submit the form within five working days of the deadline."
+SOURCES = ["Extenuating Circumstances Policy"]
+TIER_1 = {'safeguard_tier': 1}
+# Scripted status for a stream that starts normally and then breaks off
+BROKEN_STREAM = 'broken'
+
+
+class FakeOpenAI(ThreadingHTTPServer):
+    """Serves /v1/chat/completions, one scripted (status, delay seconds) reply per request
+
+    A BROKEN_STREAM status sends the first half of a streamed answer and then closes the connection.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, script):
+        super().__init__(('127.0.0.1', 0), FakeOpenAIHandler)
+        self.script = list(script)
+        self.hits = 0
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def next_reply(self):
+        with self.lock:
+            self.hits += 1
+            return self.script.pop(0) if self.script else (200, 0)
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        status, delay = self.server.next_reply()
+        time.sleep(delay)
+        if status not in (200, BROKEN_STREAM):
+            body = json.dumps({'error': {'message': f"scripted {status}", 'type': 'test'}}).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Retry-After', '0')
+        elif request.get('stream'):
+            events = [{'choices': [{'index': 0, 'delta': {'content': word}}]} for word in ANSWER.split(' ')]
+            for event in events[:-1]:
+                event['choices'][0]['delta']['content'] += ' '
+            events.append({'choices': [], 'usage': {'prompt_tokens': 10, 'completion_tokens': 9, 'total_tokens': 19}})
+            body = "".join(f"data: {json.dumps(event)}\n\n" for event in events).encode() + b"data: [DONE]\n\n"
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            if status == BROKEN_STREAM:
+                # Promise the whole body, send half of it and hang up
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body[:body.index(b"\n\n", len(body) // 2) + 2])
+                self.wfile.flush()
+                return
+        else:
+            body = json.dumps({
+                'id': 'chatcmpl-test', 'object': 'chat.completion', 'created': 0, 'model': request['model'],
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': ANSWER}}],
+                'usage': {'prompt_tokens': 10, 'completion_tokens': 9, 'total_tokens': 19}
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def make_generator(monkeypatch, server, **settings):
+    """A ResponseGenerator pointed at the fake server; the settings are undone after the test"""
+    env = {
+        'OPENAI_API_KEY': 'test-key', 'OPENAI_BASE_URL': server.base_url,
+        'OPENAI_TIMEOUT': '2', 'OPENAI_DEADLINE': '5', 'OPENAI_MAX_RETRIES': '2',
+        'OPENAI_BACKOFF_BASE': '0.01', 'OPENAI_BACKOFF_MAX': '0.05',
+        'OPENAI_BREAKER_FAILURES': '5', 'OPENAI_BREAKER_RESET_SECONDS': '30', 'OPENAI_SLOW_CALL_SECONDS': '10'
+    }
+    env.update(settings)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    return ResponseGenerator()
+
+
+def test_transient_errors_are_retried(monkeypatch):
+    server = FakeOpenAI([(429, 0), (500, 0)])
+    response = make_generator(monkeypatch, server).generate_response("question", CONTEXT, SOURCES, TIER_1)
+    assert response['answer'] == ANSWER
+    assert server.hits == 3
+
+
+def test_client_errors_are_not_retried(monkeypatch):
+    server = FakeOpenAI([(400, 0)])
+    response = make_generator(monkeypatch, server).generate_response("question", CONTEXT, SOURCES, TIER_1)
+    assert server.hits == 1
+    assert response['confidence'] == 'degraded'
+    assert response['sources'] == SOURCES
+    assert "five working days" in response['answer']
+
+
+def test_deadline_bounds_slow_upstream(monkeypatch):
+    server = FakeOpenAI([(200, 3)] * 5)
+    generator = make_generator(monkeypatch, server, OPENAI_TIMEOUT='0.4', OPENAI_DEADLINE='1')
+    started = time.perf_counter()
+    response = generator.generate_response("question", CONTEXT, SOURCES, TIER_1)
+    assert time.perf_counter() - started < 1.5
+    assert response['confidence'] == 'degraded'
+
+
+def test_breaker_opens_then_recovers(monkeypatch):
+    server = FakeOpenAI([(503, 0), (503, 0)])
+    generator = make_generator(monkeypatch, server, OPENAI_MAX_RETRIES='0', OPENAI_BREAKER_FAILURES='2',
+                               OPENAI_BREAKER_RESET_SECONDS='0.5')
+    for _ in range(2):
+        generator.generate_response("question", CONTEXT, SOURCES, TIER_1)
+    assert generator.breaker.state == 'open'
+
+    # Open: answered from retrieval without calling OpenAI
+    started = time.perf_counter()
+    response = generator.generate_response("question", CONTEXT, SOURCES, TIER_1)
+    assert time.perf_counter() - started < 0.1
+    assert server.hits == 2
+    assert response['confidence'] == 'degraded'
+    assert response['sources'] == SOURCES
+
+    # Half-open after the reset timeout: a successful trial call closes it
+    time.sleep(0.6)
+    response = generator.generate_response("question", CONTEXT, SOURCES, TIER_1)
+    assert response['answer'] == ANSWER
+    assert generator.breaker.state == 'closed'
+
+
+def test_slow_calls_open_breaker(monkeypatch):
+    server = FakeOpenAI([(200, 0.3)])
+    generator = make_generator(monkeypatch, server, OPENAI_BREAKER_FAILURES='1', OPENAI_SLOW_CALL_SECONDS='0.1')
+    assert generator.generate_response("question", CONTEXT, SOURCES, TIER_1)['answer'] == ANSWER
+    assert generator.breaker.state == 'open'
+
+
+def test_no_context_gives_fallback_response(monkeypatch):
+    server = FakeOpenAI([(500, 0)])
+    generator = make_generator(monkeypatch, server, OPENAI_MAX_RETRIES='0')
+    assert generator.generate_response("question", "", [], TIER_1)['confidence'] == 'system_error'
+
+
+def test_stream_retries_before_first_token(monkeypatch):
+    server = FakeOpenAI([(429, 0)])
+    events = list(make_generator(monkeypatch, server).generate_response_stream("question", CONTEXT, SOURCES, TIER_1))
+    deltas = "".join(payload for kind, payload in events if kind == 'delta')
+    assert deltas == ANSWER
+    assert events[-1] == ('done', events[-1][1]) and events[-1][1]['answer'] == ANSWER
+    assert server.hits == 2
+
+
+def test_stream_broken_partway_counts_as_failure(monkeypatch):
+    server = FakeOpenAI([(BROKEN_STREAM, 0)])
+    generator = make_generator(monkeypatch, server, OPENAI_BREAKER_FAILURES='1')
+    events = list(generator.generate_response_stream("question", CONTEXT, SOURCES, TIER_1))
+    assert [kind for kind, _ in events].count('delta') > 0
+    assert events[-1][0] == 'done' and events[-1][1]['confidence'] == 'degraded'
+    assert generator.breaker.state == 'open'
+    assert server.hits == 1
+
+
+def test_async_stream_broken_partway_counts_as_failure(monkeypatch):
+    server = FakeOpenAI([(BROKEN_STREAM, 0)])
+    generator = make_generator(monkeypatch, server, OPENAI_BREAKER_FAILURES='1')
+
+    async def collect():
+        return [event async for event in generator.agenerate_response_stream("question", CONTEXT, SOURCES, TIER_1)]
+
+    events = asyncio.run(collect())
+    assert [kind for kind, _ in events].count('delta') > 0
+    assert events[-1][0] == 'done' and events[-1][1]['confidence'] == 'degraded'
+    assert generator.breaker.state == 'open'
+
+
+def test_async_client_retries(monkeypatch):
+    server = FakeOpenAI([(502, 0)])
+    generator = make_generator(monkeypatch, server)
+    response = asyncio.run(generator.agenerate_response("question", CONTEXT, SOURCES, TIER_1))
+    assert response['answer'] == ANSWER
+    assert server.hits == 2
+
+
+if __name__ == "__main__":
+    print("🔌 OpenAI Resilience Test")
+    print("=" * 40)
+    failed = 0
+    for test in [test_transient_errors_are_retried, test_client_errors_are_not_retried,
+                 test_deadline_bounds_slow_upstream, test_breaker_opens_then_recovers,
+                 test_slow_calls_open_breaker, test_no_context_gives_fallback_response,
+                 test_stream_retries_before_first_token, test_stream_broken_partway_counts_as_failure,
+                 test_async_stream_broken_partway_counts_as_failure, test_async_client_retries]:
+        try:
+            with pytest.MonkeyPatch.context() as monkeypatch:
+                test(monkeypatch)
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 40)
+    sys.exit(1 if failed else 0)
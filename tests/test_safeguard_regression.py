@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Safeguard regression test for the LBS RAG Chatbot
+Checks that the single-pass keyword matcher in QueryProcessor gives exactly the
+same safeguard tier and query type as the original per-keyword substring scans
+over a regression corpus of hand-written and generated queries.
+Runs offline - no server needed. Use with pytest or run directly.
+"""
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from chatbot_logic.processor import QueryProcessor
+
+
+# Frozen copy of the original (pre single-pass) classification logic
+def legacy_safeguard_tier(processor, query):
+    query_lower = query.lower()
+    for trigger in processor.escalation_triggers:
+        if trigger in query_lower:
+            return 2
+    for keyword in processor.critical_keywords:
+        if keyword in query_lower:
+            return 3
+    for keyword in processor.cautious_keywords:
+        if keyword in query_lower:
+            return 2
+    return 1
+
+
+def legacy_query_type(query):
+    query_lower = query.lower()
+    if any(word in query_lower for word in ['assignment', 'exam', 'test', 'grade', 'submit', 'deadline', 'assessment', 'deferral']):
+        return 'academic'
+    elif any(word in query_lower for word in ['transcript', 'enrollment', 'registration', 'fee', 'payment', 'schedule']):
+        return 'administrative'
+    elif any(word in query_lower for word in ['canvas', 'login', 'access', 'technical', 'password', 'download']):
+        return 'technical'
+    elif any(word in query_lower for word in ['policy', 'rule', 'regulation', 'attendance', 'plagiarism', 'integrity']):
+        return 'policy'
+    elif any(word in query_lower for word in ['mental health', 'stress', 'anxiety', 'support', 'counseling']):
+        return 'wellness'
+    else:
+        return 'general'
+
+
+HAND_WRITTEN_QUERIES = [
+    "What can you help me with?",
+    "What are the official grade classifications for Masters students?",
+    "If I fail a module, can I retake it?",
+    "I missed an exam. What qualifies as extenuating circumstances?",
+    "I'm feeling really overwhelmed and having thoughts of self-harm",
+    "Can you help me plan my weekend vacation to Paris?",
+    "How do I submit assignments on Canvas?",
+    "What if I can't upload my file?",
+    "I am experiencing harassment from another student",
+    "What are the plagiarism rules?",
+    "Random nonsense query about flying elephants",
+    # Overlapping keywords across tiers
+    "I think I'm having a mental health crisis",
+    "I have mental health issues and need support",
+    "I need to talk to someone about suicide",
+    "Sexual harassment in my study group",
+    "The dean said there was a plagiarism violation",
+    "Is the latest timetable out?",  # 'test' inside 'latest'
+    "KILL MYSELF",
+    "i want to   kill  myself",  # whitespace differs between raw and cleaned query
+    "self‐harm with a unicode hyphen",
+    "s.e.l.f-h.a.r.m",
+    "What's the fee for late registration?",
+    "Can I access Canvas from abroad? My password expired",
+    "Attendance policy for students with a disability accommodation",
+    "How do I appeal a grade? Is it a formal complaint?",
+    "Where can I find counseling or a counselor?",
+    "Visa and work permit questions after graduation",
+    "I feel stress and anxiety before exams",
+    "Emergency! urgent help needed",
+    "abuse of the substance abuse policy",
+    "",
+    "?!.,-",
+    "deferral deadline",
+    "endangered escalated conflict",
+]
+
+
+def build_corpus(seed=7, generated=2000):
+    """Hand-written queries plus every keyword in templates plus random keyword mixes"""
+    processor = QueryProcessor()
+    keywords = (processor.escalation_triggers + processor.critical_keywords + processor.cautious_keywords
+                + processor.normal_topics + [kw for _, kws in processor.query_type_keywords for kw in kws])
+    templates = ["{}", "I have a question about {}.", "{} - what should I do?", "WHAT ABOUT {}?!", "re:{}'s policy"]
+
+    corpus = list(HAND_WRITTEN_QUERIES)
+    corpus += [template.format(keyword) for keyword in keywords for template in templates]
+
+    rng = random.Random(seed)
+    filler = ["please", "the", "my", "module", "tomorrow", "a", "about", "and", "  ", "?", "'", "-"]
+    for _ in range(generated):
+        words = rng.sample(keywords, rng.randint(1, 3)) + rng.sample(filler, rng.randint(0, 4))
+        rng.shuffle(words)
+        text = " ".join(words)
+        if rng.random() < 0.3:
+            text = text.upper()
+        if rng.random() < 0.3:
+            # Glue words together so keywords can straddle word boundaries
+            text = text.replace(" ", "", rng.randint(1, 3))
+        corpus.append(text)
+    return corpus
+
+
+def test_safeguard_tier_matches_legacy():
+    processor = QueryProcessor()
+    mismatches = [
+        (query, legacy_safeguard_tier(processor, query), processor.process_query(query)['safeguard_tier'])
+        for query in build_corpus()
+        if legacy_safeguard_tier(processor, query) != processor.process_query(query)['safeguard_tier']
+    ]
+    assert not mismatches, f"Tier mismatches: {mismatches[:10]}"
+
+
+def test_tier_3_identical():
+    processor = QueryProcessor()
+    corpus = build_corpus()
+    legacy_tier_3 = [query for query in corpus if legacy_safeguard_tier(processor, query) == 3]
+    new_tier_3 = [query for query in corpus if processor.process_query(query)['requires_immediate_escalation']]
+    assert legacy_tier_3 == new_tier_3
+    assert len(legacy_tier_3) > 100
+
+
+def test_query_type_matches_legacy():
+    processor = QueryProcessor()
+    for query in build_corpus():
+        cleaned = processor.clean_query(query)
+        assert processor.process_query(query)['query_type'] == legacy_query_type(cleaned), query
+        assert processor.classify_query_type(cleaned) == legacy_query_type(cleaned), query
+
+
+def test_matched_keywords_are_substrings():
+    processor = QueryProcessor()
+    analysis = processor.process_query("I think I'm having a mental health crisis")
+    assert analysis['matched_keywords']['critical'] == ['mental health crisis', 'crisis']
+    assert analysis['matched_keywords']['cautious'] == ['mental health']
+    assert analysis['matched_keywords']['wellness'] == ['mental health']
+
+
+if __name__ == "__main__":
+    print("🛡️ Safeguard Regression Test")
+    print("=" * 40)
+    print(f"Corpus size: {len(build_corpus())} queries")
+    failed = 0
+    for test in [test_safeguard_tier_matches_legacy, test_tier_3_identical,
+                 test_query_type_matches_legacy, test_matched_keywords_are_substrings]:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 40)
+    sys.exit(1 if failed else 0)
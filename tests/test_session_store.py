@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Conversation session test for the LBS RAG Chatbot
+Checks that follow-ups are rewritten into standalone retrieval queries, that
+the history a prompt carries stays within its token bounds however long the
+conversation runs (older turns compacted into a summary), that conversation
+ids are random server-issued tokens, and that session backends evict by
+LRU/TTL and can be swapped for another implementation.
+Runs offline once the tiktoken encoding is available - no server needed.
+Use with pytest or run directly.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from session_store import InMemorySessionBackend, SessionManager, load_session_backend
+from token_counter import count_tokens
+
+LONG_ANSWER = ("You can apply for extenuating circumstances through the student portal. "
+               + "Include supporting evidence from a doctor or other professional. " * 20)
+
+
+class DictBackend:
+    """A minimal pluggable backend"""
+
+    def __init__(self, maxsize, ttl):
+        self.sessions = {}
+
+    def get(self, conversation_id):
+        return self.sessions.get(conversation_id)
+
+    def set(self, conversation_id, session):
+        self.sessions[conversation_id] = session
+
+    def delete(self, conversation_id):
+        self.sessions.pop(conversation_id, None)
+
+    def stats(self):
+        return {'backend': 'dict', 'size': len(self.sessions)}
+
+
+def history_tokens(manager, session):
+    return sum(count_tokens(message['content']) for message in manager.messages(session))
+
+
+def test_follow_ups_become_standalone_queries():
+    manager = SessionManager()
+    session = manager.load('c1')
+    first = "How do I apply for extenuating circumstances?"
+    assert manager.standalone_query(session, first) == first  # Nothing to follow up on yet
+    manager.add_turn('c1', session, first, first, LONG_ANSWER)
+
+    session = manager.load('c1')
+    follow_up = manager.standalone_query(session, "and what about the deadline for that?")
+    assert follow_up == f"{first} and what about the deadline for that?"
+    assert manager.standalone_query(session, "When does the careers fair take place this year?") == \
+        "When does the careers fair take place this year?"
+
+    # A follow-up to a follow-up keeps the conversation's topic at the start
+    manager.add_turn('c1', session, "and what about the deadline for that?", follow_up, "Within five days.")
+    session = manager.load('c1')
+    assert manager.standalone_query(session, "Is it strict?").startswith(first)
+
+
+def test_history_stays_bounded():
+    manager = SessionManager(history_tokens=300, summary_tokens=100)
+    sizes = []
+    for turn in range(40):
+        session = manager.load('long')
+        query = f"Question {turn} about extenuating circumstances and assessment deadlines?"
+        manager.add_turn('long', session, query, query, LONG_ANSWER)
+        sizes.append(history_tokens(manager, manager.load('long')))
+    assert max(sizes) <= 300 + 100 + 20  # Turns, summary, and the summary heading
+    assert max(sizes[10:]) - min(sizes[10:]) < 80  # Flat once compaction kicks in
+
+    session = manager.load('long')
+    assert session['turn_count'] == 40
+    assert "Question 39" in session['turns'][-1]['user']
+    assert session['summary'] and "Student asked: Question" in session['summary'][-1]
+    assert not any("Question 0 " in line for line in session['summary'])  # Oldest summary lines dropped
+
+
+def test_sessions_are_copies():
+    manager = SessionManager()
+    session = manager.load('c2')
+    manager.add_turn('c2', session, "Where is the library?", "Where is the library?", "In the Sainsbury building.")
+    loaded = manager.load('c2')
+    loaded['turns'].clear()
+    assert len(manager.load('c2')['turns']) == 1
+    manager.delete('c2')
+    assert manager.load('c2')['turns'] == []
+
+
+def test_conversation_ids_are_issued_unguessable():
+    manager = SessionManager()
+    ids = {manager.new_id() for _ in range(100)}
+    assert len(ids) == 100
+    assert all(len(conversation_id) >= 32 for conversation_id in ids)
+    conversation_id = ids.pop()
+    assert not manager.exists(conversation_id)  # Known only once a turn is saved
+    manager.add_turn(conversation_id, manager.load(conversation_id), "Where is the library?", "Where is the library?")
+    assert manager.exists(conversation_id)
+    manager.delete(conversation_id)
+    assert not manager.exists(conversation_id)
+
+
+def test_memory_backend_evicts_by_lru_and_ttl():
+    backend = InMemorySessionBackend(maxsize=2, ttl=0.1)
+    for conversation_id in ['a', 'b', 'c']:
+        backend.set(conversation_id, {'turns': []})
+    assert backend.get('a') is None and backend.get('c') is not None
+    time.sleep(0.15)
+    assert backend.get('c') is None
+
+
+def test_pluggable_backend():
+    backend = load_session_backend(f"{__name__}:DictBackend", maxsize=10, ttl=60)
+    assert type(backend).__name__ == 'DictBackend'
+    manager = SessionManager(backend)
+    manager.add_turn('c3', manager.load('c3'), "Where is the library?", "Where is the library?", "Sainsbury building.")
+    assert backend.stats()['size'] == 1
+
+
+if __name__ == "__main__":
+    print("💬 Conversation Session Test")
+    print("=" * 40)
+    failed = 0
+    for test in [test_follow_ups_become_standalone_queries, test_history_stays_bounded, test_sessions_are_copies,
+                 test_conversation_ids_are_issued_unguessable, test_memory_backend_evicts_by_lru_and_ttl,
+                 test_pluggable_backend]:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 40)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Request coalescing test for the LBS RAG Chatbot
+Checks that concurrent calls with the same key share one execution and its
+result (or its exception), that different keys and later calls run on their
+own, that flights a leader finishes itself (streamed answers) reach their
+followers, and the same for coroutines on the ASGI event loop.
+Runs offline - no server needed. Use with pytest or run directly.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from single_flight import SingleFlight
+
+
+def slow_counter(calls, delay=0.2, result="answer"):
+    def function():
+        calls.append(threading.get_ident())
+        time.sleep(delay)
+        return result
+    return function
+
+
+def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight()
+    calls = []
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        results = list(pool.map(lambda _: flights.do(('q', 1, 0), slow_counter(calls)), range(20)))
+    assert len(calls) == 1
+    assert all(result == "answer" for result, _ in results)
+    assert sum(shared for _, shared in results) == 19
+    assert flights.stats()['executions'] == 1 and flights.stats()['shared'] == 19
+    assert flights.in_flight() == 0
+
+
+def test_different_keys_and_later_calls_run_separately():
+    flights = SingleFlight()
+    calls = []
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda key: flights.do(key, slow_counter(calls)), ['a', 'b', 'c', 'd']))
+    flights.do('a', slow_counter(calls, delay=0))
+    assert len(calls) == 5
+    assert flights.stats()['shared'] == 0
+
+
+def test_errors_reach_every_waiter():
+    flights = SingleFlight()
+
+    def failing():
+        time.sleep(0.2)
+        raise ValueError("upstream failed")
+
+    def call(_):
+        try:
+            flights.do('q', failing)
+        except ValueError as e:
+            return str(e)
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        assert list(pool.map(call, range(5))) == ["upstream failed"] * 5
+    assert flights.in_flight() == 0
+
+
+def test_disabled_runs_every_call():
+    flights = SingleFlight(enabled=False)
+    calls = []
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        list(pool.map(lambda _: flights.do('q', slow_counter(calls, delay=0.05)), range(5)))
+    assert len(calls) == 5
+
+
+def test_async_calls_share_one_execution():
+    flights = SingleFlight()
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return "answer"
+
+    async def main():
+        return await asyncio.gather(*[flights.ado('q', generate) for _ in range(20)])
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert [result for result, _ in results] == ["answer"] * 20
+    assert sum(shared for _, shared in results) == 19
+    assert flights.in_flight() == 0
+
+
+def test_leader_finishes_started_flight():
+    flights = SingleFlight()
+    flight, leader = flights.start('q')
+    assert leader
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        followers = [pool.submit(lambda: flights.start('q')) for _ in range(3)]
+        joined = [future.result() for future in followers]
+        assert not any(is_leader for _, is_leader in joined)
+        waits = [pool.submit(follower.wait) for follower, _ in joined]
+        time.sleep(0.1)
+        assert not any(wait.done() for wait in waits)
+        flight.finish("streamed answer")
+        flight.fail(ValueError("too late"))  # The first outcome stands
+        assert [wait.result() for wait in waits] == ["streamed answer"] * 3
+    assert flights.in_flight() == 0
+    assert flights.start('q')[1]
+
+
+def test_async_leader_failure_reaches_followers():
+    flights = SingleFlight()
+
+    async def follower():
+        flight, leader = flights.astart('q')
+        assert not leader
+        try:
+            return await flight.wait()
+        except ValueError as e:
+            return str(e)
+
+    async def main():
+        flight, leader = flights.astart('q')
+        assert leader
+        waits = [asyncio.ensure_future(follower()) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        flight.fail(ValueError("stream broke"))
+        return await asyncio.gather(*waits)
+
+    assert asyncio.run(main()) == ["stream broke"] * 3
+    assert flights.in_flight() == 0
+
+
+if __name__ == "__main__":
+    print("🔀 Request Coalescing Test")
+    print("=" * 40)
+    failed = 0
+    for test in [test_concurrent_calls_share_one_execution, test_different_keys_and_later_calls_run_separately,
+                 test_errors_reach_every_waiter, test_disabled_runs_every_call, test_async_calls_share_one_execution,
+                 test_leader_finishes_started_flight, test_async_leader_failure_reaches_followers]:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 40)
+    sys.exit(1 if failed else 0)
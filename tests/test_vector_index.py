@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Vector index test for the LBS RAG Chatbot
+Checks that the flat index returns exactly the top-k of a brute-force sort,
+that the IVF index is exact when every list is probed, that batch search
+matches one search per query, that a zero or negative top_k returns nothing,
+and that persisted indexes load back identically (never half-written while
+other processes save the same index) while an index saved for another
+embeddings version is rebuilt rather than reused.
+Uses random embeddings, so it runs offline - no server or embedding model needed.
+Use with pytest or run directly.
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from data_manager import DataManager
+from embedding_store import EmbeddingStore
+from vector_index import FlatIndex, IVFIndex, VectorIndex, normalize_embeddings, top_k_indices
+
+
+def random_embeddings(rows, dimension=16, seed=0):
+    return normalize_embeddings(np.random.default_rng(seed).standard_normal((rows, dimension)))
+
+
+EMBEDDINGS = random_embeddings(500)
+QUERIES = random_embeddings(20, seed=1)
+
+
+def brute_force(query, top_k):
+    scores = EMBEDDINGS @ query
+    return [int(idx) for idx in np.argsort(-scores)[:top_k]]
+
+
+def test_flat_index_is_exact():
+    index = FlatIndex()
+    index.build(EMBEDDINGS)
+    for query in QUERIES:
+        for top_k in (1, 5, 50):
+            results = index.search(query, top_k)
+            assert [doc_id for doc_id, _ in results] == brute_force(query, top_k)
+            assert all(np.isclose(score, EMBEDDINGS[doc_id] @ query) for doc_id, score in results)
+    assert len(index.search(QUERIES[0], top_k=1000)) == len(EMBEDDINGS)
+
+
+def test_zero_or_negative_top_k_returns_nothing():
+    assert len(top_k_indices(np.arange(10, dtype=np.float32), 0)) == 0
+    assert len(top_k_indices(np.arange(10, dtype=np.float32), -3)) == 0
+    flat = FlatIndex()
+    flat.build(EMBEDDINGS)
+    ivf = IVFIndex(nlist=8)
+    ivf.build(EMBEDDINGS)
+    for index in (flat, ivf):
+        assert index.search(QUERIES[0], top_k=0) == []
+        assert index.search(QUERIES[0], top_k=-1) == []
+        assert index.search_batch(QUERIES[:3], top_k=0) == [[], [], []]
+
+
+def test_ivf_is_exact_when_every_list_is_probed():
+    index = IVFIndex(nlist=16, nprobe=2)
+    index.build(EMBEDDINGS)
+    assert len(index.centroids) == 16
+    assert sorted(index.list_ids.tolist()) == list(range(len(EMBEDDINGS)))
+    for query in QUERIES:
+        assert [doc_id for doc_id, _ in index.search(query, 10, nprobe=16)] == brute_force(query, 10)
+
+    # Probing fewer lists trades recall for latency; more lists never find fewer neighbours
+    recalls = []
+    for nprobe in (1, 4, 16):
+        hits = sum(len(set(brute_force(query, 10)) & {doc_id for doc_id, _ in index.search(query, 10, nprobe=nprobe)})
+                   for query in QUERIES)
+        recalls.append(hits / (10 * len(QUERIES)))
+    assert recalls == sorted(recalls) and recalls[-1] == 1.0 and recalls[0] < 1.0
+
+
+def test_batch_search_matches_single_search():
+    flat = FlatIndex()
+    flat.build(EMBEDDINGS)
+    ivf = IVFIndex(nlist=16, nprobe=4)
+    ivf.build(EMBEDDINGS)
+    for index in (flat, ivf):
+        for batch, query in zip(index.search_batch(QUERIES, top_k=7), QUERIES):
+            single = index.search(query, top_k=7)
+            assert [doc_id for doc_id, _ in batch] == [doc_id for doc_id, _ in single]
+            assert np.allclose([score for _, score in batch], [score for _, score in single], atol=1e-5)
+
+
+def test_saved_index_loads_back():
+    with tempfile.TemporaryDirectory() as directory:
+        for index in (FlatIndex(), IVFIndex(nlist=16, nprobe=4)):
+            index.build(EMBEDDINGS)
+            path = os.path.join(directory, f"vector_index_{index.kind}.npz")
+            index.save(path, version="v1")
+            loaded = VectorIndex.load(path, EMBEDDINGS, version="v1")
+            assert type(loaded) is type(index) and loaded.size == len(EMBEDDINGS)
+            for query in QUERIES:
+                assert loaded.search(query, 5, nprobe=4) == index.search(query, 5, nprobe=4)
+
+            for embeddings, version in ((EMBEDDINGS, "v2"), (EMBEDDINGS[:100], "v1")):
+                try:
+                    VectorIndex.load(path, embeddings, version)
+                    assert False, "a stale index should not load"
+                except ValueError:
+                    pass
+
+
+def test_concurrent_saves_never_expose_a_partial_file():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "vector_index_ivf.npz")
+        index = IVFIndex(nlist=16)
+        index.build(EMBEDDINGS)
+        index.save(path, version="v1")
+        problems = []
+        stop = threading.Event()
+
+        def save():
+            # Like every prefork worker rebuilding after the same knowledge base edit
+            while not stop.is_set():
+                index.save(path, version="v1")
+
+        def load():
+            while not stop.is_set():
+                try:
+                    VectorIndex.load(path, EMBEDDINGS, version="v1")
+                except Exception as e:
+                    problems.append(repr(e))
+
+        threads = [threading.Thread(target=save) for _ in range(3)] + [threading.Thread(target=load) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.5)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        assert problems == []
+        assert os.listdir(directory) == ["vector_index_ivf.npz"]
+
+
+def test_index_from_another_version_is_rebuilt():
+    with tempfile.TemporaryDirectory() as directory:
+        data_manager = DataManager(os.path.join(directory, 'knowledge_base.txt'), load=False)
+        data_manager.embedding_store = EmbeddingStore(directory)
+        data_manager.index_type, data_manager.index_nlist = 'ivf', 16
+        documents = [{'title': str(i)} for i in range(len(EMBEDDINGS))]
+
+        def build(version):
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                index = data_manager.build_index(documents, EMBEDDINGS, version)
+            with np.load(data_manager.index_cache_path) as state:
+                return index, output.getvalue(), str(state['version'])
+
+        _, output, stored = build("v1")
+        assert "Building ivf vector index" in output and stored == "v1"
+        _, output, stored = build("v1")
+        assert "Loaded cached ivf vector index" in output and stored == "v1"
+        index, output, stored = build("v2")
+        assert "Rebuilding vector index" in output and stored == "v2"
+        assert [doc_id for doc_id, _ in index.search(QUERIES[0], 5, nprobe=16)] == brute_force(QUERIES[0], 5)
+
+
+if __name__ == "__main__":
+    print("🧭 Vector Index Test")
+    print("=" * 40)
+    failed = 0
+    for test in [test_flat_index_is_exact, test_zero_or_negative_top_k_returns_nothing,
+                 test_ivf_is_exact_when_every_list_is_probed, test_batch_search_matches_single_search,
+                 test_saved_index_loads_back, test_concurrent_saves_never_expose_a_partial_file,
+                 test_index_from_another_version_is_rebuilt]:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 40)
+    sys.exit(1 if failed else 0)
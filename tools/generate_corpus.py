@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+Synthetic Knowledge Base Generator for LBS RAG Chatbot
+Writes knowledge bases of any size (10k-1M sections) in the same ---/###/Source:
+format as backend/data/knowledge_base.txt, plus a matching labelled query set
+(JSON lines of {"query": ..., "relevant": [section titles]}) for
+tests/benchmark_rag.py, so load time, embedding time, index build time, memory
+and query latency can be measured against corpus size.
+
+Every section is a policy, procedure or service page about one module, programme
+and term, so titles are unique and many sections look alike, as in a real
+policy library. Generation is deterministic for a seed and smaller corpora are
+prefixes of larger ones.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+
+PROGRAMMES = ["MAM", "MiM", "MFA", "MiF", "MBA", "EMBA", "Masters in Analytics", "Sloan"]
+TERMS = [f"{term} Term {year}" for year in (2024, 2025, 2026) for term in ("Autumn", "Spring", "Summer", "Winter")]
+QUALIFIERS = ["Advanced", "Applied", "Global", "Digital", "Strategic", "Behavioural", "Corporate", "Quantitative",
+              "Sustainable", "International", "Managerial", "Entrepreneurial", "Financial", "Operational",
+              "Emerging Markets", "Data-Driven", "Responsible", "Comparative", "Contemporary", "Introductory",
+              "Intermediate", "Executive", "Experimental", "Computational", "Organisational", "Innovation in",
+              "Leadership in", "Ethics of", "Foundations of", "Topics in"]
+FIELDS = ["Finance", "Accounting", "Marketing", "Economics", "Strategy", "Operations", "Analytics",
+          "Organisational Behaviour", "Negotiation", "Supply Chain Management", "Corporate Governance",
+          "Private Equity", "Venture Capital", "Decision Science", "Business Law", "Data Visualisation",
+          "Machine Learning", "Pricing", "Brand Management", "Consumer Behaviour", "Healthcare Management",
+          "Real Estate", "Energy Markets", "Fintech", "Asset Management", "Risk Management", "Game Theory",
+          "Econometrics", "Family Business", "Product Management", "Digital Transformation", "Public Policy",
+          "Sustainability Reporting", "Mergers and Acquisitions", "Behavioural Economics", "Team Dynamics",
+          "Corporate Finance", "Valuation", "Business Communication", "Platform Strategy"]
+OFFICES = ["Program Office", "Registry", "Assessment Office", "Student Services Centre", "Student Advice Team",
+           "Faculty Support Office", "Examinations Office"]
+PLATFORMS = ["Canvas", "the Student Portal", "MyLBS", "the online request system"]
+FORMS = ["Deferral Request Form", "Extension Request Form", "Extenuating Circumstances Form", "Appeal Form",
+         "Module Change Form", "Resit Registration Form", "Leave of Absence Form"]
+EVIDENCE = ["a medical certificate", "a letter from a qualified professional", "supporting documentation",
+            "a statement from your employer", "official correspondence"]
+
+# Each topic: category heading, title, source, content sentences, bullet list and
+# query templates. {subject}, {programme} and {term} name the section's module.
+TOPICS = [
+    {
+        'category': "Academic Policies & Procedures", 'title': "Policy: Deferral of Assessment",
+        'source': ("LBS Assessment Policy", "policies/assessment"),
+        'sentences': [
+            "Students on the {programme} taking {subject} in the {term} may request a deferral of assessment due to "
+            "extenuating circumstances such as illness or family emergency.",
+            "Requests must be submitted via the {form} no later than {days} working days after the assessment date.",
+            "The {office} will review all deferral requests for {subject} and notify students within {days2} "
+            "working days.",
+            "Deferred {subject} assessments are normally taken at the next scheduled sitting.",
+            "Supporting evidence must include {evidence} dated within the assessment period.",
+        ],
+        'queries': ["How do I defer my {subject} exam on the {programme}?",
+                    "Can I postpone the {subject} assessment{in_term}?",
+                    "What is the deferral deadline for {subject} ({programme})?"]
+    },
+    {
+        'category': "Academic Policies & Procedures", 'title': "Policy: Extensions and Late Submissions",
+        'source': ("LBS Coursework Policy", "policies/coursework"),
+        'sentences': [
+            "Coursework extensions for {subject} on the {programme} may be granted for documented extenuating "
+            "circumstances.",
+            "Requests must be made at least {hours} hours before the deadline via the {form}.",
+            "Late {subject} submissions without an approved extension incur a penalty of {percent}% per day, up to "
+            "a maximum of {max_days} days.",
+            "After {max_days} days, {subject} coursework receives zero marks unless exceptional circumstances apply.",
+            "Extensions granted in the {term} do not carry over to resit assessments.",
+        ],
+        'queries': ["Can I get an extension for my {subject} coursework?",
+                    "What is the late penalty for {subject} on the {programme}{in_term}?",
+                    "How late can I hand in {subject} work?"]
+    },
+    {
+        'category': "Academic Policies & Procedures", 'title': "Policy: Attendance Requirements",
+        'source': ("LBS Student Handbook", "handbook"),
+        'sentences': [
+            "Students taking {subject} on the {programme} must attend at least {percent_high}% of scheduled "
+            "sessions in the {term}.",
+            "Attendance for {subject} is recorded electronically via student ID card scanning.",
+            "Students must notify the {office} within {hours} hours of any anticipated absence.",
+            "Failure to meet the {subject} attendance requirement may result in a failing grade for the module.",
+        ],
+        'queries': ["What attendance is required for {subject}?",
+                    "How many {subject} classes can I miss on the {programme}?",
+                    "Is attendance tracked in {subject}{in_term}?"]
+    },
+    {
+        'category': "Academic Policies & Procedures", 'title': "Policy: Grade Appeals Process",
+        'source': ("LBS Academic Appeals Regulations", "policies/appeals"),
+        'sentences': [
+            "Students who wish to appeal a {subject} grade must submit an {form_appeal} within {days} working days "
+            "of results being released.",
+            "Appeals for {programme} modules must state specific grounds such as procedural irregularity.",
+            "The {office} acknowledges {subject} appeals within {days2} working days.",
+            "Disagreement with academic judgement alone is not grounds for an appeal.",
+        ],
+        'queries': ["How do I appeal my {subject} mark?",
+                    "What is the deadline to appeal a {subject} grade on the {programme}{in_term}?",
+                    "Can I challenge my result in {subject}?"]
+    },
+    {
+        'category': "Examinations and Assessment", 'title': "Examination Procedures",
+        'source': ("LBS Examination Regulations", "policies/examinations"),
+        'sentences': [
+            "The {subject} final examination for the {programme} is held at the end of the {term} in a "
+            "designated examination hall.",
+            "Students must arrive {minutes} minutes before the {subject} exam starts and bring valid ID.",
+            "Only approved calculators and materials may be taken into the {subject} examination.",
+            "Mobile phones must be switched off and stored in the bags area.",
+            "Students arriving more than {minutes2} minutes late may not be admitted.",
+        ],
+        'queries': ["When is the {subject} exam for the {programme}?",
+                    "What can I bring into the {subject} examination?",
+                    "What happens if I am late for my {subject} exam{in_term}?"]
+    },
+    {
+        'category': "Examinations and Assessment", 'title': "Resit and Remediation Policy",
+        'source': ("LBS Resit Policy", "policies/resits"),
+        'sentences': [
+            "Students who fail {subject} on the {programme} may be eligible for a resit examination or alternative "
+            "assessment.",
+            "Resits for {subject} modules taken in the {term} are held in the following resit period.",
+            "The maximum grade achievable on a {subject} resit is capped at {pass_mark}%.",
+            "Students must register for the resit using the {form_resit} via {platform}.",
+        ],
+        'queries': ["Can I resit {subject} if I fail?",
+                    "Is the {subject} resit mark capped on the {programme}?",
+                    "When are resits for {subject}{in_term}?"]
+    },
+    {
+        'category': "Examinations and Assessment", 'title': "Coursework Assessment Guidelines",
+        'source': ("LBS Assessment Handbook", "policies/coursework-assessment"),
+        'sentences': [
+            "{subject} on the {programme} is assessed by individual assignments, a group project and class "
+            "participation.",
+            "Individual work counts for {percent_weight}% of the {subject} grade and the group project for the rest.",
+            "Marked {subject} coursework is returned with feedback within {days2} working days.",
+            "Assessment criteria for the {term} are published in the module syllabus on {platform}.",
+        ],
+        'queries': ["How is {subject} assessed on the {programme}?",
+                    "What percentage of the {subject} grade is individual work?",
+                    "When do we get {subject} coursework feedback{in_term}?"]
+    },
+    {
+        'category': "Canvas Learning Management System", 'title': "Canvas: Submitting Assignments",
+        'source': ("LBS Canvas Guide", "canvas/submissions"),
+        'sentences': [
+            "{subject} assignments for the {programme} must be submitted through Canvas by the published deadline.",
+            "Submissions must be PDF or Word files no larger than {megabytes} MB.",
+            "Students receive an email receipt once their {subject} submission is processed.",
+            "If Canvas is unavailable near the {subject} deadline, email the {office} with your file attached.",
+        ],
+        'queries': ["How do I submit my {subject} assignment on Canvas?",
+                    "What file formats does Canvas accept for {subject}?",
+                    "Canvas is down and my {subject} assignment is due, what do I do?"]
+    },
+    {
+        'category': "Canvas Learning Management System", 'title': "Canvas: Accessing Course Materials",
+        'source': ("LBS Canvas Guide", "canvas/materials"),
+        'sentences': [
+            "Lecture slides, readings and recordings for {subject} on the {programme} are on the Canvas course page "
+            "under Modules.",
+            "{subject} materials are uploaded {hours} hours before each session.",
+            "Recorded {subject} lectures from the {term} are available within {hours2} hours of the live session.",
+            "Contact the course administrator if you cannot access {subject} resources.",
+        ],
+        'queries': ["Where are the {subject} lecture slides?",
+                    "When are {subject} recordings posted{in_term}?",
+                    "I can't find the {subject} readings on Canvas"]
+    },
+    {
+        'category': "Program Structure & Requirements", 'title': "Module Registration and Electives",
+        'source': ("LBS Programme Regulations", "programmes/electives"),
+        'sentences': [
+            "{subject} is offered as an elective to {programme} students in the {term}.",
+            "Registration for {subject} opens {weeks} weeks before the term via {platform}.",
+            "Places on {subject} are limited to {capacity} students and allocated by bidding.",
+            "Students may drop {subject} within the first {days} days of term using the {form_module}.",
+        ],
+        'queries': ["How do I register for {subject} on the {programme}?",
+                    "When does registration for {subject} open{in_term}?",
+                    "Can I drop the {subject} elective?"]
+    },
+    {
+        'category': "Student Services & Support", 'title': "Career Services",
+        'source': ("LBS Career Centre", "careers"),
+        'sentences': [
+            "The Career Centre runs {subject} career workshops for {programme} students during the {term}.",
+            "Students interested in {subject} roles can book {sessions} one-to-one coaching sessions per term.",
+            "CV reviews for {subject} applications are returned within {days2} working days.",
+            "Employer presentations relevant to {subject} are advertised on {platform}.",
+        ],
+        'queries': ["Does the Career Centre help with {subject} jobs?",
+                    "How many coaching sessions can {programme} students book{in_term}?",
+                    "Are there {subject} employer events?"]
+    },
+    {
+        'category': "Student Services & Support", 'title': "Library and Learning Resources",
+        'source': ("LBS Library", "library"),
+        'sentences': [
+            "The Library holds core texts and databases for {subject}, available to {programme} students.",
+            "Study rooms can be booked up to {days} days in advance for {subject} group work.",
+            "Subject librarians run {subject} research skills sessions in the {term}.",
+            "Short-loan {subject} textbooks may be borrowed for {hours} hours.",
+        ],
+        'queries': ["Where can I find {subject} textbooks?",
+                    "Can I book a study room for {subject} group work?",
+                    "Are there research skills sessions for {subject}{in_term}?"]
+    },
+    {
+        'category': "Administrative Procedures", 'title': "Fee Payment and Financial Aid",
+        'source': ("LBS Fees and Funding", "fees"),
+        'sentences': [
+            "Fees for {programme} modules such as {subject} are payable by the instalment dates in the offer letter.",
+            "A late payment fee of {amount} GBP applies after a {days}-day grace period.",
+            "Hardship funding applications for the {term} close {weeks} weeks after the term starts.",
+            "Scholarship holders should contact the {office} before withdrawing from {subject}.",
+        ],
+        'queries': ["What is the late fee for {programme} tuition?",
+                    "Is there hardship funding{in_term} for {programme} students taking {subject}?",
+                    "Does dropping {subject} affect my scholarship?"]
+    },
+    {
+        'category': "Administrative Procedures", 'title': "Student Records and Transcripts",
+        'source': ("LBS Registry", "registry"),
+        'sentences': [
+            "{subject} results for the {programme} appear on transcripts once confirmed by the exam board.",
+            "Transcripts can be requested through {platform} and take {days} working days to produce.",
+            "Results for {term} modules are confirmed within {weeks} weeks of the exam board.",
+            "Corrections to {subject} records must be requested through the {office}.",
+        ],
+        'queries': ["When will my {subject} result appear on my transcript?",
+                    "How long does a {programme} transcript take?",
+                    "Who corrects a wrong {subject} record{in_term}?"]
+    },
+    {
+        'category': "Student Life and Activities", 'title': "Student Clubs and Societies",
+        'source': ("LBS Student Association", "clubs"),
+        'sentences': [
+            "The {subject} Club is open to all {programme} students and meets weekly in the {term}.",
+            "Membership costs {amount} GBP per year and includes access to {subject} speaker events.",
+            "Club officers for {subject} are elected in the first {weeks} weeks of term.",
+            "Events are listed on {platform}.",
+        ],
+        'queries': ["Is there a {subject} club?",
+                    "How much does the {subject} Club cost?",
+                    "When are {subject} Club elections{in_term}?"]
+    },
+    {
+        'category': "Examinations and Assessment", 'title': "Extenuating Circumstances",
+        'source': ("LBS Extenuating Circumstances Policy", "policies/extenuating-circumstances"),
+        'sentences': [
+            "Extenuating circumstances are exceptional events beyond a student's control that affect their {subject} "
+            "assessment on the {programme}.",
+            "Claims for the {term} must be submitted using the {form_ec} within {days} working days.",
+            "Claims must be supported by {evidence}.",
+            "The panel considers {subject} claims within {days2} working days and may grant a deferral or "
+            "uncapped resit.",
+        ],
+        'queries': ["How do I submit extenuating circumstances for {subject}?",
+                    "What evidence do I need for an EC claim on the {programme}{in_term}?",
+                    "What counts as extenuating circumstances for my {subject} exam?"]
+    },
+]
+
+BULLETS = [
+    "**Contact**: {office}",
+    "**Where**: {platform}",
+    "**Response time**: {days2} working days",
+    "**Applies to**: {programme}, {term}",
+]
+
+
+def combination_count():
+    return len(TOPICS) * len(QUALIFIERS) * len(FIELDS) * len(PROGRAMMES) * len(TERMS)
+
+
+class CorpusLayout:
+    """Maps section numbers to unique (topic, subject, programme, term) combinations
+
+    Section i gets combination (a * i + b) mod M, a permutation of all M
+    combinations, so titles never repeat and neighbouring sections are about
+    different topics. The inverse finds which sections of a corpus share a
+    topic, subject and programme, for query labels that leave out the term.
+    """
+
+    MULTIPLIER = 1000003
+
+    def __init__(self, seed: int = 0):
+        self.size = combination_count()
+        if math.gcd(self.MULTIPLIER, self.size) != 1:
+            raise ValueError("Multiplier must be coprime with the number of combinations")
+        self.offset = random.Random(seed).randrange(self.size)
+        self.inverse = pow(self.MULTIPLIER, -1, self.size)
+
+    def combination(self, i: int):
+        j = (self.MULTIPLIER * i + self.offset) % self.size
+        j, term = divmod(j, len(TERMS))
+        j, programme = divmod(j, len(PROGRAMMES))
+        j, field = divmod(j, len(FIELDS))
+        topic, qualifier = divmod(j, len(QUALIFIERS))
+        return topic, qualifier, field, programme, term
+
+    def section_number(self, topic, qualifier, field, programme, term) -> int:
+        j = ((topic * len(QUALIFIERS) + qualifier) * len(FIELDS) + field) * len(PROGRAMMES) + programme
+        j = j * len(TERMS) + term
+        return (j - self.offset) * self.inverse % self.size
+
+
+def section_title(topic, qualifier, field, programme, term) -> str:
+    subject = f"{QUALIFIERS[qualifier]} {FIELDS[field]}"
+    return f"{TOPICS[topic]['title']} - {subject} ({PROGRAMMES[programme]}, {TERMS[term]})"
+
+
+def fill_values(rng: random.Random, subject: str, programme: str, term: str) -> dict:
+    """Slot values for one section's sentences"""
+    return {
+        'subject': subject, 'programme': programme, 'term': term,
+        'days': rng.choice([3, 5, 7, 10, 14]), 'days2': rng.choice([5, 10, 15, 20]),
+        'hours': rng.choice([24, 48, 72]), 'hours2': rng.choice([24, 48]),
+        'percent': rng.choice([5, 10]), 'percent_high': rng.choice([75, 80, 85, 90]),
+        'percent_weight': rng.choice([40, 50, 60, 70]), 'pass_mark': rng.choice([40, 50, 60]),
+        'max_days': rng.choice([5, 7, 10]), 'minutes': rng.choice([15, 20, 30]), 'minutes2': rng.choice([30, 45]),
+        'weeks': rng.choice([2, 3, 4, 6]), 'megabytes': rng.choice([25, 50, 100]),
+        'capacity': rng.choice([30, 45, 60, 90, 120]), 'sessions': rng.choice([2, 3, 4, 6]),
+        'amount': rng.choice([25, 40, 50, 100, 150, 250]),
+        'office': rng.choice(OFFICES), 'platform': rng.choice(PLATFORMS), 'form': rng.choice(FORMS),
+        'form_appeal': "Appeal Form", 'form_resit': "Resit Registration Form",
+        'form_module': "Module Change Form", 'form_ec': "Extenuating Circumstances Form",
+        'evidence': rng.choice(EVIDENCE)
+    }
+
+
+def generate_section(layout: CorpusLayout, i: int, seed: int = 0) -> str:
+    """Markdown for section i; depends only on the seed and i"""
+    topic, qualifier, field, programme, term = layout.combination(i)
+    rng = random.Random(f"{seed}-{i}")
+    spec = TOPICS[topic]
+    values = fill_values(rng, f"{QUALIFIERS[qualifier]} {FIELDS[field]}", PROGRAMMES[programme], TERMS[term])
+
+    # The opening sentence names the module; the rest are a random selection in order
+    sentences = spec['sentences']
+    chosen = [0] + sorted(rng.sample(range(1, len(sentences)), rng.randint(2, len(sentences) - 1)))
+    lines = [f"### {section_title(topic, qualifier, field, programme, term)}",
+             " ".join(sentences[k].format(**values) for k in chosen)]
+    if rng.random() < 0.3:
+        lines += [f"- {bullet.format(**values)}" for bullet in rng.sample(BULLETS, 3)]
+    source_name, source_path = spec['source']
+    lines.append(f"Source: [{source_name}, Section {rng.randint(1, 12)}.{rng.randint(1, 9)}]"
+                 f"(https://london.edu/{source_path})")
+    return "\n".join(lines)
+
+
+def generate_queries(layout: CorpusLayout, sections: int, count: int, seed: int = 0):
+    """Labelled queries about randomly chosen sections of a corpus of `sections`
+
+    About half the queries leave out the term; every section of the corpus
+    on that topic, module and programme is then relevant.
+    """
+    rng = random.Random(f"{seed}-queries-{sections}")
+    queries = []
+    for i in rng.sample(range(sections), min(count, sections)):
+        topic, qualifier, field, programme, term = layout.combination(i)
+        with_term = rng.random() < 0.5
+        template = rng.choice(TOPICS[topic]['queries'])
+        if '{in_term}' not in template and with_term:
+            template = template.rstrip('?') + " in the {term}?"
+        query = template.format(subject=f"{QUALIFIERS[qualifier]} {FIELDS[field]}", programme=PROGRAMMES[programme],
+                                term=TERMS[term], in_term=f" in the {TERMS[term]}" if with_term else "")
+        if with_term:
+            terms = [term]
+        else:
+            terms = [t for t in range(len(TERMS))
+                     if layout.section_number(topic, qualifier, field, programme, t) < sections]
+        relevant = [section_title(topic, qualifier, field, programme, t) for t in terms]
+        queries.append({'query': query, 'relevant': relevant})
+    return queries
+
+
+def write_corpus(sections: int, output_dir: str, query_count: int = 500, seed: int = 0):
+    """Write knowledge_base_<sections>.txt and queries_<sections>.jsonl to output_dir"""
+    layout = CorpusLayout(seed)
+    if sections > layout.size:
+        raise ValueError(f"At most {layout.size} distinct sections can be generated")
+    os.makedirs(output_dir, exist_ok=True)
+    corpus_path = os.path.join(output_dir, f"knowledge_base_{sections}.txt")
+    queries_path = os.path.join(output_dir, f"queries_{sections}.jsonl")
+
+    print(f"Generating {sections} sections...")
+    with open(corpus_path, 'w', encoding='utf-8') as f:
+        f.write(f"# Synthetic LBS Knowledge Base ({sections} sections, seed {seed})\n\n")
+        for i in range(sections):
+            if i % 100 == 0:
+                f.write(f"## {TOPICS[layout.combination(i)[0]]['category']}\n\n")
+            f.write(generate_section(layout, i, seed))
+            f.write("\n\n---\n\n")
+
+    with open(queries_path, 'w', encoding='utf-8') as f:
+        for query in generate_queries(layout, sections, query_count, seed):
+            f.write(json.dumps(query) + "\n")
+
+    print(f"✅ {corpus_path} ({os.path.getsize(corpus_path) / 1024 / 1024:.1f} MB)")
+    print(f"✅ {queries_path} ({min(query_count, sections)} queries)")
+    return corpus_path, queries_path
+
+
+def main():
+    """Generate one corpus and query set per requested size"""
+    parser = argparse.ArgumentParser(description='Generate synthetic knowledge bases for LBS RAG Chatbot scaling tests')
+    parser.add_argument('--sections', type=int, nargs='+', default=[10000],
+                        help='Corpus sizes in sections, e.g. 10000 100000 1000000')
+    parser.add_argument('--queries', type=int, default=500, help='Labelled queries per corpus')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output-dir',
+                        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'data',
+                                             'synthetic'))
+
+    args = parser.parse_args()
+
+    try:
+        for sections in args.sections:
+            write_corpus(sections, args.output_dir, args.queries, args.seed)
+    except (OSError, ValueError) as e:
+        print(f"Error generating corpus: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()